@@ -0,0 +1,183 @@
+
+# coding: utf-8
+
+# In[1]:
+
+# EventAllocation
+
+from __future__ import print_function
+
+import pprint
+import time
+import tracemalloc
+
+from EventDrivenBacktester.EventBus import DequeEventBus
+from EventDrivenBacktester.EventClasses import FillEvent, MarketEvent, OrderEvent, SignalEvent, market_event
+
+
+# In[2]:
+
+# The event classes as they were before __slots__ and the shared MarketEvent, kept as the baseline.
+
+class LegacyMarketEvent(object):
+    kind = MarketEvent.kind
+
+    def __init__(self):
+        self.type = 'MARKET'
+
+
+class LegacySignalEvent(object):
+    kind = SignalEvent.kind
+
+    def __init__(self, strategy_id, symbol, datetime, signal_type, strength):
+        self.type = 'SIGNAL'
+        self.strategy_id = strategy_id
+        self.datetime = datetime
+        self.signal_type = signal_type
+        self.strength = strength
+        self.symbol = symbol
+
+
+class LegacyOrderEvent(object):
+    kind = OrderEvent.kind
+
+    def __init__(self, symbol, order_type, quantity, direction):
+        self.type = 'ORDER'
+        self.symbol = symbol
+        self.order_type = order_type
+        self.quantity = quantity
+        self.direction = direction
+
+
+class LegacyFillEvent(object):
+    kind = FillEvent.kind
+
+    def __init__(self, timeindex, symbol, exchange, quantity, direction, fill_cost, commission=None):
+        self.type = 'FILL'
+        self.timeindex = timeindex
+        self.symbol = symbol
+        self.exchange = exchange
+        self.quantity = quantity
+        self.direction = direction
+        self.fill_cost = fill_cost
+        self.commission = commission
+
+
+# In[3]:
+
+def measure_event_size(make_event, n_events=100000):
+    """
+    Returns the average number of bytes allocated per event, measured with tracemalloc while n_events
+    events are held in memory.
+
+    Parameters
+    ----------
+    @make_event: The callable creating one event.
+    @n_events: The number of events to allocate.
+    """
+    holder = [None] * n_events  # Allocated before tracing, so that only the events are measured
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        for i in range(n_events):
+            holder[i] = make_event()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (current - start) / float(n_events)
+
+
+def run_event_loop(classes, shared_market_event, n_bars, trade_every):
+    """
+    Runs the event churn of a backtest with n_bars bars through a DequeEventBus: a MarketEvent per bar, plus
+    a Signal, Order and Fill every trade_every bars. Returns the peak traced memory in bytes and the
+    elapsed seconds.
+
+    Parameters
+    ----------
+    @classes: The (market, signal, order, fill) event classes.
+    @shared_market_event: The MarketEvent put on the bus for every bar, or None to allocate one per bar.
+    @n_bars: The number of bars.
+    @trade_every: The number of bars between trades.
+    """
+    market_class, signal_class, order_class, fill_class = classes
+    bus = DequeEventBus()
+
+    def on_market(event, counter=[0]):
+        counter[0] += 1
+        if counter[0] % trade_every == 0:
+            bus.put(signal_class(1, 'SYM', None, 'LONG', 1.0))
+
+    bus.subscribe(market_class.kind, on_market)
+    bus.subscribe(signal_class.kind, lambda event: bus.put(order_class(event.symbol, 'MKT', 100, 'BUY')))
+    bus.subscribe(order_class.kind, lambda event: bus.put(
+        fill_class(None, event.symbol, 'ARCA', event.quantity, event.direction, None, 1.3)
+    ))
+
+    tracemalloc.start()
+    try:
+        start = time.time()
+        for _ in range(n_bars):
+            bus.put(shared_market_event if shared_market_event is not None else market_class())
+            bus.dispatch()
+        elapsed = time.time() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak, elapsed
+
+
+def run_event_allocation_benchmark(n_bars=1000000, trade_every=100):
+    """
+    Compares the event churn of a n_bars bar run between the legacy event classes, allocating a new
+    __dict__-based MarketEvent per bar, and the current __slots__ classes with the shared MarketEvent.
+
+    Parameters
+    ----------
+    @n_bars: The number of bars of the run.
+    @trade_every: The number of bars between trades (Signal, Order and Fill events).
+
+    @return: A dictionary of the results of each variant.
+    """
+    variants = [
+        ('legacy', (LegacyMarketEvent, LegacySignalEvent, LegacyOrderEvent, LegacyFillEvent), None),
+        ('slots', (MarketEvent, SignalEvent, OrderEvent, FillEvent), market_event),
+    ]
+
+    results = {}
+    for name, classes, shared_market_event in variants:
+        market_class, signal_class, order_class, fill_class = classes
+        sizes = {
+            'market': measure_event_size(market_class),
+            'signal': measure_event_size(lambda: signal_class(1, 'SYM', None, 'LONG', 1.0)),
+            'order': measure_event_size(lambda: order_class('SYM', 'MKT', 100, 'BUY')),
+            'fill': measure_event_size(lambda: fill_class(None, 'SYM', 'ARCA', 100, 'BUY', None, 1.3)),
+        }
+        peak, elapsed = run_event_loop(classes, shared_market_event, n_bars, trade_every)
+
+        n_trades = n_bars // trade_every
+        n_market = 0 if shared_market_event is not None else n_bars
+        allocated = (
+            n_market * sizes['market'] +
+            n_trades * (sizes['signal'] + sizes['order'] + sizes['fill'])
+        )
+        results[name] = {
+            'bytes_per_event': sizes,
+            'events_allocated': n_market + 3 * n_trades,
+            'bytes_allocated': int(allocated),
+            'peak_traced_bytes': peak,
+            'seconds': elapsed,
+        }
+    return results
+
+
+# In[4]:
+
+if __name__ == "__main__":
+    pprint.pprint(run_event_allocation_benchmark())
+
+
+# In[ ]:
+
+
+
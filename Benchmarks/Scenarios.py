@@ -0,0 +1,203 @@
+
+# coding: utf-8
+
+# In[1]:
+
+# Scenarios
+
+from __future__ import print_function
+
+import argparse
+import datetime
+import json
+import os, os.path
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+
+from Benchmarks.SyntheticData import generate_bars, write_csv_bars
+from EventDrivenBacktester.Backtester import Backtest
+from EventDrivenBacktester.DataHandlerABC import HistoricCSVDataHandler
+from EventDrivenBacktester.EventBus import DequeEventBus
+from EventDrivenBacktester.ExecutionHandler import SimulatedExecutionHandler
+from EventDrivenBacktester.Profiler import Profiler
+from Portfolio.PortfolioBaseClass import Portfolio
+from Strategies.MovingAverageCrossoverStrategy import MovingAverageCrossoverStrategy
+
+
+# In[2]:
+
+# The grid of scenarios, as the number of bars and the number of symbols of each data set
+DEFAULT_BARS = [1000, 100000, 1000000]
+DEFAULT_SYMBOLS = [1, 10, 500]
+
+# Scenarios larger than this many bars in total (over all the symbols) are skipped by default, as their data
+# alone would not fit in the memory of most machines
+DEFAULT_MAX_CELLS = 10 * 1000 * 1000
+
+
+def _timed(func, *args, **kwargs):
+    """
+    Returns the result of a call and its duration in seconds.
+    """
+    start = time.time()
+    result = func(*args, **kwargs)
+    return result, time.time() - start
+
+
+def _drain_bars(data_handler, events):
+    """
+    Drip-feeds every bar of a data handler with nothing subscribed to the events, returning the number of bars.
+    """
+    n_bars = 0
+    while data_handler.continue_backtest:
+        data_handler.update_bars()
+        events.dispatch()
+        n_bars += 1
+    return n_bars
+
+
+def run_scenario(n_bars, n_symbols, process='gbm', seed=0, work_dir=None):
+    """
+    Times the stages of a MovingAverageCrossoverStrategy backtest over synthetic minute bars, returning a
+    dictionary of the durations in seconds and the throughput of each stage.
+
+    The stages are the generation of the data, writing it to CSV, loading it into a HistoricCSVDataHandler,
+    drip-feeding the bars on their own, the full Backtest event loop (profiled per component), the equity
+    curve and the summary statistics.
+
+    Parameters
+    ----------
+    @n_bars: The number of bars per symbol.
+    @n_symbols: The number of symbols.
+    @process: The process of the closing prices, see generate_bars().
+    @seed: The seed of the random number generator.
+    @work_dir: The directory the CSV files and the equity curve are written to, by default a temporary directory
+        which is removed.
+    """
+    csv_dir = work_dir or tempfile.mkdtemp(prefix='benchmark_')
+    try:
+        bars, generate_time = _timed(generate_bars, n_bars, n_symbols, process, seed, start='1990-01-01', freq='min')
+        symbol_list, write_time = _timed(write_csv_bars, bars, csv_dir)
+        del bars
+
+        events = DequeEventBus()
+        data_handler, load_time = _timed(HistoricCSVDataHandler, events, csv_dir, symbol_list)
+        _, update_bars_time = _timed(_drain_bars, data_handler, events)
+        del data_handler
+
+        start_date = datetime.datetime(1990, 1, 1)
+        backtest = Backtest(
+            csv_dir, symbol_list, 100000.0, 0.0, start_date, None, HistoricCSVDataHandler,
+            SimulatedExecutionHandler, Portfolio, MovingAverageCrossoverStrategy, profiler=Profiler
+        )
+        _, backtest_time = _timed(backtest._run_backtest)
+        _, curve_time = _timed(backtest.portfolio.create_equity_curve_dataframe)
+
+        # output_summary_stats() writes equity.csv into the working directory, so it runs from csv_dir rather
+        # than leaving the file behind in the caller's directory
+        cwd = os.getcwd()
+        os.chdir(csv_dir)
+        try:
+            _, stats_time = _timed(backtest.portfolio.output_summary_stats)
+        finally:
+            os.chdir(cwd)
+        profile = backtest.profiler.report(backtest.events.counts)
+    finally:
+        if work_dir is None:
+            shutil.rmtree(csv_dir, ignore_errors=True)
+
+    return {
+        'n_bars': n_bars,
+        'n_symbols': n_symbols,
+        'process': process,
+        'seed': seed,
+        'seconds': {
+            'generate': generate_time,
+            'write_csv': write_time,
+            'load': load_time,
+            'update_bars': update_bars_time,
+            'backtest': backtest_time,
+            'equity_curve': curve_time,
+            'summary_stats': stats_time,
+        },
+        'bars_per_sec': {
+            'update_bars': n_bars / update_bars_time if update_bars_time > 0 else None,
+            'backtest': n_bars / backtest_time if backtest_time > 0 else None,
+        },
+        'profile': profile,
+    }
+
+
+def _get_commit():
+    """
+    Returns the git commit of the working tree, or None outside of a git repository.
+    """
+    try:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=root).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(bars_grid=DEFAULT_BARS, symbols_grid=DEFAULT_SYMBOLS, process='gbm', seed=0,
+                   max_cells=DEFAULT_MAX_CELLS, output_path=None):
+    """
+    Runs every (n_bars, n_symbols) scenario of a grid, returning the results along with the commit and
+    platform they were measured on, and saving them as JSON if output_path is given.
+
+    Parameters
+    ----------
+    @bars_grid: The numbers of bars per symbol.
+    @symbols_grid: The numbers of symbols.
+    @process: The process of the closing prices, see generate_bars().
+    @seed: The seed of the random number generator.
+    @max_cells: The largest total number of bars of a scenario, or None for no limit. Larger scenarios are
+        recorded as skipped.
+    @output_path: The path of the JSON file to write the results to.
+    """
+    results = {
+        'commit': _get_commit(),
+        'timestamp': datetime.datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scenarios': [],
+    }
+    for n_bars in bars_grid:
+        for n_symbols in symbols_grid:
+            if max_cells is not None and n_bars * n_symbols > max_cells:
+                print("Skipping %s bars x %s symbols..." % (n_bars, n_symbols))
+                results['scenarios'].append({
+                    'n_bars': n_bars, 'n_symbols': n_symbols, 'process': process, 'seed': seed, 'skipped': True,
+                })
+                continue
+            print("Running %s bars x %s symbols..." % (n_bars, n_symbols))
+            results['scenarios'].append(run_scenario(n_bars, n_symbols, process, seed))
+
+    if output_path is not None:
+        with open(output_path, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    return results
+
+
+# In[3]:
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Times the backtest engine on synthetic market data.")
+    parser.add_argument('--bars', type=int, nargs='+', default=DEFAULT_BARS)
+    parser.add_argument('--symbols', type=int, nargs='+', default=DEFAULT_SYMBOLS)
+    parser.add_argument('--process', default='gbm', choices=['gbm', 'mean_reverting', 'trending'])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-cells', type=int, default=DEFAULT_MAX_CELLS)
+    parser.add_argument('--output', default='benchmark_results.json')
+    args = parser.parse_args()
+
+    run_benchmarks(args.bars, args.symbols, args.process, args.seed, args.max_cells, args.output)
+
+
+# In[ ]:
+
+
+
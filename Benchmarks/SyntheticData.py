@@ -0,0 +1,95 @@
+
+# coding: utf-8
+
+# In[1]:
+
+# SyntheticData
+
+from __future__ import print_function
+
+import os, os.path
+
+import numpy as np
+import pandas as pd
+
+from QuantModels.hurst_exponent import gbm_series, mean_reverting_series, trending_series
+
+
+# In[2]:
+
+# The processes the closing prices can follow, as generators of (n_bars, n_symbols) log price arrays
+PROCESSES = {
+    'gbm': gbm_series,
+    'mean_reverting': mean_reverting_series,
+    'trending': trending_series,
+}
+
+# The CSV columns of the HistoricCSVDataHandler
+FIELDS = ['open', 'high', 'low', 'close', 'adj_close', 'volume']
+
+
+def generate_bars(n_bars, n_symbols, process='gbm', seed=0, start='2000-01-03 09:30', freq='min'):
+    """
+    Generates reproducible synthetic bars for a number of symbols sharing a timeline, returning a dictionary
+    of DataFrames indexed on datetime, keyed by symbol ('SYM0', 'SYM1', ...).
+
+    All the symbols are generated at once with vectorized operations. The closing prices follow the process,
+    with a volatility scaled to the number of bars so that the prices stay positive over long runs. Each bar
+    opens at the previous close, its high and low extend beyond the open and close by a random fraction, and
+    its volume is uniformly distributed.
+
+    Parameters
+    ----------
+    @n_bars: The number of bars per symbol.
+    @n_symbols: The number of symbols.
+    @process: 'gbm', 'mean_reverting' or 'trending'.
+    @seed: The seed of the random number generator.
+    @start: The timestamp of the first bar.
+    @freq: The pandas frequency of the bars.
+    """
+    rng = np.random.RandomState(seed)
+    sigma = min(1.0, 100.0 / np.sqrt(n_bars))
+    params = dict(n_series=n_symbols, sigma=sigma, rng=rng)
+    if process == 'trending':
+        params['drift'] = 500.0 / (sigma * n_bars)
+    close = np.exp(PROCESSES[process](n_bars, **params))
+
+    open_ = np.empty_like(close)
+    open_[0] = close[0]
+    open_[1:] = close[:-1]
+    spread = 1.0 + 0.005 * np.abs(rng.randn(2, n_bars, n_symbols))
+    high = np.maximum(open_, close) * spread[0]
+    low = np.minimum(open_, close) / spread[1]
+    volume = rng.randint(100000, 1000000, size=(n_bars, n_symbols))
+
+    index = pd.date_range(start, periods=n_bars, freq=freq, name='datetime')
+    bars = {}
+    for j in range(n_symbols):
+        bars['SYM%d' % j] = pd.DataFrame({
+            'open': open_[:, j], 'high': high[:, j], 'low': low[:, j], 'close': close[:, j],
+            'adj_close': close[:, j], 'volume': volume[:, j],
+        }, index=index, columns=FIELDS)
+    return bars
+
+
+def write_csv_bars(bars, csv_dir):
+    """
+    Writes a dictionary of bars to 'symbol.csv' files in the format read by the HistoricCSVDataHandler,
+    returning the list of symbols.
+
+    Parameters
+    ----------
+    @bars: The dictionary of DataFrames keyed by symbol, e.g. from generate_bars().
+    @csv_dir: The directory to write the files to, created if required.
+    """
+    if not os.path.isdir(csv_dir):
+        os.makedirs(csv_dir)
+    for s, df in bars.items():
+        df.to_csv(os.path.join(csv_dir, '{}.csv'.format(s)))
+    return sorted(bars, key=lambda s: int(s[3:]))
+
+
+# In[ ]:
+
+
+
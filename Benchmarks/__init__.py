@@ -0,0 +1 @@
+import EventDrivenBacktester
\ No newline at end of file
@@ -0,0 +1,107 @@
+
+# coding: utf-8
+
+# In[1]:
+
+# BacktestLogging
+
+from __future__ import print_function
+
+import logging
+import sys
+
+
+# In[2]:
+
+# The components of the engine log through children of the 'backtester' logger, obtained with get_logger().
+# Nothing is output by default, so backtests run in a silent, fast mode: the per-bar diagnostics are logged at
+# DEBUG level with lazy %-style arguments, and the more expensive ones are only built when DEBUG is enabled.
+# configure_logging() turns the output on, optionally sampling the records, e.g. to log every Nth bar.
+
+ROOT_LOGGER_NAME = 'backtester'
+DEFAULT_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+_root_logger = logging.getLogger(ROOT_LOGGER_NAME)
+_root_logger.addHandler(logging.NullHandler())
+_root_logger.propagate = False
+
+
+def get_logger(name):
+    """
+    Returns the logger of a component of the engine, e.g. get_logger('portfolio').
+
+    Parameters
+    ----------
+    @name: The name of the component.
+    """
+    return _root_logger.getChild(name)
+
+
+# In[3]:
+
+class SamplingFilter(logging.Filter):
+    """
+    SamplingFilter lets through one in every_n records logged from each call site at or below a level,
+    so that per-bar diagnostics can be followed on long runs without flooding the output. Records above
+    the level are always let through.
+    """
+
+    def __init__(self, every_n, level=logging.DEBUG):
+        """
+        Parameters
+        ----------
+        @every_n: The sampling interval, in records per call site.
+        @level: The highest level which is sampled.
+        """
+        super(SamplingFilter, self).__init__()
+        self.every_n = every_n
+        self.level = level
+        self.counts = {}
+
+    def filter(self, record):
+        if record.levelno > self.level:
+            return True
+        key = (record.pathname, record.lineno)
+        count = self.counts.get(key, 0)
+        self.counts[key] = count + 1
+        return count % self.every_n == 0
+
+
+def disable_logging():
+    """
+    Returns the engine to its silent default, removing the handler added by configure_logging().
+    """
+    for handler in list(_root_logger.handlers):
+        if not isinstance(handler, logging.NullHandler):
+            _root_logger.removeHandler(handler)
+    _root_logger.setLevel(logging.NOTSET)
+
+
+def configure_logging(level=logging.INFO, sample_every=None, stream=None, fmt=DEFAULT_FORMAT):
+    """
+    Outputs the log records of the engine at or above a level to a stream, replacing any handler added by a
+    previous call. Returns the handler.
+
+    Parameters
+    ----------
+    @level: The lowest level output, e.g. logging.DEBUG for the per-bar diagnostics.
+    @sample_every: If given, only one in every sample_every DEBUG records of each call site is output.
+    @stream: The stream to write to, by default sys.stderr.
+    @fmt: The format of the records.
+    """
+    disable_logging()
+
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(logging.Formatter(fmt))
+    if sample_every is not None and sample_every > 1:
+        handler.addFilter(SamplingFilter(sample_every))
+
+    _root_logger.addHandler(handler)
+    _root_logger.setLevel(level)
+    return handler
+
+
+# In[ ]:
+
+
+
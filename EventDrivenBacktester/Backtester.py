@@ -11,19 +11,197 @@
 from __future__ import print_function
 
 import datetime
+import hashlib
+import json
+import multiprocessing
 import pprint
 import os
 
-try:
-    import Queue as queue
-except ImportError:
-    import queue
-    
 import time
 
+import numpy as np
+import pandas as pd
+
+from EventDrivenBacktester.BacktestLogging import get_logger
+from EventDrivenBacktester.EventBus import DequeEventBus
+from EventDrivenBacktester.EventClasses import MARKET, SIGNAL, ORDER, FILL
+from EventDrivenBacktester.DataHandlerABC import ColumnarDataHandler, MemmapDataHandler, SharedMemoryDataHandler
+from EventDrivenBacktester.IndicatorCache import IndicatorCache
+from EventDrivenBacktester.Profiler import NullProfiler
+from EventDrivenBacktester.ResultStore import DEFAULT_RESULTS_PATH, ResultStore
+
+logger = get_logger('backtest')
+
 
 # In[5]:
 
+def _get_sweep_name(strategy, symbol_list, csv_dir, initial_capital, start_date, end_date, warmup_margin, portfolio):
+    """
+    Returns the default name of a sweep within the ResultStore: the strategy class name and the symbols, followed
+    by a hash of the other settings of the run. A sweep rerun with the same settings resumes where it left off,
+    while one rerun over other dates, data, capital or portfolio starts a sweep of its own rather than taking the
+    stale results of the first one as completed.
+    
+    Parameters
+    ----------
+    @strategy: (Class) The Strategy, or a LockstepStrategy evaluating its strategy_class.
+    @portfolio: (Class) The Portfolio, or a PortfolioLockstep reproducing its portfolio_class.
+    """
+    strategy = getattr(strategy, 'strategy_class', None) or strategy
+    portfolio = getattr(portfolio, 'portfolio_class', None) or portfolio
+    settings = {
+        'csv_dir': os.path.abspath(os.path.expanduser(csv_dir)),
+        'initial_capital': float(initial_capital),
+        'start_date': None if start_date is None else pd.Timestamp(start_date).isoformat(),
+        'end_date': None if end_date is None else pd.Timestamp(end_date).isoformat(),
+        'warmup_margin': warmup_margin,
+        'portfolio': portfolio.__name__,
+    }
+    settings_hash = hashlib.sha1(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+    return "%s:%s:%s" % (strategy.__name__, ",".join(symbol_list), settings_hash)
+
+
+def _add_required_fields(data_handler, data_handler_params, strategy, portfolio):
+    """
+    Returns the keyword arguments of a data handler which only loads the fields it is given (see
+    DataHandler.projects_fields), along with the fields the strategy and the portfolio read. The arguments are
+    returned as they are if the fields are given already, or if the strategy or the portfolio does not declare them.
+    
+    Parameters
+    ----------
+    @data_handler: (Class) The DataHandler.
+    @data_handler_params: The dictionary of extra keyword arguments for the DataHandler.
+    @strategy: (Class) The Strategy, or a LockstepStrategy evaluating its strategy_class.
+    @portfolio: (Class) The Portfolio, whose price_field it values and fills positions at.
+    """
+    if not getattr(data_handler, 'projects_fields', False) or 'fields' in data_handler_params:
+        return data_handler_params
+    strategy = getattr(strategy, 'strategy_class', None) or strategy
+    fields = getattr(strategy, 'required_fields', None)
+    price_field = getattr(portfolio, 'price_field', None)
+    if fields is None or price_field is None:
+        return data_handler_params
+    params = dict(data_handler_params)
+    params['fields'] = sorted(set(fields) | set([price_field]))
+    return params
+
+
+def _fast_forward(data_handler, strategy, portfolio, warmup_bars=0):
+    """
+    Skips the event loop over the bars loaded before start_date as a warm-up margin, and then over the first
+    warmup_bars bars of the backtest, during which the strategy cannot generate any signal. The data handler feeds
+    the bars in one go and the strategy catches up with them. The Portfolio is backfilled over the warm-up bars,
+    but not over the margin, which falls outside of the backtest.
+    
+    Parameters
+    ----------
+    @data_handler: The DataHandler object, with its margin_bars.
+    @strategy: The Strategy (or LockstepStrategy) object.
+    @portfolio: The Portfolio object.
+    @warmup_bars: The number of bars of the backtest to skip after the margin, e.g. the warmup_bars of the strategy.
+    """
+    margin_bars = data_handler.margin_bars
+    
+    # Data handlers may skip fewer bars at once than asked for, e.g. only as many as they keep in memory
+    while margin_bars > 0 or warmup_bars > 0:
+        in_margin = margin_bars > 0
+        datetimes = data_handler.fast_forward(margin_bars if in_margin else warmup_bars)
+        if len(datetimes) == 0:
+            break
+        if not in_margin:
+            portfolio.backfill(datetimes)
+        if hasattr(strategy, 'warm_up'):
+            strategy.warm_up(len(datetimes))
+        if in_margin:
+            margin_bars -= len(datetimes)
+        warmup_bars -= len(datetimes)
+
+
+def _run_event_loop(data_handler, events, heartbeat, update_bars=None):
+    """
+    Runs the event loop of a backtest until the data handler runs out of bars. There are two while loops, the
+    outer-loop (heartbeat) and the nested inner-loop, which checks if there is an event in the Event Queue object.
+    The inner loop acts on the Event by calling the appropriate method of the appropriate object. For example,
+    upon receiving a:
+    
+     MarketEvent:
+         - The Strategy object is told to recalculate new Signals.
+         - The Portfolio object is told to reindex the time.
+     
+     SignalEvent:
+         - The Portfolio object is told to handle the new signal, converting it to a set of OrderEvents,
+           if appropriate. 
+    
+     OrderEvent:
+         - The Order is sent to the ExecutionHandler to be transmitted to the brokerage, if in a real
+           trading setting.
+    
+     FillEvent:
+         - The Portfolio object updates itself to be aware of the new positions.
+    
+    The Event Queue is continually being populated and depopulated with events. This is what it means for a 
+    system to be EVENT-DRIVEN.
+    
+    Parameters
+    ----------
+    @data_handler: The DataHandler object.
+    @events: The EventBus the handlers are subscribed to.
+    @heartbeat: The outer-loop "heartbeat" in seconds.
+    @update_bars: The callable pushing the next bar, by default data_handler.update_bars, e.g. profiled.
+    """
+    update_bars = update_bars or data_handler.update_bars
+    i = 0
+    
+    while True:
+        i += 1
+        logger.debug("Bar %s", i)
+        
+        # Update the market bars
+        if data_handler.continue_backtest == True:
+            update_bars()
+        else:
+            break
+        
+        # Handle the Events, dispatching each of them to the handlers subscribed to its kind
+        events.dispatch()
+        
+        # Pauses for a duration of heartbeat seconds
+        time.sleep(heartbeat)
+
+
+def _output_performance(portfolio, events, profiler):
+    """
+    Outputs the performance of a Portfolio along with the event counts and the profile of its backtest,
+    returning its summary statistics.
+    
+    Parameters
+    ----------
+    @portfolio: The Portfolio object.
+    @events: The EventBus of the backtest, with its counts of events.
+    @profiler: The Profiler of the backtest.
+    """
+    portfolio.create_equity_curve_dataframe()
+    
+    logger.info("Creating summary statistics...")
+    stats = portfolio.output_summary_stats()
+    
+    if portfolio.equity_curve is not None:
+        logger.info("Creating equity curve...")
+        print(portfolio.equity_curve.tail(10))
+    pprint.pprint(stats)
+    
+    print("Signals: %s" % events.counts.get(SIGNAL, 0))
+    print("Orders: %s" % events.counts.get(ORDER, 0))
+    print("Fills: %s" % events.counts.get(FILL, 0))
+    
+    profile = profiler.report(events.counts)
+    if profile is not None:
+        print("Profile:")
+        pprint.pprint(profile)
+    
+    return stats
+
+
 class Backtest(object):
     """
     Encapsulates the settings and components for carrying out an event-driven backtest.
@@ -43,9 +221,11 @@ class Backtest(object):
     """
     
     def __init__(self, csv_dir, symbol_list, initial_capital, heartbeat, start_date, end_date,
-                 data_handler, execution_handler, portfolio, strategy, strat_params_list=None):
+                 data_handler, execution_handler, portfolio, strategy, strat_params_list=None,
+                 data_handler_params=None, portfolio_params=None, event_bus=DequeEventBus, profiler=NullProfiler,
+                 warmup_margin=0):
         """
-        Initializes the Backtest. A Queue is used to hold the Events. The Signals, Orders, and Fills are counted.
+        Initializes the Backtest. An EventBus is used to hold the Events. The Signals, Orders, and Fills are counted.
         
         Parameters
         ----------
@@ -54,10 +234,21 @@ class Backtest(object):
         @initial_capital: The starting capital for the Portfolio.
         @heartbeat: The Backtester's outer-loop "heartbeat" in seconds.
         @start_date: The start datetime of the strategy.
+        @end_date: The end datetime of the strategy (inclusive), or None to run until the end of the data.
         @data_handler: (Class) Handles the market data feed.
         @execution_handler: (Class) Handles the orders/fills for trades.
         @portfolio: (Class) Keeps track of the portfolio current and prior positions.
         @strategy: (Class) Generates Signals based on market data.
+        @data_handler_params: An optional dictionary of extra keyword arguments for the DataHandler,
+            e.g. a BarCache via {'bar_cache': BarCache()}.
+        @portfolio_params: An optional dictionary of extra keyword arguments for the Portfolio,
+            e.g. {'keep_history': False} to only keep running performance statistics.
+        @event_bus: (Class) The EventBus holding the Events. The lock-free DequeEventBus suits historical
+            backtests, while the thread-safe QueueEventBus is required for live trading with the IBExecutionHandler.
+        @profiler: (Class) Instruments the event loop. The Profiler measures the time spent in each component
+            method, the event throughput and the peak depth of the EventBus, while the NullProfiler measures nothing.
+        @warmup_margin: The number of bars before start_date the DataHandler loads as well. They are only fed to the
+            strategy, so that its indicators are primed by the start of the backtest, and are never traded.
         """
         self.csv_dir = csv_dir
         self.symbol_list = symbol_list
@@ -65,6 +256,7 @@ class Backtest(object):
         self.heartbeat = heartbeat
         self.start_date = start_date
         self.end_date = end_date
+        self.warmup_margin = warmup_margin
         
         self.data_handler_class = data_handler
         self.execution_handler_class = execution_handler
@@ -72,12 +264,13 @@ class Backtest(object):
         self.strategy_class = strategy
         
         self.strat_params_list = strat_params_list
+        self.data_handler_params = _add_required_fields(data_handler, data_handler_params or {}, strategy, portfolio)
+        self.portfolio_params = portfolio_params or {}
         
-        self.events = queue.Queue()
+        self.event_bus_class = event_bus
+        self.events = event_bus()
+        self.profiler_class = profiler
         
-        self.signals = 0
-        self.orders = 0
-        self.fills = 0
         self.num_strats = 1
         
         # Call this in the initialization to populate the other classes with our data
@@ -90,96 +283,58 @@ class Backtest(object):
         
         This ties together all the other classes to the Backtester object.
         """
-        print("Creating DataHandler, Strategy, Portfolio, and ExecutionHandler for")
+        logger.info("Creating DataHandler, Strategy, Portfolio, and ExecutionHandler...")
 
         # Set internal data members equal to the classes we passed in earlier, along with necessary parameters.
         # https://softwareengineering.stackexchange.com/questions/131403/what-is-the-name-of-in-python/131415
-        self.data_handler = self.data_handler_class(self.events, self.csv_dir, self.symbol_list)
+        self.data_handler = self.data_handler_class(
+            self.events, self.csv_dir, self.symbol_list, start_date=self.start_date, end_date=self.end_date,
+            warmup_margin=self.warmup_margin, **self.data_handler_params
+        )
         self.strategy = self.strategy_class(self.data_handler, self.events)
-        self.portfolio = self.portfolio_class(self.data_handler, self.events, self.start_date, self.initial_capital)
+        self.portfolio = self.portfolio_class(
+            self.data_handler, self.events, self.start_date, self.initial_capital, **self.portfolio_params
+        )
         self.execution_handler = self.execution_handler_class(self.events) # The Event Queue sent to ExecutionHandler
         
+        # The dispatch table of the event loop, with each handler instrumented by the profiler
+        self.profiler = self.profiler_class()
+        self.profiler.watch(self.events)
+        profile = self.profiler.wrap
+        self.events.subscribe(MARKET, profile('strategy.calculate_signals', self.strategy.calculate_signals, MARKET))
+        self.events.subscribe(MARKET, profile('portfolio.update_timeindex', self.portfolio.update_timeindex, MARKET))
+        self.events.subscribe(SIGNAL, profile('portfolio.update_signal', self.portfolio.update_signal, SIGNAL))
+        self.events.subscribe(ORDER, profile('execution_handler.execute_order', self.execution_handler.execute_order, ORDER))
+        self.events.subscribe(FILL, profile('portfolio.update_fill', self.portfolio.update_fill, FILL))
+        
+    @property
+    def signals(self):
+        return self.events.counts.get(SIGNAL, 0)
+    
+    @property
+    def orders(self):
+        return self.events.counts.get(ORDER, 0)
+    
+    @property
+    def fills(self):
+        return self.events.counts.get(FILL, 0)
+    
     def _run_backtest(self):
         """
-        Executes the backtest. This is where the signal handling of the Backtesting engine is carried out.
-        There are two while loops, the outer-loop (heartbeat) and the nested inner-loop, which checks if there
-        is an event in the Event Queue object. The inner loop acts on the Event by calling the appropriate method
-        of the appropriate object. For example, upon receiving a:
-        
-         MarketEvent:
-             - The Strategy object is told to recalculate new Signals.
-             - The Portfolio object is told to reindex the time.
-         
-         SignalEvent:
-             - The Portfolio object is told to handle the new signal, converting it to a set of OrderEvents,
-               if appropriate. 
-        
-         OrderEvent:
-             - The Order is sent to the ExecutionHandler to be transmitted to the brokerage, if in a real
-               trading setting.
-        
-         FillEvent:
-             - The Portfolio object updates itself to be aware of the new positions.
-        
-        The Event Queue is continually being populated and depopulated with events. This is what it means for a 
-        system to be EVENT-DRIVEN.
+        Executes the backtest, fast-forwarding over the warm-up bars of the strategy and then running the event
+        loop (see _run_event_loop()) over the others.
         """
-        i = 0
-        
-        while True:
-            i += 1
-            print(i)
-            
-            # Update the market bars
-            if self.data_handler.continue_backtest == True:
-                self.data_handler.update_bars()
-            else:
-                break
-            
-            # Handle the Events
-            while True:
-                try:
-                    event = self.events.get(False)
-                except queue.Empty:
-                    break
-                else:
-                    # The inner-loop acts on the events by calling the appropriate method of the appropriate object
-                    if event is not None:
-                        if event.type == 'MARKET':
-                            self.strategy.calculate_signals(event)
-                            self.portfolio.update_timeindex(event)
-                            
-                        elif event.type == 'SIGNAL':
-                            self.signals += 1
-                            self.portfolio.update_signal(event)
-                            
-                        elif event.type == 'ORDER':
-                            self.orders += 1
-                            self.execution_handler.execute_order(event)
-                        
-                        elif event.type == 'FILL':
-                            self.fills += 1
-                            self.portfolio.update_fill(event)
-            
-            # Pauses for a duration of self.heartbeat seconds
-            time.sleep(self.heartbeat)
+        update_bars = self.profiler.wrap('data_handler.update_bars', self.data_handler.update_bars)
+        self.profiler.start()
+        _fast_forward(self.data_handler, self.strategy, self.portfolio, getattr(self.strategy, 'warmup_bars', 0))
+        _run_event_loop(self.data_handler, self.events, self.heartbeat, update_bars)
+        self.profiler.stop()
     
     def _output_performance(self):
         """
         Outputs the strategy performance and other metrics from the backtest.
         """
-        self.portfolio.create_equity_curve_dataframe()
-        
-        print("Creating summary statistics...")
-        stats = self.portfolio.output_summary_stats()
-        
-        print("Creating equity curve...")
-        print(self.portfolio.equity_curve.tail(10))
-        pprint.pprint(stats)
-        
-        print("Signals: %s" % self.signals)
-        print("Orders: %s" % self.orders)
-        print("Fills: %s" % self.fills)
+        return _output_performance(self.portfolio, self.events, self.profiler)
     
     def simulate_trading(self):
         """
@@ -219,9 +374,11 @@ class BacktestOptim(object):
     """
 
     def __init__(self, csv_dir, symbol_list, initial_capital, heartbeat, start_date,
-                 data_handler, execution_handler, portfolio, strategy, strat_params_list=None):
+                 data_handler, execution_handler, portfolio, strategy, strat_params_list=None,
+                 data_handler_params=None, portfolio_params=None, processes=1, share_data=True, results_path=DEFAULT_RESULTS_PATH,
+                 sweep_name=None, event_bus=DequeEventBus, profiler=NullProfiler, end_date=None, warmup_margin=0):
         """
-        Initializes the Backtest. A Queue is used to hold the Events. The Signals, Orders, and Fills are counted.
+        Initializes the Backtest. An EventBus is used to hold the Events. The Signals, Orders, and Fills are counted.
 
         Parameters
         ----------
@@ -234,12 +391,32 @@ class BacktestOptim(object):
         @execution_handler: (Class) Handles the orders/fills for trades.
         @portfolio: (Class) Keeps track of the portfolio current and prior positions.
         @strategy: (Class) Generates Signals based on market data.
+        @data_handler_params: An optional dictionary of extra keyword arguments for the DataHandler,
+            e.g. a BarCache via {'bar_cache': BarCache()}.
+        @portfolio_params: An optional dictionary of extra keyword arguments for the Portfolio,
+            e.g. {'keep_history': False} to only keep running performance statistics.
+        @processes: The number of worker processes to spread the parameter combinations across.
+            1 runs them serially in this process, None uses every CPU core.
+        @share_data: Whether a parallel sweep loads the market data once and shares it with the workers
+            through shared memory, rather than each worker loading its own copy.
+        @results_path: The path to the ResultStore database the results of the sweep are kept in.
+        @sweep_name: The name identifying the sweep within the ResultStore. Defaults to the strategy class name
+            followed by the symbols and a hash of the data directory, dates, capital, warm-up margin and portfolio.
+        @event_bus: (Class) The EventBus holding the Events. The lock-free DequeEventBus suits historical
+            backtests, while the thread-safe QueueEventBus is required for live trading with the IBExecutionHandler.
+        @profiler: (Class) Instruments the event loop. The Profiler measures the time spent in each component
+            method, the event throughput and the peak depth of the EventBus, while the NullProfiler measures nothing.
+        @end_date: The end datetime of the strategy (inclusive), or None to run until the end of the data.
+        @warmup_margin: The number of bars before start_date the DataHandler loads as well. They are only fed to the
+            strategy, so that its indicators are primed by the start of the backtest, and are never traded.
         """
         self.csv_dir = csv_dir
         self.symbol_list = symbol_list
         self.initial_capital = initial_capital
         self.heartbeat = heartbeat
         self.start_date = start_date
+        self.end_date = end_date
+        self.warmup_margin = warmup_margin
 
         self.data_handler_class = data_handler
         self.execution_handler_class = execution_handler
@@ -247,12 +424,25 @@ class BacktestOptim(object):
         self.strategy_class = strategy
 
         self.strat_params_list = strat_params_list
+        self.data_handler_params = _add_required_fields(data_handler, data_handler_params or {}, strategy, portfolio)
+        self.portfolio_params = portfolio_params or {}
+        self.processes = processes
+        self.share_data = share_data
+        self.results_path = results_path
+        self.sweep_name = sweep_name or _get_sweep_name(
+            strategy, symbol_list, csv_dir, initial_capital, start_date, end_date, warmup_margin, portfolio
+        )
+
+        self.event_bus_class = event_bus
+        self.events = event_bus()
+        self.profiler_class = profiler
 
-        self.events = queue.Queue()
+        # The data handler is loaded by the first combination of the sweep, then rewound for the others
+        self.data_handler = None
+
+        # The indicator series shared by the combinations of the sweep run in this process
+        self.indicator_cache = IndicatorCache()
 
-        self.signals = 0
-        self.orders = 0
-        self.fills = 0
         self.num_strats = 1
 
         # Call this in the initialization to populate the other classes with our data
@@ -265,97 +455,138 @@ class BacktestOptim(object):
 
         This ties together all the other classes to the Backtester object.
         """
-        print("Creating DataHandler, Strategy, Portfolio, and ExecutionHandler for")
-        print("strategy parameter list: %s..." % strategy_params_dict)
+        logger.info(
+            "Creating DataHandler, Strategy, Portfolio, and ExecutionHandler for strategy parameter list: %s...",
+            strategy_params_dict
+        )
+
+        # Every parameter combination starts from a clean slate, with a new EventBus and event counts
+        self.events = self.event_bus_class()
 
         # Set internal data members equal to the classes we passed in earlier, along with necessary parameters.
         # https://softwareengineering.stackexchange.com/questions/131403/what-is-the-name-of-in-python/131415
-        self.data_handler = self.data_handler_class(self.events, self.csv_dir, self.symbol_list)
-        self.strategy = self.strategy_class(self.data_handler, self.events, **strategy_params_dict)
-        self.portfolio = self.portfolio_class(self.data_handler, self.events, self.start_date, self.initial_capital)
+        # The data set is only loaded once per sweep (or worker process): handlers which can be rewound are reset
+        # onto the new EventBus, rather than re-reading the data for every combination.
+        if self.data_handler is not None and hasattr(self.data_handler, 'reset'):
+            self.data_handler.reset(self.events)
+        else:
+            self.data_handler = self.data_handler_class(
+                self.events, self.csv_dir, self.symbol_list, start_date=self.start_date, end_date=self.end_date,
+                warmup_margin=self.warmup_margin, **self.data_handler_params
+            )
+        strategy_params = dict(strategy_params_dict)
+        if getattr(self.strategy_class, 'uses_indicator_cache', False):
+            strategy_params.setdefault('indicator_cache', self.indicator_cache)
+        self.strategy = self.strategy_class(self.data_handler, self.events, **strategy_params)
+        self.portfolio = self.portfolio_class(
+            self.data_handler, self.events, self.start_date, self.initial_capital, **self.portfolio_params
+        )
         self.execution_handler = self.execution_handler_class(self.events)  # The Event Queue sent to ExecutionHandler
 
+        # The dispatch table of the event loop, with each handler instrumented by the profiler
+        self.profiler = self.profiler_class()
+        self.profiler.watch(self.events)
+        profile = self.profiler.wrap
+        self.events.subscribe(MARKET, profile('strategy.calculate_signals', self.strategy.calculate_signals, MARKET))
+        self.events.subscribe(MARKET, profile('portfolio.update_timeindex', self.portfolio.update_timeindex, MARKET))
+        self.events.subscribe(SIGNAL, profile('portfolio.update_signal', self.portfolio.update_signal, SIGNAL))
+        self.events.subscribe(ORDER, profile('execution_handler.execute_order', self.execution_handler.execute_order, ORDER))
+        self.events.subscribe(FILL, profile('portfolio.update_fill', self.portfolio.update_fill, FILL))
+
+    @property
+    def signals(self):
+        return self.events.counts.get(SIGNAL, 0)
+
+    @property
+    def orders(self):
+        return self.events.counts.get(ORDER, 0)
+
+    @property
+    def fills(self):
+        return self.events.counts.get(FILL, 0)
+
     def _run_backtest(self):
         """
-        Executes the backtest. This is where the signal handling of the Backtesting engine is carried out.
-        There are two while loops, the outer-loop (heartbeat) and the nested inner-loop, which checks if there
-        is an event in the Event Queue object. The inner loop acts on the Event by calling the appropriate method
-        of the appropriate object. For example, upon receiving a:
-
-         MarketEvent:
-             - The Strategy object is told to recalculate new Signals.
-             - The Portfolio object is told to reindex the time.
-
-         SignalEvent:
-             - The Portfolio object is told to handle the new signal, converting it to a set of OrderEvents,
-               if appropriate.
-
-         OrderEvent:
-             - The Order is sent to the ExecutionHandler to be transmitted to the brokerage, if in a real
-               trading setting.
-
-         FillEvent:
-             - The Portfolio object updates itself to be aware of the new positions.
-
-        The Event Queue is continually being populated and depopulated with events. This is what it means for a
-        system to be EVENT-DRIVEN.
-        """
-        i = 0
-
-        while True:
-            i += 1
-            print(i)
-
-            # Update the market bars
-            if self.data_handler.continue_backtest == True:
-                self.data_handler.update_bars()
-            else:
-                break
-
-            # Handle the Events
-            while True:
-                try:
-                    event = self.events.get(False)
-                except queue.Empty:
-                    break
-                else:
-                    # The inner-loop acts on the events by calling the appropriate method of the appropriate object
-                    if event is not None:
-                        if event.type == 'MARKET':
-                            self.strategy.calculate_signals(event)
-                            self.portfolio.update_timeindex(event)
-
-                        elif event.type == 'SIGNAL':
-                            self.signals += 1
-                            self.portfolio.update_signal(event)
-
-                        elif event.type == 'ORDER':
-                            self.orders += 1
-                            self.execution_handler.execute_order(event)
-
-                        elif event.type == 'FILL':
-                            self.fills += 1
-                            self.portfolio.update_fill(event)
-
-            # Pauses for a duration of self.heartbeat seconds
-            time.sleep(self.heartbeat)
+        Executes the backtest of the current combination, fast-forwarding over the warm-up bars of the strategy
+        and then running the event loop (see _run_event_loop()) over the others.
+        """
+        update_bars = self.profiler.wrap('data_handler.update_bars', self.data_handler.update_bars)
+        self.profiler.start()
+        _fast_forward(self.data_handler, self.strategy, self.portfolio, getattr(self.strategy, 'warmup_bars', 0))
+        _run_event_loop(self.data_handler, self.events, self.heartbeat, update_bars)
+        self.profiler.stop()
 
     def _output_performance(self):
         """
-        Outputs the strategy performance and other metrics from the backtest.
+        Outputs the strategy performance and other metrics from the backtest, returning its summary statistics.
         """
-        self.portfolio.create_equity_curve_dataframe()
+        return _output_performance(self.portfolio, self.events, self.profiler)
 
-        print("Creating summary statistics...")
-        stats = self.portfolio.output_summary_stats()
+    def _get_settings(self, data_handler, data_handler_params):
+        """
+        Returns the keyword arguments required to recreate this sweep in a worker process, for a given
+        data handler class and its parameters.
+        """
+        return dict(
+            csv_dir=self.csv_dir, symbol_list=self.symbol_list, initial_capital=self.initial_capital,
+            heartbeat=self.heartbeat, start_date=self.start_date, data_handler=data_handler,
+            execution_handler=self.execution_handler_class, portfolio=self.portfolio_class,
+            strategy=self.strategy_class, data_handler_params=data_handler_params,
+            portfolio_params=self.portfolio_params, event_bus=self.event_bus_class, profiler=self.profiler_class,
+            end_date=self.end_date, warmup_margin=self.warmup_margin
+        )
+
+    def _simulate_params(self, strategy_params_dict):
+        """
+        Runs the backtest of a single parameter combination, returning its summary statistics.
+        """
+        self._generate_trading_instances(strategy_params_dict)
+        self._run_backtest()
+        return self._output_performance()
 
-        print("Creating equity curve...")
-        print(self.portfolio.equity_curve.tail(10))
-        pprint.pprint(stats)
+    def _iter_results(self, strat_params_list):
+        """
+        Yields (index, parameter combination, summary statistics) for every combination of a list,
+        as each of them finishes.
 
-        print("Signals: %s" % self.signals)
-        print("Orders: %s" % self.orders)
-        print("Fills: %s" % self.fills)
+        When running in parallel, a pool of worker processes each recreate the sweep and run the combinations
+        they are handed on their own event queue. The market data is loaded once and published to shared memory
+        for the workers to attach to, unless the data handler is not columnar or is memory-mapped already (in
+        which case the operating system shares the pages between the processes anyway).
+        """
+        spl = len(strat_params_list)
+        if spl == 0:
+            return
+        if self.processes == 1:
+            for i, sp in enumerate(strat_params_list):  # http://book.pythontips.com/en/latest/enumerate.html
+                logger.info("Strategy %s out of %s...", i + 1, spl)
+                yield i, sp, self._simulate_params(sp)
+            return
+
+        shared_bars = None
+        settings = self._get_settings(self.data_handler_class, self.data_handler_params)
+        if (self.share_data and issubclass(self.data_handler_class, ColumnarDataHandler) and
+                not issubclass(self.data_handler_class, (MemmapDataHandler, SharedMemoryDataHandler))):
+            bars = self.data_handler_class(
+                self.events, self.csv_dir, self.symbol_list, start_date=self.start_date, end_date=self.end_date,
+                warmup_margin=self.warmup_margin, **self.data_handler_params
+            )
+            shared_bars = bars.share()
+            del bars
+            settings = self._get_settings(SharedMemoryDataHandler, {'shared_bars': shared_bars.descriptor})
+
+        pool = multiprocessing.Pool(self.processes, _init_worker, (settings,))
+        try:
+            for result in pool.imap_unordered(_simulate_worker, list(enumerate(strat_params_list))):
+                yield result
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+            if shared_bars is not None:
+                shared_bars.close()
 
     def simulate_trading(self):
         """
@@ -364,38 +595,189 @@ class BacktestOptim(object):
         Loops over all variants of strategy parameters of a space generated by a cartesian product
         of hyperparameter values. Generates new instances of all the data handlers, event queues, and portfolio
         objects upon each iteration, in order to ensure a "clean slate" for each trading instance on every
-        simulation.
+        simulation. With processes other than 1, the variants are spread across a pool of worker processes.
 
-        The parameter combinations and their performance metrics are stored in an output CSV file, which will
-        subsequently be used to plot performance characteristics.
+        The parameter combinations and their performance metrics are stored in a ResultStore as each combination
+        finishes, which will subsequently be used to plot performance characteristics. Combinations already in the
+        store are skipped, so an interrupted sweep resumes where it left off when it is rerun.
         """
-        # Create the file output stream
-        posix_now = datetime.datetime.timestamp(datetime.datetime.now())
-        out_path = os.getcwd() + "/OutputResults/backtest_{}".format(posix_now)[:-7:] + ".csv"
+        results = ResultStore(self.results_path)
+        try:
+            todo = [sp for sp in self.strat_params_list if not results.has(self.sweep_name, sp)]
+            if len(todo) < len(self.strat_params_list):
+                logger.info("Skipping %s completed parameter combinations...", len(self.strat_params_list) - len(todo))
 
-        out = open(out_path, "w+")
+            for i, sp, stats in self._iter_results(todo):
+                results.add(self.sweep_name, sp, stats)
+        finally:
+            results.close()
 
-        spl = len(self.strat_params_list)
-        for i, sp in enumerate(self.strat_params_list):  # http://book.pythontips.com/en/latest/enumerate.html
-            print("Strategy %s out of %s..." % (i + 1, spl))
-            self._generate_trading_instances(sp)
-            self._run_backtest()
-            stats = self._output_performance()
-            pprint.pprint(stats)
 
-            tot_ret = float(stats[0][1].replace("%", ""))
-            cagr = float(stats[1][1].replace("%", ""))
-            sharpe = float(stats[2][1])
-            max_dd = float(stats[3][1].replace("%", ""))
-            dd_dur = int(stats[4][1])
+# In[6]:
 
-            # This should be more general in future implementations...
-            out.write(
-                "%s,%s,%s,%s,%s,%s,%s,%s\n" % (sp["ols_window"], sp["zscore_high"], sp["zscore_low"],
-                                               tot_ret, cagr, sharpe, max_dd, dd_dur)
-            )
+# Each worker process of a parallel sweep holds its own BacktestOptim, created once by the pool initializer.
+_worker_backtest = None
+
+
+def _init_worker(settings):
+    """
+    Creates the BacktestOptim of a worker process from the settings of the parent sweep.
+    """
+    global _worker_backtest
+    _worker_backtest = BacktestOptim(**settings)
+
+
+def _simulate_worker(task):
+    """
+    Runs a single (index, parameter combination) task of a parallel sweep within a worker process.
+    """
+    i, sp = task
+    return i, sp, _worker_backtest._simulate_params(sp)
+
+
+# In[7]:
+
+class BacktestLockstep(object):
+    """
+    Evaluates a whole list of strategy parameter combinations in a single pass over the market data, rather than
+    running one full event loop per combination as BacktestOptim does.
+
+    A LockstepStrategy keeps the state of every combination in arrays along a parameter axis, and a
+    PortfolioLockstep tracks a matrix of positions with one row per combination. Orders are sized and filled
+    as the naive Portfolio and the SimulatedExecutionHandler would, so the summary statistics of each combination
+    are those BacktestOptim produces, and they are stored in the same ResultStore sweep.
+    """
 
-        out.close()
+    def __init__(self, csv_dir, symbol_list, initial_capital, heartbeat, start_date,
+                 data_handler, portfolio, strategy, strat_params_list=None,
+                 data_handler_params=None, results_path=DEFAULT_RESULTS_PATH, sweep_name=None,
+                 event_bus=DequeEventBus, end_date=None, warmup_margin=0):
+        """
+        Initializes the lockstep Backtest. The Signals, Orders, and Fills are counted for each combination.
+
+        Parameters
+        ----------
+        @csv_dir: The hard root to the CSV data directory.
+        @symbol_list: The list of symbol strings.
+        @initial_capital: The starting capital for the Portfolio of each combination.
+        @heartbeat: The Backtester's outer-loop "heartbeat" in seconds.
+        @start_date: The start datetime of the strategy.
+        @data_handler: (Class) Handles the market data feed.
+        @portfolio: (Class) A PortfolioLockstep, tracking the portfolios of every combination.
+        @strategy: (Class) A LockstepStrategy, generating the signals of every combination.
+        @strat_params_list: The list of strategy parameter dictionaries, as for BacktestOptim.
+        @data_handler_params: An optional dictionary of extra keyword arguments for the DataHandler.
+        @results_path: The path to the ResultStore database the results of the sweep are kept in.
+        @sweep_name: The name identifying the sweep within the ResultStore. Defaults to the name BacktestOptim
+            uses for the equivalent strategy and portfolio with the same settings, so that both fill in the same sweep.
+        @event_bus: (Class) The EventBus holding the Events. The lock-free DequeEventBus suits historical
+            backtests, while the thread-safe QueueEventBus is required for live trading with the IBExecutionHandler.
+        @end_date: The end datetime of the strategy (inclusive), or None to run until the end of the data.
+        @warmup_margin: The number of bars before start_date the DataHandler loads as well. As with BacktestOptim,
+            they are only fed to the strategy, so that its indicators are primed by the start of the backtest.
+        """
+        self.csv_dir = csv_dir
+        self.symbol_list = symbol_list
+        self.initial_capital = initial_capital
+        self.heartbeat = heartbeat
+        self.start_date = start_date
+        self.end_date = end_date
+        self.warmup_margin = warmup_margin
+
+        self.data_handler_class = data_handler
+        self.portfolio_class = portfolio
+        self.strategy_class = strategy
+
+        self.strat_params_list = strat_params_list
+        self.data_handler_params = _add_required_fields(data_handler, data_handler_params or {}, strategy, portfolio)
+        self.results_path = results_path
+        self.sweep_name = sweep_name or _get_sweep_name(
+            strategy, symbol_list, csv_dir, initial_capital, start_date, end_date, warmup_margin, portfolio
+        )
+
+        self.event_bus_class = event_bus
+        self.events = event_bus()
+
+    def _generate_trading_instances(self, strat_params_list):
+        """
+        Generates the DataHandler, LockstepStrategy and PortfolioLockstep for a list of parameter combinations.
+        """
+        logger.info("Creating DataHandler, Strategy, and Portfolio for %s parameter combinations...", len(strat_params_list))
+
+        n_variants = len(strat_params_list)
+        self.events = self.event_bus_class()
+        self.signals = np.zeros(n_variants, dtype=np.int64)
+        self.orders = np.zeros(n_variants, dtype=np.int64)
+        self.fills = np.zeros(n_variants, dtype=np.int64)
+
+        self.data_handler = self.data_handler_class(
+            self.events, self.csv_dir, self.symbol_list, start_date=self.start_date, end_date=self.end_date,
+            warmup_margin=self.warmup_margin, **self.data_handler_params
+        )
+        self.strategy = self.strategy_class(self.data_handler, self.events, strat_params_list)
+        self.portfolio = self.portfolio_class(self.data_handler, self.start_date, n_variants, self.initial_capital)
+
+        # Only MarketEvents flow through the EventBus of a lockstep backtest
+        self.events.subscribe(MARKET, self.update_lockstep)
+
+    def update_lockstep(self, event):
+        """
+        Handles a MarketEvent: the strategy calculates the signal directions of every combination, then the
+        portfolio records its totals and fills the resulting orders, in the same order as the event loop of
+        a Backtest would.
+        """
+        directions = self.strategy.calculate_signals(event)
+        self.portfolio.update_timeindex(event)
+
+        orders = self.portfolio.update_signals(self.strategy.signal_symbols, directions)
+        self.signals += np.count_nonzero(directions, axis=1)
+        self.orders += orders
+        self.fills += orders
+
+    def _run_backtest(self):
+        """
+        Executes the lockstep backtest, one pass over the market data for every combination.
+
+        Only the bars loaded before start_date as a warm-up margin are fast-forwarded, as by BacktestOptim. The
+        warm-up period of the strategy itself is drip-fed: the signals of every combination are missing over it,
+        so recording the totals bar by bar is equivalent to the backfill of BacktestOptim.
+        """
+        _fast_forward(self.data_handler, self.strategy, self.portfolio)
+        _run_event_loop(self.data_handler, self.events, self.heartbeat)
+
+    def _output_performance(self, strat_params_list):
+        """
+        Outputs the performance and other metrics of every combination, returning their summary statistics.
+        """
+        logger.info("Creating summary statistics...")
+        stats_list = self.portfolio.output_summary_stats()
+
+        for v, (sp, stats) in enumerate(zip(strat_params_list, stats_list)):
+            print("Strategy parameter list: %s" % sp)
+            pprint.pprint(stats)
+            print("Signals: %s, Orders: %s, Fills: %s" % (self.signals[v], self.orders[v], self.fills[v]))
+
+        return stats_list
+
+    def simulate_trading(self):
+        """
+        Simulates every parameter combination at once and stores their performance metrics in the ResultStore.
+        Combinations already in the store are skipped.
+        """
+        results = ResultStore(self.results_path)
+        try:
+            todo = [sp for sp in self.strat_params_list if not results.has(self.sweep_name, sp)]
+            if len(todo) < len(self.strat_params_list):
+                logger.info("Skipping %s completed parameter combinations...", len(self.strat_params_list) - len(todo))
+            if len(todo) == 0:
+                return
+
+            self._generate_trading_instances(todo)
+            self._run_backtest()
+            for sp, stats in zip(todo, self._output_performance(todo)):
+                results.add(self.sweep_name, sp, stats)
+        finally:
+            results.close()
 
 
 
@@ -0,0 +1,195 @@
+
+# coding: utf-8
+
+# In[1]:
+
+# BarCache
+
+from __future__ import print_function
+
+import glob
+import hashlib
+import os, os.path
+
+import numpy as np
+
+from EventDrivenBacktester.BarStore import BarStore, read_csv_bars
+
+
+# In[2]:
+
+class BarCache(object):
+    """
+    BarCache is a persistent, on-disk cache of parsed bar files. The first load of a CSV file parses the text
+    as usual and writes the resulting columns to a binary .npz file. Subsequent loads read the columns back
+    directly, skipping the text parsing and date inference of pandas.read_csv completely.
+
+    Each entry is keyed by the absolute path of the source file, its size and its modification time (along
+    with the column names used to parse it), so that editing or replacing a CSV file automatically invalidates
+    its stale entry. Entries are evicted in least-recently-used order once the cache outgrows max_size.
+    """
+
+    def __init__(self, cache_dir=None, max_size=512 * 1024 * 1024):
+        """
+        Initializes the cache.
+
+        Parameters
+        ----------
+        @cache_dir: The directory to hold the cached files. Defaults to a '.barcache' directory next to each CSV file.
+        @max_size: The maximum total size of the cached files in bytes, or None for no limit.
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    def _get_cache_dir(self, csv_path):
+        """
+        Returns the directory holding the cached entries for a given CSV file.
+        """
+        if self.cache_dir is not None:
+            return self.cache_dir
+        return os.path.join(os.path.dirname(os.path.abspath(csv_path)), '.barcache')
+
+    def _get_path_key(self, csv_path):
+        """
+        Returns the part of the cache key identifying the source file by its absolute path.
+        """
+        return hashlib.sha1(os.path.abspath(csv_path).encode('utf-8')).hexdigest()[:16]
+
+    def _get_entry_path(self, csv_path, names):
+        """
+        Returns the path of the cached entry for the current version of a CSV file.
+        """
+        st = os.stat(csv_path)
+        stamp = "%s|%s|%s" % (st.st_size, st.st_mtime_ns, ",".join(names))
+        stamp_key = hashlib.sha1(stamp.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(
+            self._get_cache_dir(csv_path), "%s_%s.npz" % (self._get_path_key(csv_path), stamp_key)
+        )
+
+    def load(self, csv_path, names):
+        """
+        Returns the cached BarStore for a CSV file, or None if there is no up-to-date entry.
+
+        Parameters
+        ----------
+        @csv_path: The path to the CSV file.
+        @names: The column names of the file, the first one being the datetime index.
+        """
+        entry_path = self._get_entry_path(csv_path, names)
+        try:
+            with np.load(entry_path, allow_pickle=False) as npz:
+                index = npz['__index__'].view('datetime64[ns]')
+                columns = dict((f, npz[f]) for f in npz.files if f != '__index__')
+        except (IOError, OSError, KeyError, ValueError):
+            return None
+
+        # Mark the entry as recently used for the eviction policy. A concurrent evict() may have removed the
+        # file since it was read, which leaves the loaded columns valid
+        try:
+            os.utime(entry_path, None)
+        except OSError:
+            pass
+        return BarStore(index, columns)
+
+    def store(self, csv_path, names, bars):
+        """
+        Writes a BarStore to the cache as the entry for the current version of a CSV file, replacing
+        any stale entries for the same file.
+
+        Parameters
+        ----------
+        @csv_path: The path to the CSV file.
+        @names: The column names of the file, the first one being the datetime index.
+        @bars: The BarStore parsed from the file.
+        """
+        entry_path = self._get_entry_path(csv_path, names)
+        cache_dir = os.path.dirname(entry_path)
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+        self.invalidate(csv_path)
+
+        # Write to a temporary file first so that a concurrent reader never sees a partial entry
+        tmp_path = entry_path + '.tmp%s' % os.getpid()
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, __index__=bars.index.view('int64'), **bars.columns)
+        os.replace(tmp_path, entry_path)
+
+        self.evict(cache_dir, keep=entry_path)
+
+    def get(self, csv_path, names):
+        """
+        Returns the BarStore for a CSV file, reading it from the cache when possible and otherwise
+        parsing the file and caching the result.
+
+        Parameters
+        ----------
+        @csv_path: The path to the CSV file.
+        @names: The column names of the file, the first one being the datetime index.
+        """
+        bars = self.load(csv_path, names)
+        if bars is None:
+            bars = read_csv_bars(csv_path, names)
+            self.store(csv_path, names, bars)
+        return bars
+
+    def invalidate(self, csv_path=None):
+        """
+        Removes the cached entries for a CSV file, or every entry of the cache if no file is given.
+
+        Parameters
+        ----------
+        @csv_path: The path to the CSV file, or None.
+        """
+        if csv_path is None:
+            if self.cache_dir is None:
+                raise ValueError("A csv_path is required to invalidate a cache kept next to the CSV files.")
+            pattern = os.path.join(self.cache_dir, '*.npz')
+        else:
+            pattern = os.path.join(self._get_cache_dir(csv_path), '%s_*.npz' % self._get_path_key(csv_path))
+
+        for entry_path in glob.glob(pattern):
+            try:
+                os.remove(entry_path)
+            except OSError:
+                pass  # Removed by a concurrent process
+
+    def evict(self, cache_dir, keep=None):
+        """
+        Removes the least-recently-used entries of a cache directory until its total size is within max_size.
+        The entry at keep is never removed, so that an entry larger than max_size still survives the store()
+        which wrote it, until the next entry is stored.
+
+        Parameters
+        ----------
+        @cache_dir: The cache directory to evict entries from.
+        @keep: The path of an entry to keep, e.g. the one just written.
+        """
+        if self.max_size is None:
+            return
+
+        entries = []
+        for entry_path in glob.glob(os.path.join(cache_dir, '*.npz')):
+            try:
+                st = os.stat(entry_path)
+            except OSError:
+                continue  # Removed by a concurrent process
+            entries.append((st.st_mtime, st.st_size, entry_path))
+
+        total = sum(e[1] for e in entries)
+        for _, size, entry_path in sorted(entries):
+            if total <= self.max_size:
+                break
+            if entry_path == keep:
+                continue
+            try:
+                os.remove(entry_path)
+            except OSError:
+                pass
+            total -= size
+
+
+# In[ ]:
+
+
+
@@ -0,0 +1,226 @@
+
+# coding: utf-8
+
+# In[1]:
+
+# BarStore
+
+from __future__ import print_function
+
+import numpy as np
+import pandas as pd
+
+
+# In[2]:
+
+class BarStore(object):
+    """
+    BarStore holds the full bar history of a single symbol in a columnar layout: one contiguous, read-only
+    float64 NumPy array per field (open, high, low, close, ...) plus a datetime64 index of the same length.
+
+    A DataHandler only has to keep a cursor into the store in order to drip-feed the bars. The last N values
+    of a field are then a plain slice of the column, i.e. a zero-copy view instead of a freshly built array.
+    """
+
+    def __init__(self, index, columns, updated=None):
+        """
+        Initializes the store from an index and a dictionary of columns.
+
+        Parameters
+        ----------
+        @index: A sorted array-like of timestamps, one per bar.
+        @columns: A dictionary of field name -> array-like of bar values, each the same length as the index.
+        @updated: An optional boolean array-like marking the bars at which the symbol actually traded, as opposed
+            to those padded forward onto a shared timeline. None if every bar is an actual one.
+        """
+        self.index = np.asarray(index, dtype='datetime64[ns]')
+        self.fields = tuple(columns)
+        self.columns = {}
+        self.updated = None
+
+        if updated is not None:
+            self.updated = np.asarray(updated, dtype=np.bool_)
+            if len(self.updated) != len(self.index):
+                raise ValueError("The updated mask has %s bars, but the index has %s." % (len(self.updated), len(self.index)))
+            self.updated.flags.writeable = False
+
+        for f in self.fields:
+            col = np.ascontiguousarray(columns[f], dtype=np.float64)
+            if len(col) != len(self.index):
+                raise ValueError("Column '%s' has %s bars, but the index has %s." % (f, len(col), len(self.index)))
+            # Strategies receive views of these arrays, so guard the underlying data against writes
+            col.flags.writeable = False
+            self.columns[f] = col
+
+    def __len__(self):
+        return len(self.index)
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """
+        Creates a BarStore from a pandas DataFrame indexed on datetime, with one column per field.
+        """
+        return cls(df.index, dict((f, df[f].values) for f in df.columns))
+
+    def reindex_pad(self, index):
+        """
+        Conforms the store to a new (sorted) index, padding missing bars forward with the last known
+        values. This is the columnar equivalent of DataFrame.reindex(index, method='pad'): timestamps
+        before the first bar of the symbol are filled with NaN.
+
+        Returns the store itself, without copying, if the index is unchanged.
+
+        Parameters
+        ----------
+        @index: A sorted array-like of timestamps to conform to.
+        """
+        index = np.asarray(index, dtype='datetime64[ns]')
+        if len(index) == len(self.index) and np.array_equal(index, self.index):
+            return self
+
+        # Position of the last bar at or before each new timestamp, -1 if there is none
+        pos = np.searchsorted(self.index, index, side='right') - 1
+        missing = pos < 0
+        pos[missing] = 0
+
+        columns = {}
+        for f in self.fields:
+            col = self.columns[f].take(pos) if len(self.index) else np.zeros(len(index))
+            col[missing] = np.nan
+            columns[f] = col
+        return BarStore(index, columns)
+
+    def slice(self, start, stop):
+        """
+        Returns the bars from position start up to (excluding) stop as a new store, whose columns are views
+        of this store's columns rather than copies.
+
+        Returns the store itself if the slice covers all of it.
+        """
+        if start <= 0 and stop >= len(self.index):
+            return self
+        return BarStore(
+            self.index[start:stop], dict((f, self.columns[f][start:stop]) for f in self.fields),
+            None if self.updated is None else self.updated[start:stop]
+        )
+
+    def get_datetime(self, i):
+        """
+        Returns the timestamp of the i-th bar as a pandas Timestamp.
+        """
+        return pd.Timestamp(self.index[i])
+
+    def get_bar(self, i):
+        """
+        Returns the i-th bar as a (timestamp, pandas Series) tuple, the same form yielded by DataFrame.iterrows().
+        This is intended for the occasional whole-bar lookup; hot paths should read the columns directly.
+        """
+        dt = self.get_datetime(i)
+        return dt, pd.Series([self.columns[f][i] for f in self.fields], index=self.fields, name=dt)
+
+
+# In[3]:
+
+def merge_timelines(indexes):
+    """
+    Returns the union of several sorted timelines as a single sorted datetime64 array without duplicates.
+
+    The timelines are concatenated and merged with a stable sort, which detects the already sorted runs and
+    merges them in O(N log k) for k timelines, rather than sorting the N timestamps from scratch.
+
+    Parameters
+    ----------
+    @indexes: A list of sorted array-likes of timestamps.
+    """
+    if not indexes:
+        return np.array([], dtype='datetime64[ns]')
+    merged = np.sort(
+        np.concatenate([np.asarray(index, dtype='datetime64[ns]') for index in indexes]), kind='mergesort'
+    )
+    if len(merged) == 0:
+        return merged
+    keep = np.empty(len(merged), dtype=np.bool_)
+    keep[0] = True
+    np.not_equal(merged[1:], merged[:-1], out=keep[1:])
+    return merged[keep]
+
+
+def align_bar_stores(stores, index):
+    """
+    Aligns a dictionary of BarStore objects onto a shared sorted timeline, e.g. the one returned by
+    merge_timelines(), returning a dictionary of aligned stores.
+
+    Each bar of the timeline takes the values of the latest bar of the symbol at or before it, as with
+    reindex_pad(), and NaN before the first bar of the symbol. Rather than reindexing every symbol on its own,
+    each field is forward-filled for all the symbols at once as a single 2-D (symbol, bar) array. Each aligned
+    store also records an updated mask, marking the bars at which the symbol actually traded.
+
+    The timeline may be a window of the bars of the stores: earlier bars are only used to pad the start of
+    the window, and later ones are dropped. All the stores must have the same fields.
+
+    Parameters
+    ----------
+    @stores: A dictionary of symbol -> BarStore.
+    @index: A sorted array-like of timestamps to align the stores to.
+    """
+    index = np.asarray(index, dtype='datetime64[ns]')
+    symbols = list(stores)
+    if not symbols:
+        return {}
+    fields = stores[symbols[0]].fields
+    n_bars = len(index)
+
+    # Column 0 holds the latest bar of each symbol before the timeline starts, which pads the first bars
+    values = dict((f, np.full((len(symbols), n_bars + 1), np.nan)) for f in fields)
+    updated = np.zeros((len(symbols), n_bars + 1), dtype=np.bool_)
+    if n_bars > 0:
+        for j, s in enumerate(symbols):
+            store = stores[s]
+            if store.fields != fields:
+                raise ValueError("%s has the fields %s, but %s has %s." % (s, store.fields, symbols[0], fields))
+            lo = np.searchsorted(store.index, index[0], side='left')
+            hi = np.searchsorted(store.index, index[-1], side='right')
+            pos = np.searchsorted(index, store.index[lo:hi], side='left') + 1
+            updated[j, pos] = True
+            for f in fields:
+                values[f][j, pos] = store.columns[f][lo:hi]
+            if lo > 0:
+                updated[j, 0] = True
+                for f in fields:
+                    values[f][j, 0] = store.columns[f][lo - 1]
+
+    # Forward fill: every bar points at the latest updated bar of its symbol at or before it
+    fill = np.where(updated, np.arange(n_bars + 1), 0)
+    np.maximum.accumulate(fill, axis=1, out=fill)
+    filled = dict((f, np.take_along_axis(values[f], fill, axis=1)) for f in fields)
+
+    # The rows of the 2-D arrays are contiguous, so each aligned store views its row without copying it
+    return dict(
+        (s, BarStore(index, dict((f, filled[f][j, 1:]) for f in fields), updated[j, 1:]))
+        for j, s in enumerate(symbols)
+    )
+
+
+# The column names of the intraday CSV files, the first one being the datetime index
+INTRADAY_NAMES = ['datetime', 'open', 'low', 'high', 'close', 'volume', 'oi']
+
+
+def read_csv_bars(csv_path, names):
+    """
+    Reads a CSV file of bars indexed on datetime into a BarStore, sorted by time.
+
+    Parameters
+    ----------
+    @csv_path: The path to the CSV file.
+    @names: The column names of the file, the first one being the datetime index.
+    """
+    df = pd.read_csv(
+        csv_path, header=0, index_col=0, parse_dates=True, names=names
+    ).sort_index()
+    return BarStore.from_dataframe(df)
+
+
+# In[ ]:
+
+
+
@@ -8,13 +8,22 @@
 from __future__ import print_function
 
 from abc import ABCMeta, abstractmethod
+from collections import deque
 import datetime
 import os, os.path
 
 import numpy as np
 import pandas as pd
 
-from EventDrivenBacktester.EventClasses import MarketEvent
+from EventDrivenBacktester.BacktestLogging import get_logger
+from EventDrivenBacktester.BarStore import INTRADAY_NAMES, align_bar_stores, merge_timelines, read_csv_bars
+from EventDrivenBacktester.EventClasses import market_event
+from EventDrivenBacktester.MemmapBars import open_memmap_bars
+from EventDrivenBacktester.ParquetBars import open_parquet_bars
+from EventDrivenBacktester.SharedBars import SharedBarSet, attach_shared_bars
+from EventDrivenBacktester.StreamingBars import BarRing, ChunkReader, iter_aligned_chunks
+
+logger = get_logger('data')
 
 # Useful links for Abstract Base Classes and decorators:
 # https://docs.python.org/3/library/abc.html
@@ -22,6 +31,55 @@ from EventDrivenBacktester.EventClasses import MarketEvent
 # https://realpython.com/blog/python/primer-on-python-decorators/
 
 
+def _get_window(index, start_date=None, end_date=None, warmup_margin=0):
+    """
+    Locates the bars of a sorted timeline which fall within [start_date, end_date] by binary search, returning
+    the (first, stop) positions of the slice to load along with the number of its bars before start_date.
+    
+    Parameters
+    ----------
+    @index: The sorted timeline of the data set.
+    @start_date: The first datetime of the backtest, or None to start from the first bar.
+    @end_date: The last datetime of the backtest (inclusive), or None to run until the last bar.
+    @warmup_margin: The number of bars before start_date to keep as well, so that the indicators of the
+        strategy are already primed when the backtest starts.
+    """
+    index = np.asarray(index, dtype='datetime64[ns]')
+    start, stop = 0, len(index)
+    if start_date is not None:
+        start = int(np.searchsorted(index, pd.Timestamp(start_date).to_datetime64(), side='left'))
+    if end_date is not None:
+        stop = int(np.searchsorted(index, pd.Timestamp(end_date).to_datetime64(), side='right'))
+    start = min(start, stop)
+    first = max(start - warmup_margin, 0)
+    return first, stop, start - first
+
+
+def _get_file_stamps(paths):
+    """
+    Returns the (path, size, mtime_ns) of each of the given files, and of every file within the given
+    directories, identifying the version of the data set they hold as the BarCache entries do.
+    Missing paths are skipped.
+    
+    Parameters
+    ----------
+    @paths: The list of file or directory paths.
+    """
+    stamps = []
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(os.path.join(root, f) for root, _, names in os.walk(path) for f in names)
+        else:
+            files = [path]
+        for f in files:
+            try:
+                st = os.stat(f)
+            except OSError:
+                continue
+            stamps.append((os.path.abspath(f), st.st_size, st.st_mtime_ns))
+    return tuple(stamps)
+
+
 # In[5]:
 
 class DataHandler(object):
@@ -45,6 +103,13 @@ class DataHandler(object):
     
     __metaclass__ = ABCMeta
     
+    # The number of bars loaded before the start date of the backtest, as a warm-up margin for the strategy
+    margin_bars = 0
+    
+    # Whether the handler takes a fields keyword argument and only loads the fields given, in which case the
+    # Backtest passes it those the strategy and portfolio read
+    projects_fields = False
+    
     @abstractmethod
     def get_latest_bar(self, symbol):
         """
@@ -93,6 +158,227 @@ class DataHandler(object):
         Provides a 'drip-feed' mechanism for placing bar information into the bars_queue data structure.
         """
         raise NotImplementedError("Missing implementation for update_bars()")
+    
+    @abstractmethod
+    def register_indicator(self, symbol, indicator):
+        """
+        Registers a streaming Indicator for a symbol, e.g. the moving averages of a strategy. The indicator
+        is fed any bars already drip-fed to the system straight away, and then each new bar as it arrives
+        (including those of a fast-forward). Returns the indicator.
+        """
+        raise NotImplementedError("Missing implementation for register_indicator()")
+    
+    def get_latest_bar_updated(self, symbol):
+        """
+        Returns whether the symbol actually traded at the last bar, rather than having its previous bar
+        padded forward onto the shared timeline of the symbols. Strategies can skip the symbols which did
+        not trade, as their values have not changed.
+        
+        Data handlers which do not pad any bars always return True.
+        """
+        return True
+    
+    def fast_forward(self, n_bars):
+        """
+        Drip-feeds up to n_bars bars at once, without putting a MarketEvent on the queue for each of them,
+        e.g. over the warm-up period of a strategy. Registered indicators are still fed every bar, and the
+        final bar is always left to update_bars(). Returns the timestamps of the bars fed.
+        
+        Data handlers which cannot skip ahead feed no bars.
+        """
+        return []
+
+
+# In[6]:
+
+class ColumnarDataHandler(DataHandler):
+    """
+    ColumnarDataHandler implements the "latest bar" interface of the DataHandler ABC on top of a dictionary
+    of BarStore objects, one per symbol, all sharing a single timeline.
+    
+    Rather than appending every drip-fed bar to a list, the handler keeps a cursor (bar_index) which points
+    one past the latest bar made available to the system. The latest N values of a field are then a zero-copy
+    slice of the underlying column, and no per-bar Python objects are created.
+    
+    Subclasses only need to populate self.symbol_data with aligned BarStore objects, set self.n_bars and
+    start with an empty self.indicators dictionary. Those which do not load 'symbol.csv' files from csv_dir
+    override _get_source_paths() as well, so that get_data_key() tells the versions of their data apart.
+    """
+    
+    def _select_window(self, start_date=None, end_date=None, warmup_margin=0):
+        """
+        Restricts the stores to the bars from start_date to end_date, plus up to warmup_margin bars before
+        start_date, located by binary search on the shared timeline. The stores are sliced without copying,
+        so the bars outside of the window are never touched.
+        """
+        if not self.symbol_list or (start_date is None and end_date is None):
+            return
+        first, stop, self.margin_bars = _get_window(
+            self.symbol_data[self.symbol_list[0]].index, start_date, end_date, warmup_margin
+        )
+        for s in self.symbol_list:
+            self.symbol_data[s] = self.symbol_data[s].slice(first, stop)
+        self.n_bars = stop - first
+    
+    def _get_store(self, symbol):
+        """
+        Returns the BarStore for a given symbol.
+        """
+        try:
+            return self.symbol_data[symbol]
+        except KeyError:
+            logger.error("%s is not available in the historical data set.", symbol)
+            raise # Reraise the current exception in an exception handler to be handled further up the call stack.
+    
+    def _get_latest_index(self):
+        """
+        Returns the position of the latest bar within the stores.
+        """
+        if self.bar_index == 0:
+            raise IndexError("No bars have been drip-fed to the system yet.")
+        return self.bar_index - 1
+    
+    #----- Implementation of abstract methods from the parent abstract base class, DataHandler -----#
+    
+    def get_latest_bar(self, symbol):
+        """
+        Returns the last bar as a (timestamp, pandas Series) tuple.
+        """
+        return self._get_store(symbol).get_bar(self._get_latest_index())
+    
+    def get_latest_bars(self, symbol, N=1):
+        """
+        Returns the last N bars as (timestamp, pandas Series) tuples, or N-k if less available.
+        """
+        store = self._get_store(symbol)
+        return [store.get_bar(i) for i in range(max(self.bar_index - N, 0), self.bar_index)]
+    
+    def get_latest_bar_datetime(self, symbol):
+        """
+        Returns a Python datetime object corresponding to the last bar's timestamp.
+        """
+        return self._get_store(symbol).get_datetime(self._get_latest_index())
+    
+    def get_latest_bar_value(self, symbol, val_type):
+        """
+        Returns one of the Open, High, Low, Close, Volume, or OI values from the last bar.
+        """
+        return self._get_store(symbol).columns[val_type][self._get_latest_index()]
+    
+    def get_latest_bars_values(self, symbol, val_type, N=1):
+        """
+        Returns the last N bar values, or N-k if less available, as a read-only view of the column.
+        """
+        return self._get_store(symbol).columns[val_type][max(self.bar_index - N, 0):self.bar_index]
+    
+    def get_latest_bar_updated(self, symbol):
+        """
+        Returns whether the symbol actually traded at the last bar, from the updated mask of its store.
+        """
+        updated = self._get_store(symbol).updated
+        return True if updated is None else bool(updated[self._get_latest_index()])
+    
+    def _get_source_paths(self):
+        """
+        Returns the paths of the files, or directories of files, the bars are loaded from.
+        """
+        return [os.path.join(self.csv_dir, '{}.csv'.format(s)) for s in self.symbol_list]
+    
+    def _get_source_stamps(self):
+        """
+        Returns the (path, size, mtime_ns) of the files the bars are loaded from.
+        """
+        return _get_file_stamps(self._get_source_paths())
+    
+    def get_data_key(self):
+        """
+        Returns a key identifying the data set of the handler, used to share cached indicator series
+        between handlers loading the same bars. The size and modification time of the source files are
+        part of the key, so that series calculated before the files were rewritten are not reused.
+        """
+        index = self._get_store(self.symbol_list[0]).index if self.n_bars > 0 else []
+        return (
+            self.csv_dir, tuple(self.symbol_list), self.n_bars,
+            str(index[0]) if len(index) else None, str(index[-1]) if len(index) else None,
+            self._get_source_stamps()
+        )
+    
+    def register_indicator(self, symbol, indicator):
+        """
+        Registers a streaming Indicator for a symbol. The indicator is fed any bars already drip-fed to the
+        system straight away, and then each new bar as it arrives. Returns the indicator.
+        """
+        columns = self._get_store(symbol).columns
+        for i in range(self.bar_index):
+            indicator.update(*[columns[f].item(i) for f in indicator.fields])
+        self.indicators.setdefault(symbol, []).append(indicator)
+        return indicator
+    
+    def _update_indicators(self):
+        """
+        Feeds the latest bar to the registered indicators.
+        """
+        i = self.bar_index - 1
+        for s, indicators in self.indicators.items():
+            columns = self.symbol_data[s].columns
+            for indicator in indicators:
+                indicator.update(*[columns[f].item(i) for f in indicator.fields])
+    
+    def share(self):
+        """
+        Publishes the bars of this handler into shared memory, returning the owning SharedBarSet.
+        Worker processes can then attach to them with a SharedMemoryDataHandler via its descriptor, which
+        also records the versions of the source files of the bars.
+        """
+        shared = SharedBarSet(dict((s, self.symbol_data[s]) for s in self.symbol_list))
+        shared.descriptor['sources'] = self._get_source_stamps()
+        return shared
+    
+    def reset(self, events=None):
+        """
+        Rewinds the handler to the start of its data set, so that the bars loaded once can be replayed, e.g. for
+        every parameter combination of a sweep. The bars themselves are read-only and shared between runs, while
+        the cursor and the registered indicators start afresh.
+        
+        Parameters
+        ----------
+        @events: The Event Queue of the next run, by default the current one.
+        """
+        if events is not None:
+            self.events = events
+        self.bar_index = 0
+        self.continue_backtest = True
+        self.indicators = {}
+    
+    def fast_forward(self, n_bars):
+        """
+        Advances the cursor by up to n_bars bars at once, without putting a MarketEvent on the queue for each
+        of them. The final bar is always left to update_bars(). Returns the timestamps of the bars skipped, as
+        a slice of the shared timeline.
+        """
+        start = self.bar_index
+        stop = max(min(start + n_bars, self.n_bars - 1), start)
+        if stop == start:
+            return []
+        
+        if self.indicators:
+            while self.bar_index < stop:
+                self.bar_index += 1
+                self._update_indicators()
+        self.bar_index = stop
+        return self._get_store(self.symbol_list[0]).index[start:stop]
+    
+    def update_bars(self):
+        """
+        Advances the cursor by one bar for all symbols in the symbol list.
+        """
+        if self.bar_index < self.n_bars:
+            self.bar_index += 1
+            self._update_indicators()
+        else:
+            # Stops the backtest when there are no more bars left
+            self.continue_backtest = False
+        self.events.put(market_event) # Enqueues the shared MarketEvent to events
 
 
 # In[7]:
@@ -100,18 +386,21 @@ class DataHandler(object):
 # Create an implementation of the DataHandler ABC. Recall that ABCs cannot be directly implemented.
 # ABCs require subclassing for all appropriate interfaces that wish to conform to their functionality.
 
-class HistoricCSVDataHandler(DataHandler):
+class HistoricCSVDataHandler(ColumnarDataHandler):
     """
     HistoricCSVDataHandler is designed to read CSV files for each requested symbol
     from a disk and provide an interface to obtain the "latest" bar, in a manner
     that is identical to a live trading interface.
     
     HistoricCSVDataHandler processes multiple CSV files, one for each traded symbol, and converts them into
-    a dictionary of pandas DataFrames. The DataFramess can then be accessed by the bar methods inherited from 
-    the DataHandler abstract base class.
+    a dictionary of columnar BarStore objects. The stores can then be accessed by the bar methods inherited from 
+    the ColumnarDataHandler.
     """
     
-    def __init__(self, events, csv_dir, symbol_list):
+    # The column names of the CSV files, the first one being the datetime index
+    names = ['datetime', 'open', 'high', 'low', 'close', 'adj_close', 'volume']
+    
+    def __init__(self, events, csv_dir, symbol_list, bar_cache=None, start_date=None, end_date=None, warmup_margin=0):
         """
         Initialized the historic data handler by requesting the location of the CSV files
         and a list of symbols.
@@ -124,14 +413,24 @@ class HistoricCSVDataHandler(DataHandler):
         @events: The Event Queue.
         @csv_dir: Absolute directory path to the CSV files.
         @symbol_list: A list of symbol strings.
+        @bar_cache: An optional BarCache used to skip re-parsing CSV files that were loaded before.
+        @start_date: The first datetime of the backtest. Earlier bars are not loaded, unless within the warm-up margin.
+        @end_date: The last datetime of the backtest (inclusive). Later bars are not loaded.
+        @warmup_margin: The number of bars before start_date to load, in order to prime the indicators.
         """
         self.events = events
         self.csv_dir = csv_dir
         self.symbol_list = symbol_list
+        self.bar_cache = bar_cache
+        self.start_date = start_date
+        self.end_date = end_date
+        self.warmup_margin = warmup_margin
         
         self.symbol_data = {}
-        self.latest_symbol_data = {}
+        self.bar_index = 0
+        self.n_bars = 0
         self.continue_backtest = True
+        self.indicators = {}
         
         self._open_convert_csv_files()
     
@@ -139,296 +438,453 @@ class HistoricCSVDataHandler(DataHandler):
     
     def _open_convert_csv_files(self): # private method
         """
-        Opens the CSV files from the data directory, converting them into pandas DataFrames within
+        Opens the CSV files from the data directory, converting them into columnar BarStore objects within
         a dictionary of symbols.
         
         For this handler, it will be assumed that the data is taken from Yahoo Finance. Thus, its format
         will be respected.
         """
-        comb_index = None
+        names = self.names
         
-        # Iterates through all the symbols we're storing in the dictionary of DataFrames
+        # Iterates through all the symbols we're storing in the dictionary of BarStores
         for s in self.symbol_list:
             # Load the CSV file with no header information, indexed on date
-            self.symbol_data[s] = pd.read_csv(
-                os.path.join(self.csv_dir, '{}.csv'.format(s)),
-                header=0, index_col=0, parse_dates=True,
-                names=['datetime', 'open', 'high', 'low', 'close', 'adj_close', 'volume']
-            ).sort_index()
-            
-            # Combine the index to pad forward values
-            # Merges all the indexes with a union so that the index is completely filled
-            if comb_index is None:
-                comb_index = self.symbol_data[s].index
+            csv_path = os.path.join(self.csv_dir, '{}.csv'.format(s))
+            if self.bar_cache is not None:
+                self.symbol_data[s] = self.bar_cache.get(csv_path, names)
             else:
-                comb_index.union(self.symbol_data[s].index)
-            
-            # Set the latest symbol_data to None
-            self.latest_symbol_data[s] = []
+                self.symbol_data[s] = read_csv_bars(csv_path, names)
+        
+        # Merge the indexes of all the symbols into a single timeline so that it is completely filled
+        comb_index = merge_timelines([self.symbol_data[s].index for s in self.symbol_list])
+        
+        # Only the bars within the date range (and its warm-up margin) are kept, so that the alignment
+        # below copies the window rather than the whole history
+        first, stop, self.margin_bars = _get_window(comb_index, self.start_date, self.end_date, self.warmup_margin)
+        comb_index = comb_index[first:stop]
             
-        # Reindex the DataFrames for all symbols and pad missing values
-        for s in self.symbol_list:
-            self.symbol_data[s] = self.symbol_data[s].reindex(index=comb_index, method='pad').iterrows()
-    
-    def _get_new_bar(self, symbol):
-        """
-        Returns the latest bar from the data feed. 
-        Subsequent calls to this method will 'yield' a new bar until the end of the symbol data is reached.
-        """
-        for b in self.symbol_data[symbol]:
-            yield b
+        # Align the stores for all symbols onto the timeline and pad missing values
+        self.symbol_data = align_bar_stores(self.symbol_data, comb_index)
+        
+        self.n_bars = len(comb_index)
 
-            
-    #----- Implementation of abstract methods from the parent abstract base class, DataHandler -----#
+
+# In[8]:
+
+class MemmapDataHandler(ColumnarDataHandler):
+    """
+    MemmapDataHandler serves bars from a memory-mapped data set written by convert_csv_to_memmap(),
+    rather than holding the histories in memory as pandas DataFrames.
     
-    def get_latest_bar(self, symbol):
-        """
-        Returns the last bar from the latest_symbol_data list.
-        """
-        try:
-            bars_list = self.latest_symbol_data[symbol]
-        except KeyError:
-            print("That symbol is not available in the historical data set.")
-            raise # Reraise the current exception in an exception handler to be handled further up the call stack.
-        else:
-            return bars_list[-1]
+    The column files are mapped read-only, so the operating system pages bars in on demand as the cursor
+    advances and can drop them again under memory pressure. This allows minute or tick histories that are
+    larger than the available RAM to be backtested, with the same get_latest_bar* interface as the
+    HistoricCSVDataHandler.
+    """
     
-    def get_latest_bars(self, symbol, N=1):
+    def __init__(self, events, csv_dir, symbol_list, start_date=None, end_date=None, warmup_margin=0):
         """
-        Returns the last N bars from the latest_symbol list, or N-k if less available.
+        Initializes the memory-mapped data handler.
+        
+        Parameters
+        ----------
+        @events: The Event Queue.
+        @csv_dir: Absolute directory path to the memory-mapped data set (see convert_csv_to_memmap()).
+        @symbol_list: A list of symbol strings.
+        @start_date: The first datetime of the backtest. Earlier bars are skipped, unless within the warm-up margin.
+        @end_date: The last datetime of the backtest (inclusive). Later bars are skipped.
+        @warmup_margin: The number of bars before start_date to serve, in order to prime the indicators.
         """
-        try:
-            bars_list = self.latest_symbol_data[symbol]
-        except KeyError:
-            print("That symbol is not available in the historical data set.")
-            raise
-        else:
-            return bars_list[-N::]
+        self.events = events
+        self.csv_dir = csv_dir
+        self.symbol_list = symbol_list
         
-    def get_latest_bar_datetime(self, symbol):
+        self.symbol_data = open_memmap_bars(self.csv_dir, self.symbol_list)
+        self.bar_index = 0
+        self.n_bars = len(self.symbol_data[self.symbol_list[0]]) if self.symbol_list else 0
+        self.continue_backtest = True
+        self.indicators = {}
+        
+        self._select_window(start_date, end_date, warmup_margin)
+    
+    def _get_source_paths(self):
         """
-        Returns a Python datetime object corresponding to the last bar's timestamp.
+        Returns the paths of the manifest, the timeline and the column files of the symbols.
         """
-        try:
-            bars_list = self.latest_symbol_data[symbol]
-        except KeyError:
-            print("That symbol is not available in the historical data set.")
-            raise
-        else:
-            return bars_list[-1][0]
+        return [os.path.join(self.csv_dir, 'manifest.json'), os.path.join(self.csv_dir, 'datetime.i8')] + [
+            os.path.join(self.csv_dir, s) for s in self.symbol_list
+        ]
+
+
+# In[9]:
+
+class SharedMemoryDataHandler(ColumnarDataHandler):
+    """
+    SharedMemoryDataHandler serves bars published into shared memory by another process, e.g. by calling
+    share() on a loaded HistoricCSVDataHandler at the start of a multi-process parameter sweep.
     
-    def get_latest_bar_value(self, symbol, val_type):
-        """
-        Returns one of the Open, High, Low, Close, Volume, or OI values from the
-        pandas Bar series object.
+    The bars are attached read-only and never copied, while each handler keeps its own cursor. A sweep
+    spread across many worker processes therefore holds a single copy of the market data.
+    """
+    
+    def __init__(self, events, csv_dir, symbol_list, shared_bars=None, start_date=None, end_date=None, warmup_margin=0):
         """
-        #print("get_latest_bar_value")
-        try:
-            bars_list = self.latest_symbol_data[symbol]
-        except KeyError:
-            print("That symbol is not available in the historical data set.")
-            raise
-        else:
-            return getattr(bars_list[-1][-1], val_type)
+        Initializes the shared memory data handler.
+        
+        Parameters
+        ----------
+        @events: The Event Queue.
+        @csv_dir: Unused, kept for interface compatibility with the other data handlers.
+        @symbol_list: A list of symbol strings.
+        @shared_bars: The descriptor of a published SharedBarSet.
+        @start_date: The first datetime of the backtest. Earlier bars are skipped, unless within the warm-up margin.
+            Bars published by a handler loaded with the same date range are served as they are.
+        @end_date: The last datetime of the backtest (inclusive). Later bars are skipped.
+        @warmup_margin: The number of bars before start_date to serve, in order to prime the indicators.
+        """
+        if shared_bars is None:
+            raise ValueError("A SharedBarSet descriptor is required to attach to shared bars.")
+        
+        self.events = events
+        self.csv_dir = csv_dir
+        self.symbol_list = symbol_list
+        
+        self.shared_memory, self.symbol_data = attach_shared_bars(shared_bars)
+        self.sources = shared_bars.get('sources', ())
+        self.bar_index = 0
+        self.n_bars = shared_bars['n_bars']
+        self.continue_backtest = True
+        self.indicators = {}
+        
+        self._select_window(start_date, end_date, warmup_margin)
     
-    def get_latest_bars_values(self, symbol, val_type, N=1):
+    def _get_source_stamps(self):
         """
-        Returns the last N bar values from the latest_symbol list, or N-k if less available.
+        Returns the versions of the source files of the bars, as recorded by the handler which published them.
         """
-        try:
-            bars_list = self.get_latest_bars(symbol, N)
-        except KeyError:
-            print("That symbol is not available in the historical data set.")
-            raise
-        else:
-            return np.array([getattr(b[1], val_type) for b in bars_list])
+        return self.sources
     
-    def update_bars(self):
+    def close(self):
         """
-        Pushes the latest bar to the latest_symbol_data structure for all symbols in the symbol list.
+        Detaches from the shared memory segment. The handler cannot serve any bars afterwards.
         """
-        for s in self.symbol_list:
-            try:
-                bar = next(self._get_new_bar(s)) # https://docs.python.org/2/library/functions.html#next
-            except StopIteration:
-                # Stops the backtest when there are no more bars left
-                self.continue_backtest = False
-            else:
-                if bar is not None:
-                    self.latest_symbol_data[s].append(bar)
-        self.events.put(MarketEvent()) # Enqueues MarketEvent() to events: https://docs.python.org/2/library/queue.html
-        
-
+        self.symbol_data = {}
+        self.shared_memory.close()
 
-# In[1]:
 
-# Create an implementation of the DataHandler ABC. Recall that ABCs cannot be directly implemented.
-# ABCs require subclassing for all appropriate interfaces that wish to conform to their functionality.
+# In[10]:
 
-class HistoricCSVDataHandlerHFT(DataHandler):
+class StreamingCSVDataHandler(DataHandler):
     """
-    HistoricCSVDataHandler is designed to read CSV files for each requested symbol
-    from a disk and provide an interface to obtain the "latest" bar, in a manner
-    that is identical to a live trading interface.
+    StreamingCSVDataHandler drip-feeds intraday bars from CSV files which are read chunk by chunk, rather than
+    loaded whole before the first bar as the HistoricCSVDataHandlerHFT does.
     
-    HistoricCSVDataHandler processes multiple CSV files, one for each traded symbol, and converts them into
-    a dictionary of pandas DataFrames. The DataFramess can then be accessed by the bar methods inherited from 
-    the DataHandler abstract base class.
+    A background ChunkReader parses and aligns the next chunks of all the symbols while the engine consumes
+    the current ones, so the first MarketEvent is emitted as soon as the first chunk is read. Only the latest
+    lookback bars are kept, in BarRing buffers, which bounds the memory however long the files are. Requests
+    for more than lookback bars, e.g. get_latest_bars_values(N) or a fast-forward, only see the latest lookback.
     """
     
-    def __init__(self, events, csv_dir, symbol_list):
+    def __init__(self, events, csv_dir, symbol_list, names=INTRADAY_NAMES, chunksize=100000, lookback=10000,
+                 max_blocks=2, start_date=None, end_date=None, warmup_margin=0):
         """
-        Initialized the historic data handler by requesting the location of the CSV files
-        and a list of symbols.
+        Initializes the streaming data handler and starts reading the CSV files in the background.
         
         It will be assumed that all files are of the form 'symbol.csv', where symbol is a string
-        in the list.
+        in the list, and that their bars are sorted by time.
         
         Parameters
         ----------
         @events: The Event Queue.
         @csv_dir: Absolute directory path to the CSV files.
         @symbol_list: A list of symbol strings.
+        @names: The column names of the CSV files, the first one being the datetime index.
+        @chunksize: The number of CSV rows parsed at a time.
+        @lookback: The number of latest bars kept for each symbol.
+        @max_blocks: The number of aligned chunks read ahead of the engine.
+        @start_date: The first datetime of the backtest. Earlier bars are skipped, unless within the warm-up margin.
+        @end_date: The last datetime of the backtest (inclusive). Reading stops there.
+        @warmup_margin: The number of bars before start_date to drip-feed, in order to prime the indicators.
         """
         self.events = events
         self.csv_dir = csv_dir
         self.symbol_list = symbol_list
+        self.names = names
+        self.fields = list(names[1:])
+        self.chunksize = chunksize
+        self.lookback = lookback
+        self.max_blocks = max_blocks
+        self.start_date = start_date
+        self.end_date = end_date
+        self.warmup_margin = warmup_margin
         
-        self.symbol_data = {}
-        self.latest_symbol_data = {}
-        self.continue_backtest = True
+        # The position of each symbol, and of each of its fields, within the rows of the buffers
+        self.symbol_columns = dict((s, j) for j, s in enumerate(self.symbol_list))
+        self.field_columns = dict(
+            ((s, f), j * len(self.fields) + i) for j, s in enumerate(self.symbol_list) for i, f in enumerate(self.fields)
+        )
         
-        self._open_convert_csv_files()
+        self._start()
     
-    # Python convention: '_' before a name denotes a non-public (private) part of the API.
+    def _start(self):
+        """
+        Starts reading the CSV files from the beginning, with empty buffers.
+        """
+        csv_paths = [(s, os.path.join(self.csv_dir, '{}.csv'.format(s))) for s in self.symbol_list]
+        self.reader = ChunkReader(
+            iter_aligned_chunks(csv_paths, self.names, self.chunksize, self.start_date, self.end_date, self.warmup_margin),
+            self.max_blocks
+        )
+        self.blocks = deque()
+        self.block_pos = 0
+        self.n_unread = 0
+        self.exhausted = False
+        self._margin_bars = None
+        
+        self.datetimes = BarRing(self.lookback, 1, dtype='datetime64[ns]')
+        self.values = BarRing(self.lookback, len(self.field_columns))
+        self.updated = BarRing(self.lookback, len(self.symbol_columns), dtype=np.bool_)
+        self.continue_backtest = True
+        self.indicators = {}
     
-    def _open_convert_csv_files(self): # private method
+    @property
+    def margin_bars(self):
         """
-        Opens the CSV files from the data directory, converting them into pandas DataFrames within
-        a dictionary of symbols.
-        
-        For this handler, it will be assumed that the data is taken from Yahoo Finance. Thus, its format
-        will be respected.
+        The number of bars before start_date, which lead the first chunk read.
         """
-        comb_index = None
-        
-        # Iterates through all the symbols we're storing in the dictionary of DataFrames
-        for s in self.symbol_list:
-            # Load the CSV file with no header information, indexed on date
-            self.symbol_data[s] = pd.read_csv(
-                os.path.join(self.csv_dir, '%.csv', '%s'),
-                header=0, index_col=0, parse_dates=True,
-                names=['datetime', 'open', 'low', 'high', 'close', 'volume', 'oi']
-            ).sort()
-            
-            # Combine the index to pad forward values
-            # Merges all the indexes with a union so that the index is completely filled
-            if comb_index is None:
-                comb_index = self.symbol_data[s].index
+        if self._margin_bars is None:
+            self._margin_bars = 0
+            if self.start_date is not None and self._available(1):
+                index = self.blocks[0][0]
+                self._margin_bars = int(np.searchsorted(index, pd.Timestamp(self.start_date).to_datetime64(), side='left'))
+        return self._margin_bars
+    
+    def _available(self, n):
+        """
+        Returns whether at least n bars are left to drip-feed, waiting for the reader to read ahead if required.
+        """
+        while self.n_unread < n and not self.exhausted:
+            block = self.reader.get()
+            if block is None:
+                self.exhausted = True
             else:
-                comb_index.union(self.symbol_data[s].index)
-            
-            # Set the latest symbol_data to None
-            self.latest_symbol_data[s] = []
-            
-        # Reindex the DataFrames for all symbols and pad missing values
-        for s in self.symbol_list:
-            self.symbol_data[s] = self.symbol_data[s].reindex(index=comb_index, method='pad').iterrows()
+                self.blocks.append(block)
+                self.n_unread += len(block[0])
+        return self.n_unread >= n
     
-    def _get_new_bar(self, symbol):
+    def _push_bar(self):
         """
-        Returns the latest bar from the data feed. 
-        Subsequent calls to this method will 'yield' a new bar until the end of the symbol data is reached.
+        Moves the next bar of every symbol into the buffers, feeding it to the registered indicators.
         """
-        for b in self.symbol_data[symbol]:
-            yield b
-
-            
+        index, values, updated = self.blocks[0]
+        i = self.block_pos
+        self.datetimes.append(index[i])
+        self.values.append(values[i])
+        self.updated.append(updated[i])
+        
+        self.n_unread -= 1
+        self.block_pos += 1
+        if self.block_pos == len(index):
+            self.blocks.popleft()
+            self.block_pos = 0
+        
+        if self.indicators:
+            row = self.values.latest(1)[0]
+            for s, indicators in self.indicators.items():
+                for indicator in indicators:
+                    indicator.update(*[row.item(self.field_columns[(s, f)]) for f in indicator.fields])
+    
+    def _get_latest_row(self, ring):
+        """
+        Returns the latest row of a buffer.
+        """
+        if ring.count == 0:
+            raise IndexError("No bars have been drip-fed to the system yet.")
+        return ring.latest(1)[0]
+    
+    def _get_column(self, symbol, val_type):
+        """
+        Returns the position of a field of a symbol within the rows of the values buffer.
+        """
+        if symbol not in self.symbol_columns:
+            logger.error("%s is not available in the historical data set.", symbol)
+            raise KeyError(symbol)
+        return self.field_columns[(symbol, val_type)]
+    
     #----- Implementation of abstract methods from the parent abstract base class, DataHandler -----#
     
     def get_latest_bar(self, symbol):
         """
-        Returns the last bar from the latest_symbol_data list.
+        Returns the last bar as a (timestamp, pandas Series) tuple.
         """
-        try:
-            bars_list = self.latest_symbol_data[symbol]
-        except KeyError:
-            print("That symbol is not available in the historical data set.")
-            raise # Reraise the current exception in an exception handler to be handled further up the call stack.
-        else:
-            return bars_list[-1]
+        return self.get_latest_bars(symbol, N=1)[-1]
     
     def get_latest_bars(self, symbol, N=1):
         """
-        Returns the last N bars from the latest_symbol list, or N-k if less available.
+        Returns the last N bars as (timestamp, pandas Series) tuples, or N-k if less available.
         """
-        try:
-            bars_list = self.latest_symbol_data[symbol]
-        except KeyError:
-            print("That symbol is not available in the historical data set.")
-            raise
-        else:
-            return bars_list[-N::]
-        
+        columns = [self._get_column(symbol, f) for f in self.fields]
+        bars = []
+        for dt, row in zip(self.datetimes.latest(N)[:, 0], self.values.latest(N)):
+            dt = pd.Timestamp(dt)
+            bars.append((dt, pd.Series(row[columns], index=self.fields, name=dt)))
+        return bars
+    
     def get_latest_bar_datetime(self, symbol):
         """
         Returns a Python datetime object corresponding to the last bar's timestamp.
         """
-        try:
-            bars_list = self.latest_symbol_data[symbol]
-        except KeyError:
-            print("That symbol is not available in the historical data set.")
-            raise
-        else:
-            return bars_list[-1][0]
+        self._get_column(symbol, self.fields[0])
+        return pd.Timestamp(self._get_latest_row(self.datetimes)[0])
     
     def get_latest_bar_value(self, symbol, val_type):
         """
-        Returns one of the Open, High, Low, Close, Volume, or OI values from the
-        pandas Bar series object.
+        Returns one of the Open, High, Low, Close, Volume, or OI values from the last bar.
         """
-        print("get_latest_bar_value: ")
-
-        try:
-            bars_list = self.latest_symbol_data[symbol]
-            print(bars_list)
-        except KeyError:
-            print("That symbol is not available in the historical data set.")
-            raise
-        else:
-            print(bars_list[-1][-1], val_type)
-            return getattr(bars_list[-1][-1], val_type)
-
+        return self._get_latest_row(self.values)[self._get_column(symbol, val_type)]
+    
     def get_latest_bars_values(self, symbol, val_type, N=1):
         """
-        Returns the last N bar values from the latest_symbol list, or N-k if less available.
+        Returns the last N bar values, or N-k if less available, as a read-only view of the buffer.
         """
-        print("get_latest_bars_values: ")
-        try:
-            bars_list = self.get_latest_bars(symbol, N)
-            print(bars_list)
-        except KeyError:
-            print("That symbol is not available in the historical data set.")
-            raise
-        else:
-            print(np.array([getattr(b[1], val_type) for b in bars_list]))
-            return np.array([getattr(b[1], val_type) for b in bars_list])
+        return self.values.latest(N)[:, self._get_column(symbol, val_type)]
+    
+    def get_latest_bar_updated(self, symbol):
+        """
+        Returns whether the symbol actually traded at the last bar, rather than having been padded forward.
+        """
+        self._get_column(symbol, self.fields[0])
+        return bool(self._get_latest_row(self.updated)[self.symbol_columns[symbol]])
+    
+    def register_indicator(self, symbol, indicator):
+        """
+        Registers a streaming Indicator for a symbol. The indicator is fed the bars still held in the buffers
+        straight away, and then each new bar as it arrives. Returns the indicator.
+        """
+        columns = [self._get_column(symbol, f) for f in indicator.fields]
+        for row in self.values.latest(self.lookback):
+            indicator.update(*[row.item(c) for c in columns])
+        self.indicators.setdefault(symbol, []).append(indicator)
+        return indicator
+    
+    def reset(self, events=None):
+        """
+        Rewinds the handler to the start of its data set, by reading the CSV files again from the beginning.
+        
+        Parameters
+        ----------
+        @events: The Event Queue of the next run, by default the current one.
+        """
+        if events is not None:
+            self.events = events
+        self.reader.close()
+        self._start()
+    
+    def close(self):
+        """
+        Stops reading the CSV files. The handler cannot serve any new bars afterwards.
+        """
+        self.reader.close()
+    
+    def fast_forward(self, n_bars):
+        """
+        Drip-feeds up to n_bars bars (and at most lookback) at once, without putting a MarketEvent on the queue
+        for each of them. The final bar is always left to update_bars(). Returns the timestamps of the bars fed.
+        """
+        n = 0
+        while n < min(n_bars, self.lookback) and self._available(2):
+            self._push_bar()
+            n += 1
+        return self.datetimes.latest(n)[:, 0].copy() if n > 0 else []
     
     def update_bars(self):
         """
-        Pushes the latest bar to the latest_symbol_data structure for all symbols in the symbol list.
+        Pushes the next bar of all the symbols into the buffers, as soon as it has been read.
         """
-        for s in self.symbol_list:
-            try:
-                bar = next(self._get_new_bar(s)) # https://docs.python.org/2/library/functions.html#next
-            except StopIteration:
-                # Stops the backtest when there are no more bars left
-                self.continue_backtest = False
-            else:
-                if bar is not None:
-                    self.latest_symbol_data[s].append(bar)
-        self.events.put(MarketEvent()) # Enqueues MarketEvent() to events: https://docs.python.org/2/library/queue.html
+        if self._available(1):
+            self._push_bar()
+        else:
+            # Stops the backtest when there are no more bars left
+            self.continue_backtest = False
+        self.events.put(market_event) # Enqueues the shared MarketEvent to events
+
+
+# In[11]:
+
+class ParquetDataHandler(ColumnarDataHandler):
+    """
+    ParquetDataHandler serves bars from a Parquet data set, e.g. written by convert_csv_to_parquet(), holding
+    the bars of each symbol as a file or a partitioned directory of files.
+    
+    Only the columns of the fields the backtest reads are loaded, e.g. adj_close alone for a moving average
+    crossover, and the row groups outside of the date range are skipped on their datetime statistics without
+    being read. The symbols are then aligned onto the union of their timelines as by the HistoricCSVDataHandler.
+    """
+    
+    projects_fields = True
+    
+    def __init__(self, events, csv_dir, symbol_list, fields=None, start_date=None, end_date=None, warmup_margin=0):
+        """
+        Initializes the Parquet data handler.
+        
+        Parameters
+        ----------
+        @events: The Event Queue.
+        @csv_dir: Absolute directory path to the Parquet data set.
+        @symbol_list: A list of symbol strings.
+        @fields: The fields to load, or None to load all of them. The other fields are not available.
+        @start_date: The first datetime of the backtest. Earlier bars are not read, unless within the warm-up margin.
+        @end_date: The last datetime of the backtest (inclusive). Later bars are not read.
+        @warmup_margin: The number of bars before start_date to load, in order to prime the indicators.
+        """
+        self.events = events
+        self.csv_dir = csv_dir
+        self.symbol_list = symbol_list
+        self.start_date = start_date
+        self.end_date = end_date
+        self.warmup_margin = warmup_margin
+        
+        self.symbol_data, self.fields = open_parquet_bars(
+            self.csv_dir, self.symbol_list, fields, start_date, end_date, warmup_margin
+        )
+        self.bar_index = 0
+        self.continue_backtest = True
+        self.indicators = {}
         
+        # The stores also hold the latest bar before the window, which only pads its start
+        comb_index = merge_timelines([self.symbol_data[s].index for s in self.symbol_list])
+        first, stop, self.margin_bars = _get_window(comb_index, start_date, end_date, warmup_margin)
+        comb_index = comb_index[first:stop]
+        
+        self.symbol_data = align_bar_stores(self.symbol_data, comb_index)
+        self.n_bars = len(comb_index)
+    
+    def _get_source_paths(self):
+        """
+        Returns the paths of the Parquet file, or the directory of files, of each symbol.
+        """
+        paths = []
+        for s in self.symbol_list:
+            paths.extend([os.path.join(self.csv_dir, '{}.parquet'.format(s)), os.path.join(self.csv_dir, s)])
+        return paths
+
+
+# In[1]:
+
+# Create an implementation of the DataHandler ABC. Recall that ABCs cannot be directly implemented.
+# ABCs require subclassing for all appropriate interfaces that wish to conform to their functionality.
+
+class HistoricCSVDataHandlerHFT(HistoricCSVDataHandler):
+    """
+    HistoricCSVDataHandlerHFT reads intraday CSV files for each requested symbol, with the columns
+    (datetime, open, low, high, close, volume, open interest), and provides the same "latest" bar interface
+    as the HistoricCSVDataHandler, from aligned columnar BarStore objects.
+    
+    The date range, warm-up margin, fast-forwards, rewinds, streaming indicators and updated masks are all
+    those of the ColumnarDataHandler.
+    """
+    
+    names = INTRADAY_NAMES
 
 
 # In[ ]:
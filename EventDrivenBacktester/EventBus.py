@@ -0,0 +1,155 @@
+
+# coding: utf-8
+
+# In[1]:
+
+# EventBus
+
+from __future__ import print_function
+
+from abc import ABCMeta, abstractmethod
+from collections import deque
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+
+# In[2]:
+
+class EventBus(object):
+    """
+    EventBus is an abstract base class providing an interface for the Event Queue shared by all the components
+    of a Backtest. Components put() events on the bus, and the event loop of the Backtest poll()s them off
+    in first-in, first-out order.
+
+    None is never put on the bus (e.g. when a Portfolio has no order to generate from a signal), so that
+    poll() can return None to signal that the bus is empty. The get() method of queue.Queue is also provided,
+    for code written against the standard Queue interface.
+
+    The bus also holds the dispatch table of the event loop: components subscribe() handlers to event kinds
+    (see EventClasses), and dispatch() calls the handlers subscribed to the kind of each event, counting
+    the events of each kind. New kinds of events only need new subscriptions.
+    """
+
+    __metaclass__ = ABCMeta
+
+    def __init__(self):
+        self.handlers = {}
+        self.counts = {}
+
+    def subscribe(self, kind, handler):
+        """
+        Registers a handler to be called with every dispatched event of a kind, after the handlers
+        already subscribed to it.
+
+        Parameters
+        ----------
+        @kind: The integer kind of the events.
+        @handler: The callable taking the event.
+        """
+        self.handlers.setdefault(kind, []).append(handler)
+        self.counts.setdefault(kind, 0)
+
+    def dispatch(self):
+        """
+        Polls events off the bus until it is empty, calling the handlers subscribed to the kind of each one
+        in turn. Events put on the bus by the handlers are dispatched within the same call.
+        """
+        handlers = self.handlers
+        counts = self.counts
+        poll = self.poll
+        while True:
+            event = poll()
+            if event is None:
+                return
+            kind = event.kind
+            counts[kind] = counts.get(kind, 0) + 1
+            for handler in handlers.get(kind, ()):
+                handler(event)
+
+    @abstractmethod
+    def put(self, event):
+        """
+        Adds an event to the back of the bus. None is ignored.
+        """
+        raise NotImplementedError("Missing implementation for put()")
+
+    @abstractmethod
+    def poll(self):
+        """
+        Removes and returns the event at the front of the bus, or None if the bus is empty.
+        """
+        raise NotImplementedError("Missing implementation for poll()")
+
+    def get(self, block=True, timeout=None):
+        """
+        Removes and returns the event at the front of the bus, raising queue.Empty if the bus is empty.
+        """
+        event = self.poll()
+        if event is None:
+            raise queue.Empty
+        return event
+
+
+# In[3]:
+
+class DequeEventBus(EventBus):
+    """
+    DequeEventBus is a lock-free event bus on top of a collections.deque, for single-threaded historical backtests.
+    Unlike queue.Queue, putting and polling events does not acquire any lock or condition variable.
+    """
+
+    def __init__(self):
+        super(DequeEventBus, self).__init__()
+        self.events = deque()
+
+    def put(self, event):
+        if event is not None:
+            self.events.append(event)
+
+    def poll(self):
+        return self.events.popleft() if self.events else None
+
+    def empty(self):
+        return not self.events
+
+    def qsize(self):
+        return len(self.events)
+
+
+class QueueEventBus(EventBus):
+    """
+    QueueEventBus is a thread-safe event bus on top of queue.Queue, for live trading where events may be put
+    on the bus from other threads, e.g. the fills of the IBExecutionHandler.
+    """
+
+    def __init__(self):
+        super(QueueEventBus, self).__init__()
+        self.events = queue.Queue()
+
+    def put(self, event):
+        if event is not None:
+            self.events.put(event)
+
+    def poll(self):
+        try:
+            return self.events.get(False)
+        except queue.Empty:
+            return None
+
+    def get(self, block=True, timeout=None):
+        return self.events.get(block, timeout)
+
+    def empty(self):
+        return self.events.empty()
+
+    def qsize(self):
+        return self.events.qsize()
+
+
+# In[ ]:
+
+
+
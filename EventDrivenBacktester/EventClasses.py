@@ -10,12 +10,24 @@ from __future__ import print_function
 
 # In[2]:
 
+# The integer kinds of the events. The EventBus dispatches each event to the handlers subscribed to its kind,
+# so new types of events only need a new kind (any other integer) and a subscription.
+MARKET = 0
+SIGNAL = 1
+ORDER = 2
+FILL = 3
+
+
 class Event(object):
     """
     Event is a base class providing an interface for all subsequent inherited events. Such events will
-    trigger further events in the trading infrastructure
+    trigger further events in the trading infrastructure.
+    
+    Each derived event carries an integer kind, used for dispatching, along with its type string.
+    Events declare their attributes in __slots__, so that instances carry no per-instance __dict__.
     """
-    pass
+    
+    __slots__ = ()
 
 
 # In[3]:
@@ -23,13 +35,24 @@ class Event(object):
 class MarketEvent(Event):
     """
     Handles the event of receiving a new market update with corresponding bars.
+    
+    MarketEvents carry no data, so the data handlers put the shared market_event instance on the bus
+    rather than allocating a new event for every bar.
     """
     
+    __slots__ = ()
+    
+    kind = MARKET
+    type = 'MARKET'
+    
     def __init__(self):
         """
         Initializes the market event
         """
-        self.type = "MARKET"
+
+
+# The MarketEvent shared by every data handler
+market_event = MarketEvent()
 
 
 # In[4]:
@@ -40,6 +63,11 @@ class SignalEvent(Event):
     This is received by a Portfolio object and subsequently acted upon.
     """
     
+    __slots__ = ('strategy_id', 'symbol', 'datetime', 'signal_type', 'strength')
+    
+    kind = SIGNAL
+    type = 'SIGNAL'
+    
     def __init__(self, strategy_id, symbol, datetime, signal_type, strength):
         """
         Initializes the SignalEvent.
@@ -53,7 +81,6 @@ class SignalEvent(Event):
         @strength: An adjustement factor "suggestion" used to scale quantity at the portfolio level.
             Useful for pairs-based strategies.
         """
-        self.type = 'SIGNAL'
         self.strategy_id = strategy_id
         self.datetime = datetime
         self.signal_type = signal_type
@@ -69,6 +96,11 @@ class OrderEvent(Event):
     The order contains a symbol (e.g.: 'GOOG'), a type (market or limit), a quantity, and a direction
     """
     
+    __slots__ = ('symbol', 'order_type', 'quantity', 'direction')
+    
+    kind = ORDER
+    type = 'ORDER'
+    
     def __init__(self, symbol, order_type, quantity, direction):
         """
         Initializes the order type, setting whether it is a Market order ('MKT') or Limit order ('LMT'), 
@@ -81,7 +113,6 @@ class OrderEvent(Event):
         @quantity: Non-negative integer for quantity.
         @direction: 'BUY' or 'SELL' (e.x.: 'SELL' all 'LONG' positions, 'BUY' more 'SHORT' positions, etc...).
         """
-        self.type = 'ORDER'
         self.symbol = symbol
         self.order_type = order_type
         self.quantity = quantity
@@ -99,12 +130,25 @@ class OrderEvent(Event):
 
 # In[6]:
 
+# The Interactive Brokers fee schedule of FillEvent.calculate_ib_commission(), in $USD: a per-share rate for
+# orders of up to IB_TIER_QUANTITY shares and a lower one above, with a minimum commission per order
+IB_MIN_COMMISSION = 1.3
+IB_TIER_QUANTITY = 500
+IB_RATE_SMALL_ORDER = 0.013
+IB_RATE_LARGE_ORDER = 0.008
+
+
 class FillEvent(Event):
     """
     Encapsulates the notion of a Filled Order, as returned from a brokerage. Stores the quantity of an instrument
     actually filled and at what price. In addition, stores the commission of the trade from the brokerage.
     """
     
+    __slots__ = ('timeindex', 'symbol', 'exchange', 'quantity', 'direction', 'fill_cost', 'commission')
+    
+    kind = FILL
+    type = 'FILL'
+    
     def __init__(self, timeindex, symbol, exchange, quantity, direction, fill_cost, commission=None):
         """
         Initializes the FillEvent object. Sets the symbol, exchange, quantity, direction, cost of fill,
@@ -123,7 +167,6 @@ class FillEvent(Event):
         @fill_cost: The holdings value in dollars ($).
         @commission: An optional commission sent from Interactive Brokers.
         """
-        self.type = 'FILL'
         self.timeindex = timeindex
         self.symbol = symbol
         self.exchange = exchange
@@ -146,11 +189,11 @@ class FillEvent(Event):
         Based on "US API Directed Orders":
         https://www.interactivebrokers.com/en/index.php?f=commission&p=stocks2
         """
-        full_cost = 1.3
-        if self.quantity <= 500:
-            full_cost = max(1.3, 0.013 * self.quantity)
-        else: # Greater than 500
-            full_cost = max(1.3, 0.008 * self.quantity)
+        full_cost = IB_MIN_COMMISSION
+        if self.quantity <= IB_TIER_QUANTITY:
+            full_cost = max(IB_MIN_COMMISSION, IB_RATE_SMALL_ORDER * self.quantity)
+        else: # Greater than IB_TIER_QUANTITY
+            full_cost = max(IB_MIN_COMMISSION, IB_RATE_LARGE_ORDER * self.quantity)
         return full_cost
 
 
@@ -18,7 +18,7 @@ try:
 except ImportError:
     import queue
 
-from EventDrivenBacktester.EventClasses import FillEvent, OrderEvent
+from EventDrivenBacktester.EventClasses import FillEvent, OrderEvent, ORDER
 
 
 # In[4]:
@@ -80,7 +80,7 @@ class SimulatedExecutionHandler(ExecutionHandler):
         ----------
         @event: Contains an Event object with order information.
         """
-        if event.type == 'ORDER':
+        if event.kind == ORDER:
             fill_event = FillEvent(datetime.datetime.utcnow(), event.symbol, 'ARCA', 
                                    event.quantity, event.direction, None)
             self.events.put(fill_event)
@@ -16,7 +16,7 @@ from ib.ext.Contract import Contract
 from ib.ext.Order import Order
 from ib.opt import ibConnection, message
 
-from EventDrivenBacktester.EventClasses import FillEvent, OrderEvent
+from EventDrivenBacktester.EventClasses import FillEvent, OrderEvent, ORDER
 from EventDrivenBacktester.ExecutionHandler import ExecutionHandler
 
 
@@ -170,7 +170,7 @@ class IBExecutionHandler(ExecutionHandler):
         ----------
         @event: Contains an Event object with order information.
         """
-        if event.type == 'ORDER':
+        if event.kind == ORDER:
             # Prepare the parameters for the asset order
             asset = event.symbol
             asset_type = "STK"
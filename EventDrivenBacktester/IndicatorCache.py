@@ -0,0 +1,118 @@
+
+# coding: utf-8
+
+# In[1]:
+
+# IndicatorCache
+
+from __future__ import print_function
+
+from collections import OrderedDict
+
+import numpy as np
+
+
+# In[2]:
+
+class IndicatorSeries(object):
+    """
+    IndicatorSeries holds the per-bar values of an indicator over a data set, as a preallocated
+    (n_bars x n_columns) float64 array filled in bar order. Bars [0, length) have been calculated.
+    """
+
+    def __init__(self, n_bars, n_columns):
+        """
+        Parameters
+        ----------
+        @n_bars: The number of bars of the data set.
+        @n_columns: The number of values calculated per bar.
+        """
+        self.values = np.full((n_bars, n_columns), np.nan)
+        self.length = 0
+
+    def append(self, i, row):
+        """
+        Stores the values of bar i, provided that it is the next bar of the series.
+        """
+        if i == self.length and i < len(self.values):
+            self.values[i] = row
+            self.length += 1
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+
+class IndicatorCache(object):
+    """
+    IndicatorCache memoizes indicator series, so that strategy instances using identical indicators on the same
+    data, such as the combinations of a parameter sweep sharing a lookback window, calculate them only once.
+
+    Each series is keyed by the data set, the symbols, the indicator name and its parameters, and is looked up
+    by bar index. The first strategy to use a series fills it in as the bars arrive, after which later strategies
+    simply read the values back. Series are evicted in least-recently-used order once their total size
+    exceeds max_size. A BacktestOptim holds one cache per sweep, which it passes to the strategies declaring
+    uses_indicator_cache.
+    """
+
+    def __init__(self, max_size=256 * 1024 * 1024):
+        """
+        Parameters
+        ----------
+        @max_size: The maximum total size of the cached series in bytes, or None for no limit.
+        """
+        self.max_size = max_size
+        self.series = OrderedDict()
+        self.size = 0
+
+    def get_series(self, bars, symbols, name, params, n_columns=1):
+        """
+        Returns the (possibly partially calculated) IndicatorSeries for an indicator, creating an empty one if
+        required, or None if the data handler cannot identify its data set.
+
+        Parameters
+        ----------
+        @bars: The DataHandler object providing the bars.
+        @symbols: The tuple of symbols the indicator is calculated from.
+        @name: The name of the indicator.
+        @params: The tuple of parameters of the indicator, e.g. its window.
+        @n_columns: The number of values calculated per bar.
+        """
+        get_data_key = getattr(bars, 'get_data_key', None)
+        if get_data_key is None:
+            return None
+
+        data_key = get_data_key()
+        key = (data_key, tuple(symbols), name, tuple(params), n_columns)
+        try:
+            series = self.series.pop(key)
+        except KeyError:
+            series = IndicatorSeries(bars.n_bars, n_columns)
+            self.size += series.nbytes
+        self.series[key] = series  # Most recently used last
+        self.evict()
+        return series
+
+    def evict(self):
+        """
+        Drops the least-recently-used series until the total size is within max_size, always keeping
+        the most recently used one.
+        """
+        if self.max_size is None:
+            return
+        while self.size > self.max_size and len(self.series) > 1:
+            _, series = self.series.popitem(last=False)
+            self.size -= series.nbytes
+
+    def clear(self):
+        """
+        Drops every cached series.
+        """
+        self.series.clear()
+        self.size = 0
+
+
+# In[ ]:
+
+
+
@@ -0,0 +1,338 @@
+
+# coding: utf-8
+
+# In[1]:
+
+# Indicators
+
+from __future__ import print_function
+
+from collections import deque
+
+import numpy as np
+
+
+# In[2]:
+
+# Streaming technical indicators, each updated in O(1) (amortised) per bar.
+# An indicator is registered for a symbol with DataHandler.register_indicator(), after which the data handler
+# feeds it the values of its fields as each new bar arrives. Strategies then simply read indicator.value.
+# Missing (NaN) values make an indicator's value NaN for as long as they are within its window, as the
+# equivalent NumPy calculation over the window would.
+
+
+# In[3]:
+
+class Indicator(object):
+    """
+    Indicator is the base class of all streaming indicators.
+
+    Derived indicators list the bar fields they are calculated from in self.fields, receive the values of those
+    fields for each new bar through update(), and expose their latest result as self.value (NaN until ready).
+    """
+
+    def __init__(self, field='close'):
+        """
+        Parameters
+        ----------
+        @field: The bar field the indicator is calculated from.
+        """
+        self.fields = (field,)
+        self.value = np.nan
+
+    def update(self, *values):
+        """
+        Updates the indicator with the field values of a new bar.
+        """
+        raise NotImplementedError("Missing implementation for update()")
+
+    def is_ready(self):
+        """
+        Returns whether the indicator currently has a value.
+        """
+        return self.value == self.value
+
+
+class _RollingSums(Indicator):
+    """
+    Base class of the indicators calculated from running sums over a sliding window. The sums are updated as
+    values enter and leave the window, and are rebuilt from the window every rebuild_every bars so that floating
+    point errors do not accumulate over long runs.
+    """
+
+    def __init__(self, window, field='close', min_periods=None, rebuild_every=1000):
+        """
+        Parameters
+        ----------
+        @window: The lookback window, in bars.
+        @field: The bar field the indicator is calculated from.
+        @min_periods: The number of bars required for a value, by default the full window.
+        @rebuild_every: The number of bars after which the running sums are recalculated from scratch.
+        """
+        super(_RollingSums, self).__init__(field)
+        self.window = window
+        self.min_periods = window if min_periods is None else min_periods
+        self.rebuild_every = rebuild_every
+        self.values = deque(maxlen=window)
+        self._rebuild()
+
+    def _rebuild(self):
+        """
+        Recalculates the running sums from the values currently in the window.
+        """
+        self._reset_sums()
+        self.n_missing = 0
+        for x in self.values:
+            self._add_value(x, 1.0)
+        self.n_updates = 0
+
+    def _add_value(self, x, sign):
+        """
+        Adds (sign=1) or removes (sign=-1) a value from the running sums, counting missing values.
+        """
+        if x != x:
+            self.n_missing += int(sign)
+        else:
+            self._add(x, sign)
+
+    def _reset_sums(self):
+        raise NotImplementedError("Missing implementation for _reset_sums()")
+
+    def _add(self, x, sign):
+        raise NotImplementedError("Missing implementation for _add()")
+
+    def _calculate(self, x):
+        raise NotImplementedError("Missing implementation for _calculate()")
+
+    def update(self, x):
+        if len(self.values) == self.window:
+            self._add_value(self.values[0], -1.0)
+        self.values.append(x)
+        self._add_value(x, 1.0)
+
+        self.n_updates += 1
+        if self.n_updates >= self.rebuild_every:
+            self._rebuild()
+
+        if len(self.values) < self.min_periods or self.n_missing > 0:
+            self.value = np.nan
+        else:
+            self.value = self._calculate(x)
+
+
+# In[4]:
+
+class SMA(_RollingSums):
+    """
+    Simple Moving Average over the latest window bars. With min_periods less than the window, the average is taken
+    over the bars available until the window fills up.
+    """
+
+    def _reset_sums(self):
+        self.total = 0.0
+
+    def _add(self, x, sign):
+        self.total += sign * x
+
+    def _calculate(self, x):
+        return self.total / len(self.values)
+
+
+class RollingVariance(_RollingSums):
+    """
+    Rolling variance over the latest window bars, with ddof=0 (population) by default. The rolling mean is
+    available as self.mean.
+
+    The running sums are taken over the deviations from a reference value, the first value added after each
+    rebuild, so that the variance is not lost to cancellation between the sums of squared prices when it is
+    small relative to the price level.
+    """
+
+    def __init__(self, window, field='close', ddof=0, min_periods=None, rebuild_every=1000):
+        """
+        Parameters
+        ----------
+        @window: The lookback window, in bars.
+        @field: The bar field the indicator is calculated from.
+        @ddof: The delta degrees of freedom of the variance.
+        @min_periods: The number of bars required for a value, by default the full window.
+        @rebuild_every: The number of bars after which the running sums are recalculated from scratch.
+        """
+        self.ddof = ddof
+        self.mean = np.nan
+        super(RollingVariance, self).__init__(window, field, min_periods, rebuild_every)
+
+    def _reset_sums(self):
+        self.ref = None
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def _add(self, x, sign):
+        if self.ref is None:
+            self.ref = x
+        d = x - self.ref
+        self.total += sign * d
+        self.total_sq += sign * d * d
+
+    def _calculate(self, x):
+        n = len(self.values)
+        mean = self.total / n
+        self.mean = self.ref + mean
+        if n <= self.ddof:
+            return np.nan
+        return max(self.total_sq - self.total * mean, 0.0) / (n - self.ddof)
+
+
+class RollingStd(RollingVariance):
+    """
+    Rolling standard deviation over the latest window bars, with ddof=0 (population) by default.
+    """
+
+    def _calculate(self, x):
+        return np.sqrt(super(RollingStd, self)._calculate(x))
+
+
+class ZScore(RollingStd):
+    """
+    Z-score of the latest value relative to the mean and standard deviation of the latest window bars.
+    """
+
+    def _calculate(self, x):
+        std = super(ZScore, self)._calculate(x)
+        return (x - self.mean) / std if std > 0 else np.nan
+
+
+# In[5]:
+
+class EMA(Indicator):
+    """
+    Exponential Moving Average with a smoothing factor of 2/(window+1), seeded with the first value.
+    Missing values are skipped.
+    """
+
+    def __init__(self, window, field='close'):
+        """
+        Parameters
+        ----------
+        @window: The span of the average, in bars.
+        @field: The bar field the indicator is calculated from.
+        """
+        super(EMA, self).__init__(field)
+        self.window = window
+        self.alpha = 2.0 / (window + 1.0)
+
+    def update(self, x):
+        if x != x:
+            return
+        if self.value != self.value:
+            self.value = x
+        else:
+            self.value += self.alpha * (x - self.value)
+
+
+class _RollingExtremum(Indicator):
+    """
+    Base class of the rolling maximum and minimum, kept in a monotonic deque of (bar number, value) pairs. Each
+    value is pushed and popped at most once, giving O(1) amortised updates.
+    """
+
+    def __init__(self, window, field='close'):
+        """
+        Parameters
+        ----------
+        @window: The lookback window, in bars.
+        @field: The bar field the indicator is calculated from.
+        """
+        super(_RollingExtremum, self).__init__(field)
+        self.window = window
+        self.candidates = deque()
+        self.n_bars = 0
+        self.last_missing = -window  # Bar number of the latest missing value
+
+    def _dominates(self, a, b):
+        raise NotImplementedError("Missing implementation for _dominates()")
+
+    def update(self, x):
+        n = self.n_bars
+        self.n_bars += 1
+
+        # Drop the candidate which has left the window
+        if self.candidates and self.candidates[0][0] <= n - self.window:
+            self.candidates.popleft()
+
+        if x != x:
+            self.last_missing = n
+        else:
+            # Candidates dominated by the new value can never be the extremum again
+            while self.candidates and not self._dominates(self.candidates[-1][1], x):
+                self.candidates.pop()
+            self.candidates.append((n, x))
+
+        if self.n_bars < self.window or self.last_missing > n - self.window:
+            self.value = np.nan
+        else:
+            self.value = self.candidates[0][1]
+
+
+class RollingMax(_RollingExtremum):
+    """
+    Rolling maximum over the latest window bars.
+    """
+
+    def _dominates(self, a, b):
+        return a > b
+
+
+class RollingMin(_RollingExtremum):
+    """
+    Rolling minimum over the latest window bars.
+    """
+
+    def _dominates(self, a, b):
+        return a < b
+
+
+# In[6]:
+
+class ATR(Indicator):
+    """
+    Average True Range, using Wilder's smoothing. The first value is the simple average of the first window
+    true ranges, after which ATR = (ATR_prev * (window-1) + TR) / window. Bars with missing values are skipped.
+    """
+
+    def __init__(self, window=14, fields=('high', 'low', 'close')):
+        """
+        Parameters
+        ----------
+        @window: The smoothing window, in bars.
+        @fields: The names of the high, low and close bar fields.
+        """
+        super(ATR, self).__init__()
+        self.fields = tuple(fields)
+        self.window = window
+        self.prev_close = np.nan
+        self.n_ranges = 0
+        self.total = 0.0
+
+    def update(self, high, low, close):
+        if high != high or low != low or close != close:
+            return
+
+        true_range = high - low
+        if self.prev_close == self.prev_close:
+            true_range = max(true_range, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+
+        self.n_ranges += 1
+        if self.n_ranges < self.window:
+            self.total += true_range
+        elif self.n_ranges == self.window:
+            self.value = (self.total + true_range) / self.window
+        else:
+            self.value = (self.value * (self.window - 1) + true_range) / self.window
+
+
+# In[ ]:
+
+
+
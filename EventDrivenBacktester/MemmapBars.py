@@ -0,0 +1,170 @@
+
+# coding: utf-8
+
+# In[1]:
+
+# MemmapBars
+
+from __future__ import print_function
+
+import json
+import os, os.path
+
+import numpy as np
+import pandas as pd
+
+from EventDrivenBacktester.BacktestLogging import get_logger
+from EventDrivenBacktester.BarStore import INTRADAY_NAMES, BarStore
+
+logger = get_logger('data')
+
+
+# In[2]:
+
+# A memory-mapped data set is a directory laid out as:
+#
+#   manifest.json       {"n_bars": N, "symbols": {"AREX": ["open", "low", ...], ...}, "updated": ["AREX", ...]}
+#   datetime.i8         The shared timeline, N datetime64[ns] values.
+#   AREX/open.f8        One raw float64 file of N values per field and symbol, aligned to the timeline.
+#   ...
+#   AREX/updated.u1     The updated mask of the symbol, a byte per bar of the timeline, set where it actually
+#                       traded rather than being padded forward. Data sets written before the masks were
+#                       added have no "updated" entry in their manifest, and no mask files.
+#
+# Raw column files are used rather than .npy files so that they can be written chunk by chunk and then
+# mapped straight back into memory with numpy.memmap, without ever holding a full column in RAM.
+
+
+# In[3]:
+
+def _read_csv_index(csv_path, names, chunksize):
+    """
+    Reads only the datetime column of a CSV file of bars, checking that it is sorted in time.
+    """
+    chunks = []
+    last = None
+    for chunk in pd.read_csv(csv_path, header=0, names=names, usecols=[0], parse_dates=[0], chunksize=chunksize):
+        idx = chunk[names[0]].values.astype('datetime64[ns]')
+        if len(idx) == 0:
+            continue
+        if (last is not None and idx[0] < last) or np.any(idx[1:] < idx[:-1]):
+            raise ValueError("The bars in %s must be sorted by time to be memory-mapped." % csv_path)
+        last = idx[-1]
+        chunks.append(idx)
+    return np.concatenate(chunks) if chunks else np.array([], dtype='datetime64[ns]')
+
+
+def convert_csv_to_memmap(csv_dir, symbol_list, mmap_dir, names=INTRADAY_NAMES, chunksize=500000):
+    """
+    Converts a set of 'symbol.csv' files into a memory-mapped data set, reading each file in chunks
+    so that histories larger than the available memory can be converted.
+
+    All symbols are aligned to the union of their timelines while being written, padding missing bars
+    forward with the last known values (NaN before a symbol's first bar), and an updated mask marks the
+    bars at which each symbol actually traded, as with align_bar_stores(). Only the timestamps are held
+    in memory during the conversion.
+
+    Parameters
+    ----------
+    @csv_dir: Absolute directory path to the CSV files.
+    @symbol_list: A list of symbol strings.
+    @mmap_dir: The directory to write the memory-mapped data set to.
+    @names: The column names of the CSV files, the first one being the datetime index.
+    @chunksize: The number of CSV rows parsed at a time.
+    """
+    fields = list(names[1:])
+    csv_paths = dict((s, os.path.join(csv_dir, '{}.csv'.format(s))) for s in symbol_list)
+
+    # First pass: build the shared timeline from the datetime columns alone
+    indexes = [_read_csv_index(csv_paths[s], names, chunksize) for s in symbol_list]
+    master = np.unique(np.concatenate(indexes))
+    n_bars = len(master)
+    if n_bars == 0:
+        raise ValueError("There are no bars to convert in %s." % csv_dir)
+
+    if not os.path.isdir(mmap_dir):
+        os.makedirs(mmap_dir)
+    master.view('int64').tofile(os.path.join(mmap_dir, 'datetime.i8'))
+
+    # Second pass: stream each file into its aligned column files
+    for s in symbol_list:
+        symbol_dir = os.path.join(mmap_dir, s)
+        if not os.path.isdir(symbol_dir):
+            os.makedirs(symbol_dir)
+        out = dict(
+            (f, np.memmap(os.path.join(symbol_dir, f + '.f8'), dtype=np.float64, mode='w+', shape=(n_bars,)))
+            for f in fields
+        )
+        updated = np.memmap(os.path.join(symbol_dir, 'updated.u1'), dtype=np.bool_, mode='w+', shape=(n_bars,))
+
+        filled = 0  # Timeline positions [0, filled) have been written
+        last = dict((f, np.nan) for f in fields)
+        for chunk in pd.read_csv(csv_paths[s], header=0, index_col=0, parse_dates=True, names=names,
+                                 chunksize=chunksize):
+            if len(chunk) == 0:
+                continue
+            idx = chunk.index.values.astype('datetime64[ns]')
+
+            # Timeline bars between the previous chunk and this one carry the previous chunk's last values
+            lo = np.searchsorted(master, idx[0], side='left')
+            hi = np.searchsorted(master, idx[-1], side='right')
+            pos = np.searchsorted(idx, master[lo:hi], side='right') - 1
+            for f in fields:
+                values = chunk[f].values.astype(np.float64)
+                out[f][filled:lo] = last[f]
+                out[f][lo:hi] = values[pos]
+                last[f] = values[-1]
+            updated[np.searchsorted(master, idx, side='left')] = True
+            filled = hi
+
+        for f in fields:
+            out[f][filled:] = last[f]
+            out[f].flush()
+        updated.flush()
+        del out, updated
+
+    manifest = {
+        'n_bars': n_bars, 'symbols': dict((s, fields) for s in symbol_list), 'updated': list(symbol_list)
+    }
+    with open(os.path.join(mmap_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f)
+
+
+def open_memmap_bars(mmap_dir, symbol_list):
+    """
+    Maps a memory-mapped data set back into read-only BarStore objects, one per symbol, without
+    loading any of the bars into memory. The updated masks are mapped as well, where the data set has them.
+
+    Parameters
+    ----------
+    @mmap_dir: The directory holding the data set written by convert_csv_to_memmap().
+    @symbol_list: A list of symbol strings.
+    """
+    with open(os.path.join(mmap_dir, 'manifest.json')) as f:
+        manifest = json.load(f)
+    n_bars = manifest['n_bars']
+
+    index = np.memmap(os.path.join(mmap_dir, 'datetime.i8'), dtype='datetime64[ns]', mode='r', shape=(n_bars,))
+
+    stores = {}
+    for s in symbol_list:
+        try:
+            fields = manifest['symbols'][s]
+        except KeyError:
+            logger.error("%s is not available in the memory-mapped data set.", s)
+            raise
+        columns = dict(
+            (f, np.memmap(os.path.join(mmap_dir, s, f + '.f8'), dtype=np.float64, mode='r', shape=(n_bars,)))
+            for f in fields
+        )
+        updated = None
+        if s in manifest.get('updated', []):
+            updated = np.memmap(os.path.join(mmap_dir, s, 'updated.u1'), dtype=np.bool_, mode='r', shape=(n_bars,))
+        stores[s] = BarStore(index, columns, updated)
+    return stores
+
+
+# In[ ]:
+
+
+
@@ -0,0 +1,242 @@
+
+# coding: utf-8
+
+# In[1]:
+
+# ParquetBars
+
+from __future__ import print_function
+
+import os, os.path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    # pyarrow is an optional dependency, only required by the Parquet data sets
+    pa = ds = pq = None
+
+from EventDrivenBacktester.BacktestLogging import get_logger
+from EventDrivenBacktester.BarStore import INTRADAY_NAMES, BarStore, merge_timelines
+
+logger = get_logger('data')
+
+
+# In[2]:
+
+# A Parquet data set is a directory holding the bars of each symbol either as a single file or as a partitioned
+# directory of files, e.g. one per year:
+#
+#   AREX.parquet        A 'datetime' timestamp column, then one float64 column per field.
+#   WLL/2007.parquet    The files of a partitioned symbol, which together hold its bars.
+#   WLL/2008.parquet
+#
+# The bars are sorted by time and split into row groups, whose minimum and maximum datetimes are recorded in the
+# file footers. Only the row groups overlapping the date range of a backtest are then read, and within them only
+# the columns of the fields it requires.
+
+INDEX_COLUMN = 'datetime'
+
+
+def _require_pyarrow():
+    if pq is None:
+        raise ImportError("Parquet data sets require pyarrow, e.g. 'pip install pyarrow'.")
+
+
+def convert_csv_to_parquet(csv_dir, symbol_list, parquet_dir, names=INTRADAY_NAMES, row_group_size=100000):
+    """
+    Converts a set of 'symbol.csv' files into a Parquet data set with one 'symbol.parquet' file per symbol,
+    reading each CSV file one row group at a time so that histories larger than the available memory can be
+    converted.
+
+    Unlike convert_csv_to_memmap(), the symbols are not aligned onto a shared timeline: each file keeps the bars
+    of its symbol only, and the data handler aligns the symbols it is asked for when loading them.
+
+    Parameters
+    ----------
+    @csv_dir: Absolute directory path to the CSV files.
+    @symbol_list: A list of symbol strings.
+    @parquet_dir: The directory to write the Parquet data set to.
+    @names: The column names of the CSV files, the first one being the datetime index.
+    @row_group_size: The number of bars per row group, the unit in which the bars are skipped or read.
+    """
+    _require_pyarrow()
+    fields = list(names[1:])
+    schema = pa.schema([(INDEX_COLUMN, pa.timestamp('ns'))] + [(f, pa.float64()) for f in fields])
+
+    if not os.path.isdir(parquet_dir):
+        os.makedirs(parquet_dir)
+
+    for s in symbol_list:
+        csv_path = os.path.join(csv_dir, '{}.csv'.format(s))
+        writer = pq.ParquetWriter(os.path.join(parquet_dir, '{}.parquet'.format(s)), schema)
+        try:
+            last = None
+            for chunk in pd.read_csv(csv_path, header=0, index_col=0, parse_dates=True, names=names,
+                                     chunksize=row_group_size):
+                if len(chunk) == 0:
+                    continue
+                index = chunk.index.values.astype('datetime64[ns]')
+                if (last is not None and index[0] < last) or np.any(index[1:] < index[:-1]):
+                    raise ValueError("The bars in %s must be sorted by time to be converted." % csv_path)
+                last = index[-1]
+                columns = [pa.array(index, type=pa.timestamp('ns'))]
+                columns += [pa.array(chunk[f].values.astype(np.float64)) for f in fields]
+                writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+        finally:
+            writer.close()
+
+
+# In[3]:
+
+class _RowGroup(object):
+    """
+    A row group of a Parquet data set, with the datetimes of its first and last bars.
+    """
+
+    def __init__(self, fragment, first, last):
+        self.fragment = fragment
+        self.first = first
+        self.last = last
+
+    def read(self, columns):
+        """
+        Returns the (index, values) of the bars of the row group, with the values as a dictionary of columns.
+        """
+        table = self.fragment.to_table(columns=[INDEX_COLUMN] + list(columns))
+        index = np.asarray(table.column(INDEX_COLUMN).to_numpy(), dtype='datetime64[ns]')
+        return index, dict((f, table.column(f).to_numpy().astype(np.float64)) for f in columns)
+
+
+def _open_row_groups(parquet_dir, symbol):
+    """
+    Returns the fields of the bars of a symbol, along with its row groups sorted by time.
+    """
+    path = os.path.join(parquet_dir, '{}.parquet'.format(symbol))
+    if not os.path.exists(path):
+        path = os.path.join(parquet_dir, symbol)
+    if not os.path.exists(path):
+        logger.error("%s is not available in the Parquet data set.", symbol)
+        raise IOError("There is no Parquet file or directory for %s in %s." % (symbol, parquet_dir))
+
+    dataset = ds.dataset(path, format='parquet')
+    fields = [name for name in dataset.schema.names if name != INDEX_COLUMN]
+
+    row_groups = []
+    for fragment in dataset.get_fragments():
+        for row_group in fragment.split_by_row_group():
+            if row_group.row_groups[0].num_rows == 0:
+                continue
+            stats = row_group.row_groups[0].statistics.get(INDEX_COLUMN)
+            if not stats or stats.get('min') is None:
+                raise ValueError("The row groups of %s lack the datetime statistics to be filtered on." % path)
+            first = pd.Timestamp(stats['min']).to_datetime64().astype('datetime64[ns]')
+            last = pd.Timestamp(stats['max']).to_datetime64().astype('datetime64[ns]')
+            row_groups.append(_RowGroup(row_group, first, last))
+    row_groups.sort(key=lambda rg: rg.first)
+
+    for prev, rg in zip(row_groups[:-1], row_groups[1:]):
+        if rg.first < prev.last:
+            raise ValueError("The row groups of %s overlap in time, the bars must be sorted." % path)
+    return fields, row_groups
+
+
+def _get_margin_start(row_groups, start, warmup_margin):
+    """
+    Returns the datetime of the earliest of the warmup_margin bars before start on the union of the timelines of
+    the symbols, reading only the datetime columns of the latest row groups before start.
+    """
+    indexes = []
+    for groups in row_groups.values():
+        n = 0
+        for rg in reversed([rg for rg in groups if rg.first < start]):
+            index, _ = rg.read([])
+            index = index[index < start]
+            indexes.append(index)
+            n += len(index)
+            # The latest warmup_margin bars of the union are among the latest warmup_margin bars of each symbol
+            if n >= warmup_margin:
+                break
+    merged = merge_timelines(indexes)
+    if len(merged) == 0:
+        return start
+    return merged[max(len(merged) - warmup_margin, 0)]
+
+
+def open_parquet_bars(parquet_dir, symbol_list, fields=None, start_date=None, end_date=None, warmup_margin=0):
+    """
+    Reads the bars of a Parquet data set into BarStore objects, one per symbol, returning them along with their
+    fields.
+
+    Only the columns of the given fields are read, and only from the row groups which hold bars from start_date
+    to end_date, the warmup_margin bars before start_date, or the latest bar before those, which pads the start
+    of the window once the symbols are aligned, e.g. by align_bar_stores().
+
+    Parameters
+    ----------
+    @parquet_dir: The directory holding the data set, e.g. written by convert_csv_to_parquet().
+    @symbol_list: A list of symbol strings.
+    @fields: The fields to read, or None to read all of them.
+    @start_date: The first datetime of the backtest, or None to start from the first bar.
+    @end_date: The last datetime of the backtest (inclusive), or None to run until the last bar.
+    @warmup_margin: The number of bars before start_date to read as well.
+    """
+    _require_pyarrow()
+    start = None if start_date is None else pd.Timestamp(start_date).to_datetime64().astype('datetime64[ns]')
+    end = None if end_date is None else pd.Timestamp(end_date).to_datetime64().astype('datetime64[ns]')
+
+    row_groups = {}
+    for s in symbol_list:
+        symbol_fields, row_groups[s] = _open_row_groups(parquet_dir, s)
+        if fields is None:
+            fields = symbol_fields
+        missing = [f for f in fields if f not in symbol_fields]
+        if missing:
+            raise ValueError("%s has no %s field in the Parquet data set." % (s, ", ".join(missing)))
+    fields = list(fields or [])
+
+    lo = start
+    if start is not None and warmup_margin > 0:
+        lo = _get_margin_start(row_groups, start, warmup_margin)
+
+    stores = {}
+    for s in symbol_list:
+        groups = row_groups[s]
+        selected = [
+            rg for rg in groups if (lo is None or rg.last >= lo) and (end is None or rg.first <= end)
+        ]
+        # The latest row group starting before the window holds the bar padding its start
+        before = [rg for rg in groups if lo is not None and rg.first < lo]
+        if before and before[-1] not in selected:
+            selected.insert(0, before[-1])
+
+        parts = [rg.read(fields) for rg in selected]
+        if parts:
+            index = np.concatenate([index for index, _ in parts])
+            columns = dict((f, np.concatenate([values[f] for _, values in parts])) for f in fields)
+        else:
+            index = np.array([], dtype='datetime64[ns]')
+            columns = dict((f, np.array([])) for f in fields)
+        if np.any(index[1:] < index[:-1]):
+            raise ValueError("The bars of %s must be sorted by time in the Parquet data set." % s)
+
+        keep = np.ones(len(index), dtype=np.bool_)
+        if end is not None:
+            keep &= index <= end
+        if lo is not None:
+            n = np.searchsorted(index, lo, side='left')
+            keep[:n] = False
+            if n > 0:
+                keep[n - 1] = True
+        stores[s] = BarStore(index[keep], dict((f, columns[f][keep]) for f in fields))
+    return stores, fields
+
+
+# In[ ]:
+
+
+
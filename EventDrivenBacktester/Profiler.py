@@ -0,0 +1,166 @@
+
+# coding: utf-8
+
+# In[1]:
+
+# Profiler
+
+from __future__ import print_function
+
+import time
+
+from EventDrivenBacktester.EventClasses import MARKET, SIGNAL, ORDER, FILL
+
+try:
+    default_timer = time.perf_counter
+except AttributeError:
+    default_timer = time.time
+
+KIND_NAMES = {MARKET: 'MARKET', SIGNAL: 'SIGNAL', ORDER: 'ORDER', FILL: 'FILL'}
+
+
+# In[2]:
+
+class NullProfiler(object):
+    """
+    NullProfiler is the default profiler of a Backtest, collecting nothing. Its wrap() returns the handlers
+    unchanged and watch() leaves the EventBus untouched, so a backtest run without profiling executes exactly
+    the same calls as one without any instrumentation at all.
+    """
+
+    enabled = False
+
+    def wrap(self, name, handler, kind=None):
+        """
+        Returns the handler to call in place of a component method.
+
+        Parameters
+        ----------
+        @name: The name of the component method, e.g. 'strategy.calculate_signals'.
+        @handler: The component method.
+        @kind: The kind of the events the handler is subscribed to, if any.
+        """
+        return handler
+
+    def watch(self, event_bus):
+        """
+        Starts tracking the depth of an EventBus.
+        """
+        pass
+
+    def start(self):
+        """
+        Marks the start of the event loop.
+        """
+        pass
+
+    def stop(self):
+        """
+        Marks the end of the event loop.
+        """
+        pass
+
+    def report(self, event_counts):
+        """
+        Returns the collected measurements, or None if there are none.
+
+        Parameters
+        ----------
+        @event_counts: The number of events dispatched of each kind, i.e. EventBus.counts.
+        """
+        return None
+
+
+class Profiler(NullProfiler):
+    """
+    Profiler measures the wall time and number of calls of every component method it wraps, the peak depth
+    of the EventBus it watches and the overall event throughput of the event loop.
+    """
+
+    enabled = True
+
+    def __init__(self, timer=default_timer):
+        """
+        Parameters
+        ----------
+        @timer: The clock the durations are measured with, in seconds.
+        """
+        self.timer = timer
+        self.calls = {}
+        self.seconds = {}
+        self.kinds = {}
+        self.peak_queue_depth = 0
+        self.start_time = None
+        self.elapsed = 0.0
+
+    def wrap(self, name, handler, kind=None):
+        calls = self.calls
+        seconds = self.seconds
+        timer = self.timer
+        calls.setdefault(name, 0)
+        seconds.setdefault(name, 0.0)
+        if kind is not None:
+            self.kinds[name] = kind
+
+        def timed(*args):
+            start = timer()
+            try:
+                return handler(*args)
+            finally:
+                seconds[name] += timer() - start
+                calls[name] += 1
+
+        return timed
+
+    def watch(self, event_bus):
+        put = event_bus.put
+        qsize = event_bus.qsize
+
+        def watched_put(event):
+            put(event)
+            depth = qsize()
+            if depth > self.peak_queue_depth:
+                self.peak_queue_depth = depth
+
+        # Components call event_bus.put() at call time, so shadowing it on the instance catches every event
+        event_bus.put = watched_put
+
+    def start(self):
+        self.start_time = self.timer()
+
+    def stop(self):
+        if self.start_time is not None:
+            self.elapsed += self.timer() - self.start_time
+            self.start_time = None
+
+    def report(self, event_counts):
+        n_events = sum(event_counts.values())
+
+        handlers = {}
+        seconds_by_kind = {}
+        for name, calls in self.calls.items():
+            seconds = self.seconds[name]
+            handlers[name] = {
+                'calls': calls,
+                'seconds': seconds,
+                'us_per_call': 1e6 * seconds / calls if calls else 0.0,
+            }
+            if name in self.kinds:
+                kind = KIND_NAMES.get(self.kinds[name], self.kinds[name])
+                seconds_by_kind[kind] = seconds_by_kind.get(kind, 0.0) + seconds
+
+        return {
+            'elapsed': self.elapsed,
+            'events': n_events,
+            'events_per_sec': n_events / self.elapsed if self.elapsed > 0 else 0.0,
+            'events_by_kind': dict((KIND_NAMES.get(k, k), c) for k, c in event_counts.items()),
+            'seconds_by_kind': seconds_by_kind,
+            'peak_queue_depth': self.peak_queue_depth,
+            'handlers': handlers,
+        }
+
+
+# In[ ]:
+
+
+
@@ -0,0 +1,178 @@
+
+# coding: utf-8
+
+# In[1]:
+
+# ResultStore
+
+from __future__ import print_function
+
+import hashlib
+import json
+import os, os.path
+import sqlite3
+import time
+
+
+# In[2]:
+
+# The default location of the results database, relative to the working directory of the sweep
+DEFAULT_RESULTS_PATH = os.path.join("OutputResults", "backtest_results.sqlite")
+
+# The performance metrics kept for every parameter combination, keyed by their output_summary_stats() names
+STATS_COLUMNS = [
+    ("Total Return", "total_return"),
+    ("Sharpe Ratio", "sharpe"),
+    ("Max Drawdown", "max_drawdown"),
+    ("Drawdown Duration", "drawdown_duration"),
+]
+
+
+# In[3]:
+
+class ResultStore(object):
+    """
+    ResultStore keeps the results of parameter sweeps in a SQLite database, one row per parameter combination.
+
+    Rows are indexed by a hash of the (sorted) parameter dictionary, so a sweep can check which combinations
+    have already been completed and skip them when it is rerun after an interruption. Each result is committed
+    as soon as it is added. The parameters are also stored one key/value pair per row in an indexed table, so
+    that any parameter keys are supported and slices of a sweep (e.g. every combination with ols_window=100)
+    can be queried without reading the whole store.
+    """
+
+    def __init__(self, path=DEFAULT_RESULTS_PATH):
+        """
+        Opens the store, creating the database and its tables if required.
+
+        Parameters
+        ----------
+        @path: The path to the SQLite database file.
+        """
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS results (
+                sweep TEXT NOT NULL,
+                param_hash TEXT NOT NULL,
+                params TEXT NOT NULL,
+                %s,
+                finished REAL NOT NULL,
+                PRIMARY KEY (sweep, param_hash)
+            );
+            CREATE TABLE IF NOT EXISTS params (
+                sweep TEXT NOT NULL,
+                param_hash TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value,
+                PRIMARY KEY (sweep, param_hash, key)
+            );
+            CREATE INDEX IF NOT EXISTS params_key_value ON params (sweep, key, value);
+        """ % ",\n".join("%s REAL" % col for _, col in STATS_COLUMNS))
+
+    @staticmethod
+    def hash_params(params):
+        """
+        Returns the hash identifying a parameter combination, independent of the order of its keys.
+        """
+        return hashlib.sha1(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def has(self, sweep, params):
+        """
+        Returns whether the results of a parameter combination are already in the store.
+
+        Parameters
+        ----------
+        @sweep: The name of the sweep.
+        @params: The dictionary of strategy parameters.
+        """
+        cur = self.conn.execute(
+            "SELECT 1 FROM results WHERE sweep = ? AND param_hash = ?", (sweep, self.hash_params(params))
+        )
+        return cur.fetchone() is not None
+
+    def add(self, sweep, params, stats):
+        """
+        Adds (or replaces) the results of a parameter combination and commits them straight away.
+
+        Parameters
+        ----------
+        @sweep: The name of the sweep.
+        @params: The dictionary of strategy parameters.
+        @stats: The list of (name, formatted value) summary statistics from output_summary_stats().
+        """
+        param_hash = self.hash_params(params)
+        stats = dict(stats)
+        values = [float(stats[name].replace("%", "")) for name, _ in STATS_COLUMNS]
+
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, %s, ?)" % ", ".join("?" * len(STATS_COLUMNS)),
+                [sweep, param_hash, json.dumps(params, sort_keys=True)] + values + [time.time()]
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO params VALUES (?, ?, ?, ?)",
+                [(sweep, param_hash, k, v) for k, v in params.items()]
+            )
+
+    def query(self, sweep=None, **params):
+        """
+        Returns the (params, stats) dictionaries of every stored combination matching the given parameter
+        values, e.g. query(ols_window=100). The stats dictionaries are keyed by the metric column names.
+
+        Parameters
+        ----------
+        @sweep: The name of the sweep, or None to match every sweep.
+        @params: The parameter values to match.
+        """
+        where, args = self._get_where(sweep, params)
+        sql = "SELECT params, %s FROM results r WHERE %s" % (", ".join(col for _, col in STATS_COLUMNS), where)
+
+        results = []
+        for row in self.conn.execute(sql, args):
+            results.append((json.loads(row[0]), dict(zip([col for _, col in STATS_COLUMNS], row[1:]))))
+        return results
+
+    def sweeps(self, **params):
+        """
+        Returns the sorted names of the sweeps with stored combinations matching the given parameter values.
+
+        Parameters
+        ----------
+        @params: The parameter values to match.
+        """
+        where, args = self._get_where(None, params)
+        sql = "SELECT DISTINCT sweep FROM results r WHERE %s ORDER BY sweep" % where
+        return [row[0] for row in self.conn.execute(sql, args)]
+
+    @staticmethod
+    def _get_where(sweep, params):
+        """
+        Returns the WHERE clause over the results table matching a sweep and parameter values, with its arguments.
+        """
+        where = "1"
+        args = []
+        if sweep is not None:
+            where += " AND r.sweep = ?"
+            args.append(sweep)
+        for k, v in params.items():
+            where += (" AND r.param_hash IN (SELECT param_hash FROM params p "
+                      "WHERE p.sweep = r.sweep AND p.key = ? AND p.value = ?)")
+            args.extend([k, v])
+        return where, args
+
+    def close(self):
+        """
+        Closes the database connection.
+        """
+        self.conn.close()
+
+
+# In[ ]:
+
+
+
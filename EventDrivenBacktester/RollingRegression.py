@@ -0,0 +1,172 @@
+
+# coding: utf-8
+
+# In[1]:
+
+# RollingRegression
+
+from __future__ import print_function
+
+from collections import deque
+
+import numpy as np
+
+
+# In[2]:
+
+class RollingOLS(object):
+    """
+    RollingOLS fits a sliding-window, zero-intercept least squares regression of y on x, i.e. the hedge
+    ratio of a pair of equities, updated one observation at a time.
+
+    Only the running sums of x, y, x^2, y^2 and xy over the window are kept, so adding the newest pair and
+    removing the oldest one are O(1) operations, as is calculating the hedge ratio and the mean, standard
+    deviation and Z-score of the spread (residuals) y - hedge_ratio * x. The sums are rebuilt from the
+    window every rebuild_every updates so that floating point errors do not accumulate over long runs.
+
+    The sums are taken over the deviations of x and y from a reference pair of the window, chosen at each
+    rebuild. The spread variance is then a difference of terms of the order of the variations of the prices
+    within the window, rather than of the squared price levels, which would cancel catastrophically when the
+    spread is small relative to the prices.
+    """
+
+    def __init__(self, window, rebuild_every=1000):
+        """
+        Initializes an empty regression.
+
+        Parameters
+        ----------
+        @window: The number of most recent (x, y) pairs to regress over.
+        @rebuild_every: The number of updates after which the running sums are recalculated from scratch.
+        """
+        self.window = window
+        self.rebuild_every = rebuild_every
+        self.pairs = deque(maxlen=window)
+        self._rebuild()
+
+    def _rebuild(self):
+        """
+        Recalculates the running sums from the pairs currently in the window.
+        """
+        self.sx = self.sy = self.sxx = self.syy = self.sxy = 0.0
+        self.n_missing = 0
+        self.ref = None
+        for x, y in self.pairs:
+            self._add(x, y, 1.0)
+        self.n_updates = 0
+
+    def _add(self, x, y, sign):
+        """
+        Adds (sign=1) or removes (sign=-1) a pair from the running sums. Pairs with a missing (NaN)
+        value are only counted, as they make the whole window unusable until they leave it. The first pair
+        added after a rebuild becomes the reference pair the sums are centred on.
+        """
+        if x != x or y != y:
+            self.n_missing += int(sign)
+            return
+        if self.ref is None:
+            self.ref = (x, y)
+        dx = x - self.ref[0]
+        dy = y - self.ref[1]
+        self.sx += sign * dx
+        self.sy += sign * dy
+        self.sxx += sign * dx * dx
+        self.syy += sign * dy * dy
+        self.sxy += sign * dx * dy
+
+    def reset(self, xs, ys):
+        """
+        Replaces the window with the latest (x, y) pairs of the given sequences, e.g. to bring the regression
+        back in sync with the data after skipping some bars.
+
+        Parameters
+        ----------
+        @xs: The sequence of values of the independent variable.
+        @ys: The sequence of values of the dependent variable.
+        """
+        self.pairs.clear()
+        self.pairs.extend(zip(xs, ys))
+        self._rebuild()
+
+    def update(self, x, y):
+        """
+        Adds the newest (x, y) pair to the window, dropping the oldest pair once the window is full.
+
+        Parameters
+        ----------
+        @x: The newest value of the independent variable.
+        @y: The newest value of the dependent variable.
+        """
+        if len(self.pairs) == self.window:
+            self._add(self.pairs[0][0], self.pairs[0][1], -1.0)
+        self.pairs.append((x, y))
+        self._add(x, y, 1.0)
+
+        self.n_updates += 1
+        if self.n_updates >= self.rebuild_every:
+            self._rebuild()
+
+    def is_ready(self):
+        """
+        Returns whether the window is full and free of missing values.
+        """
+        return len(self.pairs) == self.window and self.n_missing == 0
+
+    def get_hedge_ratio(self):
+        """
+        Returns the least squares slope of y on x over the window.
+        """
+        if not self.is_ready():
+            return np.nan
+
+        # The raw sums of x^2 and xy, recovered from the centred sums
+        n = float(len(self.pairs))
+        x0, y0 = self.ref
+        sxx = self.sxx + x0 * (2.0 * self.sx + n * x0)
+        sxy = self.sxy + x0 * self.sy + y0 * (self.sx + n * x0)
+        if sxx == 0:
+            return np.nan
+        return sxy / sxx
+
+    def get_spread_moments(self, hedge_ratio=None):
+        """
+        Returns the mean and (population) standard deviation of the spread y - hedge_ratio * x over the window.
+
+        Parameters
+        ----------
+        @hedge_ratio: The hedge ratio of the spread, by default the current least squares one.
+        """
+        if hedge_ratio is None:
+            hedge_ratio = self.get_hedge_ratio()
+        if not self.is_ready():
+            return np.nan, np.nan
+
+        # The moments of the deviations of the spread from its value at the reference pair
+        n = float(len(self.pairs))
+        x0, y0 = self.ref
+        mean = (self.sy - hedge_ratio * self.sx) / n
+        sum_sq = self.syy - 2.0 * hedge_ratio * self.sxy + hedge_ratio * hedge_ratio * self.sxx
+        var = max(sum_sq / n - mean * mean, 0.0)
+        return y0 - hedge_ratio * x0 + mean, np.sqrt(var)
+
+    def get_spread_zscore(self, hedge_ratio=None):
+        """
+        Returns the Z-score of the latest spread value relative to the spread over the window.
+
+        Parameters
+        ----------
+        @hedge_ratio: The hedge ratio of the spread, by default the current least squares one.
+        """
+        if hedge_ratio is None:
+            hedge_ratio = self.get_hedge_ratio()
+        mean, std = self.get_spread_moments(hedge_ratio)
+        if not std > 0:
+            return np.nan
+        x, y = self.pairs[-1]
+        return (y - hedge_ratio * x - mean) / std
+
+
+# In[ ]:
+
+
+
@@ -0,0 +1,142 @@
+
+# coding: utf-8
+
+# In[1]:
+
+# SharedBars
+
+from __future__ import print_function
+
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # multiprocessing.shared_memory is only available from Python 3.8 onwards
+    shared_memory = None
+
+from EventDrivenBacktester.BarStore import BarStore
+
+
+# In[2]:
+
+class SharedBarSet(object):
+    """
+    SharedBarSet publishes a set of aligned BarStore objects into a single shared memory segment, so that
+    worker processes can attach to the bars rather than each loading and holding their own copy.
+
+    The segment holds the shared timeline followed by one block per symbol and field, and then the updated
+    masks of the symbols which have one, a byte per bar. The publishing
+    process owns the segment and must close() it once all the workers are done. The picklable descriptor
+    is all a worker needs in order to attach with attach_shared_bars().
+    """
+
+    def __init__(self, stores):
+        """
+        Copies the stores into a newly created shared memory segment.
+
+        Parameters
+        ----------
+        @stores: A dictionary of symbol -> BarStore, all sharing the same timeline.
+        """
+        if shared_memory is None:
+            raise ImportError("Sharing bars between processes requires multiprocessing.shared_memory (Python 3.8+).")
+
+        symbols = [(s, list(stores[s].fields)) for s in stores]
+        n_bars = len(next(iter(stores.values()))) if stores else 0
+        for s in stores:
+            if len(stores[s]) != n_bars:
+                raise ValueError("All the BarStores must share the same timeline to be published together.")
+
+        updated = [s for s in stores if stores[s].updated is not None]
+
+        n_blocks = 1 + sum(len(fields) for _, fields in symbols)
+        size = n_blocks * n_bars * 8 + len(updated) * n_bars
+        self.shared_memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self.descriptor = {'name': self.shared_memory.name, 'n_bars': n_bars, 'symbols': symbols, 'updated': updated}
+
+        # Copy the timeline, the columns and the updated masks into their blocks
+        arrays, masks = _map_blocks(self.shared_memory, self.descriptor)
+        if stores:
+            arrays[0][:] = next(iter(stores.values())).index
+        for block, (s, f) in zip(arrays[1:], _iter_blocks(symbols)):
+            block[:] = stores[s].columns[f]
+        for s in updated:
+            masks[s][:] = stores[s].updated
+
+    def close(self):
+        """
+        Releases and destroys the shared memory segment.
+        """
+        self.shared_memory.close()
+        self.shared_memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# In[3]:
+
+def _iter_blocks(symbols):
+    """
+    Yields the (symbol, field) pair of each column block in segment order.
+    """
+    for s, fields in symbols:
+        for f in fields:
+            yield s, f
+
+
+def _map_blocks(shm, descriptor):
+    """
+    Returns NumPy views of the timeline and of each column block of a shared memory segment, along with a
+    dictionary of views of the updated masks by symbol.
+    """
+    n_bars = descriptor['n_bars']
+    arrays = [np.ndarray((n_bars,), dtype='datetime64[ns]', buffer=shm.buf, offset=0)]
+    for i, _ in enumerate(_iter_blocks(descriptor['symbols'])):
+        arrays.append(np.ndarray((n_bars,), dtype=np.float64, buffer=shm.buf, offset=(i + 1) * n_bars * 8))
+
+    offset = len(arrays) * n_bars * 8
+    masks = {}
+    for i, s in enumerate(descriptor.get('updated', [])):
+        masks[s] = np.ndarray((n_bars,), dtype=np.bool_, buffer=shm.buf, offset=offset + i * n_bars)
+    return arrays, masks
+
+
+def attach_shared_bars(descriptor):
+    """
+    Attaches to a segment published by a SharedBarSet, returning the segment along with a dictionary
+    of read-only BarStore objects viewing it. No bars are copied.
+
+    The returned segment must be kept alive for as long as the stores are in use.
+
+    Parameters
+    ----------
+    @descriptor: The descriptor of the published SharedBarSet.
+    """
+    if shared_memory is None:
+        raise ImportError("Sharing bars between processes requires multiprocessing.shared_memory (Python 3.8+).")
+
+    try:
+        shm = shared_memory.SharedMemory(name=descriptor['name'], track=False)
+    except TypeError:
+        # Before Python 3.13 attaching also registers the segment with the resource tracker. Worker processes
+        # share the resource tracker of the publishing process, so this registration is a harmless duplicate.
+        shm = shared_memory.SharedMemory(name=descriptor['name'])
+
+    arrays, masks = _map_blocks(shm, descriptor)
+    columns = {}
+    for block, (s, f) in zip(arrays[1:], _iter_blocks(descriptor['symbols'])):
+        columns.setdefault(s, {})[f] = block
+
+    stores = dict((s, BarStore(arrays[0], columns.get(s, {}), masks.get(s))) for s, _ in descriptor['symbols'])
+    return shm, stores
+
+
+# In[ ]:
+
+
+
@@ -44,16 +44,80 @@ class Strategy(object):
     This is designed to work both with historic and live data as the Strategy object is 
     agnostic to where the data came from. This is because it obtains the bar tuples from
     a queue object.
+    
+    A strategy which cannot generate any signal over its first bars, while its lookback windows fill up,
+    declares their number as warmup_bars. The Backtest then fast-forwards the data handler over them rather
+    than drip-feeding them one MarketEvent at a time, and calls warm_up() so that the strategy can catch up.
+    
+    A strategy which only reads some of the fields of the bars declares them as required_fields, so that
+    data handlers which can load single columns, such as the ParquetDataHandler, skip the others.
+    None means that the strategy may read any field.
+    
+    A strategy which takes an indicator_cache keyword argument declares uses_indicator_cache, so that a
+    BacktestOptim passes it the IndicatorCache of the sweep.
     """
     
     __metaclass__ = ABCMeta
     
+    warmup_bars = 0
+    required_fields = None
+    uses_indicator_cache = False
+    
     @abstractmethod
     def calculate_signals(self, event):
         """
         Provides the mechanisms to calculate the list of signals.
         """
         raise NotImplementedError("Missing implementation for calculate_signals()")
+    
+    def warm_up(self, n_bars):
+        """
+        Catches up with the latest n_bars bars, which the data handler fed without any MarketEvent.
+        Indicators registered with the data handler are already up to date.
+        """
+        pass
+
+
+
+# In[5]:
+
+# Signal directions of a LockstepStrategy, one per parameter combination and symbol
+SIGNAL_NONE = 0
+SIGNAL_LONG = 1
+SIGNAL_SHORT = 2
+SIGNAL_EXIT = 3
+
+
+class LockstepStrategy(object):
+    """
+    LockstepStrategy is an abstract base class providing an interface for strategies which evaluate
+    many parameter combinations of the same strategy in a single pass over the market data.
+    
+    Rather than putting SignalEvents on the queue, a (derived) LockstepStrategy keeps its state in arrays
+    with one row per parameter combination, and returns a matrix of signal directions (SIGNAL_NONE, 
+    SIGNAL_LONG, SIGNAL_SHORT or SIGNAL_EXIT) with one row per combination and one column per symbol of 
+    self.signal_symbols, in the order the equivalent Strategy would have generated the signals.
+    
+    self.strategy_class is the equivalent Strategy class, whose results the lockstep evaluation reproduces.
+    """
+    
+    __metaclass__ = ABCMeta
+    
+    strategy_class = None
+    
+    @abstractmethod
+    def calculate_signals(self, event):
+        """
+        Provides the mechanisms to calculate the matrix of signal directions.
+        """
+        raise NotImplementedError("Missing implementation for calculate_signals()")
+    
+    def warm_up(self, n_bars):
+        """
+        Catches up with the latest n_bars bars, which the data handler fed without any MarketEvent, e.g. the
+        warm-up margin before the start date. Indicators registered with the data handler are already up to date.
+        """
+        pass
 
 
 # In[ ]:
@@ -0,0 +1,249 @@
+
+# coding: utf-8
+
+# In[1]:
+
+# StreamingBars
+
+from __future__ import print_function
+
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue  # Python 2
+
+import numpy as np
+import pandas as pd
+
+from EventDrivenBacktester.BarStore import BarStore, align_bar_stores, merge_timelines
+
+
+# In[2]:
+
+def _read_chunks(csv_path, names, chunksize):
+    """
+    Yields the (index, values) of each chunk of a CSV file of bars, with the values as a (bars, fields)
+    float64 array, checking that the bars are sorted in time.
+    """
+    last = None
+    for chunk in pd.read_csv(csv_path, header=0, index_col=0, parse_dates=True, names=names, chunksize=chunksize):
+        if len(chunk) == 0:
+            continue
+        index = chunk.index.values.astype('datetime64[ns]')
+        if (last is not None and index[0] < last) or np.any(index[1:] < index[:-1]):
+            raise ValueError("The bars in %s must be sorted by time to be streamed." % csv_path)
+        last = index[-1]
+        yield index, chunk[list(names[1:])].values.astype(np.float64)
+
+
+def iter_aligned_chunks(csv_paths, names, chunksize=100000, start_date=None, end_date=None, warmup_margin=0):
+    """
+    Reads the CSV files of several symbols chunk by chunk, yielding blocks of bars aligned onto the union of
+    their timelines as (index, values, updated) tuples. values is a (bars, symbols x fields) float64 array
+    with the fields of each symbol side by side, and updated a (bars, symbols) boolean array marking the bars
+    at which each symbol actually traded, as for align_bar_stores().
+
+    The chunks of the symbols are merged as they are read: each block ends at the earliest last timestamp of
+    the chunks at hand, so that every bar of the block is known for all the symbols, and the latest bar of
+    each symbol is carried over to pad the start of the next block. Only a few chunks are held at once,
+    however long the files are.
+
+    Parameters
+    ----------
+    @csv_paths: A list of (symbol, path) pairs.
+    @names: The column names of the files, the first one being the datetime index.
+    @chunksize: The number of CSV rows parsed at a time.
+    @start_date: The first datetime to yield, preceded by up to warmup_margin earlier bars.
+    @end_date: The last datetime to yield (inclusive).
+    @warmup_margin: The number of bars before start_date to yield as well.
+    """
+    fields = list(names[1:])
+    symbols = [s for s, _ in csv_paths]
+    readers = dict((s, _read_chunks(path, names, chunksize)) for s, path in csv_paths)
+    pending = dict((s, None) for s in symbols)  # The (index, values) read but not yet aligned
+    carry = dict((s, None) for s in symbols)  # The latest aligned bar, which pads the next block
+    exhausted = set()
+
+    start = None if start_date is None else pd.Timestamp(start_date).to_datetime64()
+    end = None if end_date is None else pd.Timestamp(end_date).to_datetime64()
+    tail = None  # The latest bars before start_date, kept as the warm-up margin until start_date is reached
+    finished = False
+
+    while True:
+        for s in symbols:
+            if pending[s] is None and s not in exhausted:
+                pending[s] = next(readers[s], None)
+                if pending[s] is None:
+                    exhausted.add(s)
+        available = [s for s in symbols if pending[s] is not None]
+        if not available:
+            break
+
+        # Every bar up to the bound is known for all the symbols which still have bars to read
+        bound = min(pending[s][0][-1] for s in available)
+        parts = {}
+        for s in available:
+            index, values = pending[s]
+            n = np.searchsorted(index, bound, side='right')
+            parts[s] = (index[:n], values[:n])
+            pending[s] = (index[n:], values[n:]) if n < len(index) else None
+
+        block_index = merge_timelines([index for index, _ in parts.values()])
+        stores = {}
+        for s in symbols:
+            idx, vals = parts.get(s, (np.array([], dtype='datetime64[ns]'), np.empty((0, len(fields)))))
+            if carry[s] is not None:
+                idx = np.concatenate([carry[s][0], idx])
+                vals = np.concatenate([carry[s][1], vals])
+            stores[s] = BarStore(idx, dict((f, vals[:, i]) for i, f in enumerate(fields)))
+            if len(idx):
+                carry[s] = (idx[-1:], vals[-1:])
+        aligned = align_bar_stores(stores, block_index)
+
+        values = np.column_stack([aligned[s].columns[f] for s in symbols for f in fields])
+        updated = np.column_stack([aligned[s].updated for s in symbols])
+
+        block = (block_index, values, updated)
+
+        if end is not None and block_index[-1] > end:
+            n = np.searchsorted(block_index, end, side='right')
+            block = tuple(b[:n] for b in block)
+            finished = True
+
+        if start is None:
+            if len(block[0]):
+                yield block
+        else:
+            # Until start_date is reached, only the latest warmup_margin bars before it are kept
+            n = np.searchsorted(block[0], start, side='left')
+            tail = tuple(np.concatenate([t, b[:n]]) for t, b in zip(tail or tuple(b[:0] for b in block), block))
+            tail = tuple(t[len(t) - min(warmup_margin, len(t)):] for t in tail)
+            if n < len(block[0]):
+                yield tuple(np.concatenate([t, b[n:]]) for t, b in zip(tail, block))
+                start = tail = None
+
+        if finished:
+            break
+
+    if tail is not None and len(tail[0]):
+        # The data ends before start_date, leaving only the warm-up margin
+        yield tail
+
+
+# In[3]:
+
+class ChunkReader(object):
+    """
+    ChunkReader runs a generator of blocks, e.g. iter_aligned_chunks(), in a background thread, so that the
+    next blocks are parsed while the engine consumes the current one. At most max_blocks blocks are buffered
+    ahead of the consumer, which keeps the memory bounded however long the files are.
+    """
+
+    _END = object()
+
+    def __init__(self, blocks, max_blocks=2):
+        """
+        Starts reading the blocks straight away.
+
+        Parameters
+        ----------
+        @blocks: The iterable of blocks to read.
+        @max_blocks: The number of blocks buffered ahead of the consumer.
+        """
+        self.queue = queue.Queue(maxsize=max_blocks)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(blocks,))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _put(self, item):
+        """
+        Puts an item on the queue, waiting for room unless the reader is stopped. Returns whether it was put.
+        """
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _run(self, blocks):
+        try:
+            for block in blocks:
+                if not self._put(block):
+                    return
+        except Exception as e:
+            # Errors are raised again in the consumer, by get()
+            self._put(e)
+        else:
+            self._put(self._END)
+
+    def get(self):
+        """
+        Returns the next block, waiting for it to be read if required, or None once all of them have been read.
+        """
+        item = self.queue.get()
+        if item is self._END:
+            self.stopped.set()
+            return None
+        if isinstance(item, Exception):
+            self.stopped.set()
+            raise item
+        return item
+
+    def close(self):
+        """
+        Stops the background thread, discarding the blocks not read yet.
+        """
+        self.stopped.set()
+        self.thread.join()
+
+
+# In[4]:
+
+class BarRing(object):
+    """
+    BarRing keeps the latest capacity rows of a stream of fixed-width rows, e.g. the bars of every symbol.
+
+    Each row is written twice, capacity rows apart, into an array of twice the capacity. The latest N rows
+    are then always a contiguous slice of the array, so reading them is a zero-copy view however the ring
+    has wrapped around.
+    """
+
+    def __init__(self, capacity, width, dtype=np.float64):
+        """
+        Parameters
+        ----------
+        @capacity: The number of rows kept.
+        @width: The number of values per row.
+        @dtype: The type of the values.
+        """
+        self.capacity = capacity
+        self.rows = np.zeros((2 * capacity, width), dtype=dtype)
+        self.count = 0
+
+        # Views are handed out from a read-only alias, while the ring itself is written through self.rows
+        self.view = self.rows.view()
+        self.view.flags.writeable = False
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, row):
+        """
+        Appends a row, overwriting the oldest one once the ring is full.
+        """
+        i = self.count % self.capacity
+        self.rows[i] = row
+        self.rows[i + self.capacity] = row
+        self.count += 1
+
+    def latest(self, n=1):
+        """
+        Returns a read-only view of the latest n rows (or fewer if less are kept), oldest first.
+        """
+        stop = (self.count - 1) % self.capacity + self.capacity + 1 if self.count else 0
+        return self.view[stop - min(n, len(self)):stop]
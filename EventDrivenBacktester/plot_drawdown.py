@@ -8,18 +8,13 @@
 
 # In[2]:
 
+import sys
+
 import matplotlib.pyplot as plt
 import numpy as np
 
-
-# In[3]:
-
-def create_data_matrix(csv_ref, col_index):
-    data = np.zeros((3,3))
-    for i in range(0,3):
-        for j in range(0,3):
-            data[i][j] = float(csv_ref[i*3+j][col_index])
-    return data
+from EventDrivenBacktester.ResultStore import DEFAULT_RESULTS_PATH, ResultStore
+from EventDrivenBacktester.plot_sharpe import create_data_matrix, query_sweep
 
 
 # In[4]:
@@ -27,25 +22,24 @@ def create_data_matrix(csv_ref, col_index):
 # Recall, we are slicing everything at w_l=100 in order to visualize the data in two dimensions
 # Looks like these two plot_* files can be condensed by passing appropriate data parameters...
 if __name__ == "__main__":
-    # Open the CSV file and obtain only the lines with a lookback value of 100
-    csv_file = open("", "r").readlines()
-    csv_ref = [c.strip().split(",") for c in csv_file if c[:3] == "100"]
-    data = create_data_matrix(csv_ref, 6)
+    # Query the result store for only the combinations of the sweep with a lookback value of 100
+    sweep = sys.argv[1] if len(sys.argv) > 1 else None
+    store = ResultStore(DEFAULT_RESULTS_PATH)
+    data, column_labels, row_labels = create_data_matrix(query_sweep(store, sweep, ols_window=100), "max_drawdown")
+    store.close()
     
     fig, ax = plt.subplots()
     heatmap = ax.pcolor(data, cmap=plt.cm.Reds)
-    row_labels = [0.5, 1.0, 1.5]
-    column_labels = [2.0, 3.0, 4.0]
     
     for y in range(data.shape[0]):
         for x in range(data.shape[1]):
             # Tags in the boxes
-            plt.text(x + 0.5, y + 0.5, '%.2f' % dat[y,x], horizontalalignment='center', verticalalignment='center',)
+            plt.text(x + 0.5, y + 0.5, '%.2f' % data[y,x], horizontalalignment='center', verticalalignment='center',)
     
     plt.colorbar(heatmap)
             
-    ax.set_xticks(np.arange(data.shape[0])+0.5, minor=False)
-    ax.set_yticks(np.arange(data.shape[1])+0.5, minor=False)
+    ax.set_xticks(np.arange(data.shape[1])+0.5, minor=False)
+    ax.set_yticks(np.arange(data.shape[0])+0.5, minor=False)
     ax.set_xticklabels(row_labels, minor=False)
     ax.set_yticklabels(column_labels, minor=False)
     
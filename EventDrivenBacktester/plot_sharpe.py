@@ -8,43 +8,65 @@
 
 # In[2]:
 
+import sys
+
 import matplotlib.pyplot as plt
 import numpy as np
 
+from EventDrivenBacktester.ResultStore import DEFAULT_RESULTS_PATH, ResultStore
+
 
 # In[3]:
 
-def create_data_matrix(csv_ref, col_index):
-    data = np.zeros((3,3))
-    for i in range(0,3):
-        for j in range(0,3):
-            data[i][j] = float(csv_ref[i*3+j][col_index])
-    return data
+def create_data_matrix(results, metric, row_key="zscore_high", col_key="zscore_low"):
+    """
+    Arranges a metric of a slice of sweep results into a matrix, with one row per value of row_key and one
+    column per value of col_key. Returns the matrix along with the sorted row and column values.
+    """
+    rows = sorted(set(p[row_key] for p, _ in results))
+    cols = sorted(set(p[col_key] for p, _ in results))
+    data = np.zeros((len(rows), len(cols)))
+    for p, stats in results:
+        data[rows.index(p[row_key])][cols.index(p[col_key])] = stats[metric]
+    return data, rows, cols
+
+
+def query_sweep(store, sweep=None, **params):
+    """
+    Returns the (params, stats) results of a single sweep matching the given parameter values. The results
+    of different sweeps (e.g. over different data or dates) cannot be compared, so if no sweep is named the
+    store must hold only one sweep with matching results.
+    """
+    if sweep is None:
+        sweeps = store.sweeps(**params)
+        if len(sweeps) > 1:
+            raise ValueError("The results store holds several sweeps, name one of: %s" % ", ".join(sweeps))
+        sweep = sweeps[0] if sweeps else None
+    return store.query(sweep=sweep, **params)
 
 
 # In[6]:
 
 # Recall, we are slicing everything at w_l=100 in order to visualize the data in two dimensions
 if __name__ == "__main__":
-    # Open the CSV file and obtain only the lines with a lookback value of 100
-    csv_file = open("", "r").readlines()
-    csv_ref = [c.strip().split(",") for c in csv_file if c[:3] == "100"]
-    data = create_data_matrix(csv_ref, 5)
+    # Query the result store for only the combinations of the sweep with a lookback value of 100
+    sweep = sys.argv[1] if len(sys.argv) > 1 else None
+    store = ResultStore(DEFAULT_RESULTS_PATH)
+    data, column_labels, row_labels = create_data_matrix(query_sweep(store, sweep, ols_window=100), "sharpe")
+    store.close()
     
     fig, ax = plt.subplots()
     heatmap = ax.pcolor(data, cmap=plt.cm.Blues)
-    row_labels = [0.5, 1.0, 1.5]
-    column_labels = [2.0, 3.0, 4.0]
     
     for y in range(data.shape[0]):
         for x in range(data.shape[1]):
             # Tags in the boxes
-            plt.text(x + 0.5, y + 0.5, '%.2f' % dat[y,x], horizontalalignment='center', verticalalignment='center',)
+            plt.text(x + 0.5, y + 0.5, '%.2f' % data[y,x], horizontalalignment='center', verticalalignment='center',)
     
     plt.colorbar(heatmap)
             
-    ax.set_xticks(np.arange(data.shape[0])+0.5, minor=False)
-    ax.set_yticks(np.arange(data.shape[1])+0.5, minor=False)
+    ax.set_xticks(np.arange(data.shape[1])+0.5, minor=False)
+    ax.set_yticks(np.arange(data.shape[0])+0.5, minor=False)
     ax.set_xticklabels(row_labels, minor=False)
     ax.set_yticklabels(column_labels, minor=False)
     
@@ -30,6 +30,30 @@ def create_sharpe_ratio(returns, periods=252):
 
 # In[4]:
 
+def _drawdown_arrays(pnl):
+    """
+    Calculates the High Water Mark, drawdown and drawdown duration arrays of a PnL curve with NumPy.
+    
+    The High Water Mark starts at zero and is never raised by missing (NaN) values of the curve. The first
+    period carries no drawdown or duration, as the equity curve has no return for it.
+    """
+    values = np.asarray(pnl, dtype=np.float64)
+    n = len(values)
+    
+    # Running maximum (ignoring NaNs), seeded with the zero High Water Mark in place of the first period
+    hwm = np.fmax.accumulate(np.concatenate(([0.0], values[1:])))
+    drawdown = hwm - values
+    drawdown[:1] = np.nan
+    
+    # Run-length of consecutive periods in drawdown, resetting at every new High Water Mark
+    t = np.arange(n)
+    reset = np.where(drawdown == 0, t, 0)
+    duration = (t - np.maximum.accumulate(reset)).astype(np.float64)
+    duration[:1] = np.nan
+    
+    return hwm, drawdown, duration
+
+
 def create_drawdowns(pnl):
     """
     Calculate the largest peak-to-trough drawdown for the PnL curve, as well as the duration
@@ -45,24 +69,163 @@ def create_drawdowns(pnl):
     :drawdown: Highest to peak-to-trough drawdown.
     :duration: Longest duration spent in drawdown.
     """
-    
-    # Calculate the cumulative returns curve and set up the High Water Mark
-    hwm = [0]
+    _, drawdown, duration = _drawdown_arrays(pnl)
     
     # Create the drawdown and duration series
     idx = pnl.index
-    drawdown = pd.Series(index=idx)
-    duration = pd.Series(index=idx)
-    
-    # Loop over the index range
-    for t in range(1, len(idx)):
-        hwm.append(max(hwm[t-1], pnl[t]))
-        drawdown[t] = (hwm[t]-pnl[t])
-        duration[t] = (0 if drawdown[t] == 0 else duration[t-1]+1)
+    drawdown = pd.Series(drawdown, index=idx)
+    duration = pd.Series(duration, index=idx)
     
     return drawdown, drawdown.max(), duration.max()
 
 
+# In[5]:
+
+def create_drawdown_episodes(pnl, top_n=None):
+    """
+    Splits the PnL curve into its individual drawdown episodes, each running from a peak (the last
+    High Water Mark) through its trough to the recovery (the next period back at a High Water Mark).
+    
+    Parameters
+    ----------
+    @pnl: A pandas Series representing the equity curve.
+    @top_n: The number of deepest episodes to return, or None for all of them.
+    
+    Returns
+    -------
+    :episodes: A pandas DataFrame with one row per episode, deepest first, with the peak, trough and
+        recovery timestamps (recovery is NaT if the curve never recovered), the drawdown depth, the
+        duration in periods (peak to recovery, or to the end of the curve) and the recovery time in
+        periods (trough to recovery, NaN if unrecovered).
+    """
+    _, drawdown, _ = _drawdown_arrays(pnl)
+    idx = pnl.index
+    n = len(drawdown)
+    
+    # An episode is a maximal run of periods with a positive drawdown
+    in_dd = np.nan_to_num(drawdown) > 0
+    edges = np.diff(np.concatenate(([0], in_dd.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)  # One past the last period in drawdown, i.e. the recovery period
+    
+    columns = ['peak', 'trough', 'recovery', 'depth', 'duration', 'recovery_time']
+    if len(starts) == 0:
+        return pd.DataFrame(columns=columns)
+    
+    # Depth and trough of every episode at once: sort the periods by (episode, -drawdown) and take the first
+    episode = np.cumsum(edges[:-1] == 1) - 1
+    members = np.flatnonzero(in_dd)
+    order = np.lexsort((-drawdown[members], episode[members]))
+    firsts = np.concatenate(([0], np.flatnonzero(np.diff(episode[members][order])) + 1))
+    troughs = members[order][firsts]
+    depths = drawdown[troughs]
+    
+    # The first period never carries a drawdown, so every episode is preceded by its peak
+    peaks = starts - 1
+    recovered = ends < n
+    recovery = np.where(recovered, ends, n - 1)
+    
+    episodes = pd.DataFrame({
+        'peak': idx[peaks],
+        'trough': idx[troughs],
+        'recovery': pd.Series(idx[recovery]).where(recovered).values,
+        'depth': depths,
+        'duration': recovery - peaks,
+        'recovery_time': np.where(recovered, ends - troughs, np.nan),
+    }, columns=columns)
+    
+    episodes = episodes.sort_values('depth', ascending=False, kind='mergesort').reset_index(drop=True)
+    return episodes if top_n is None else episodes.head(top_n)
+
+
+# In[6]:
+
+class RunningPerformance(object):
+    """
+    Incrementally tracks the performance statistics of a portfolio, one bar at a time, so that they are
+    available during the run without keeping the equity curve in memory.
+    
+    The mean and variance of the period returns are updated with Welford's algorithm, while the High Water
+    Mark, drawdown and drawdown duration follow the equity curve as it is built. The statistics match those
+    calculated after the run by create_sharpe_ratio() and create_drawdowns() on the full equity curve.
+    """
+    
+    def __init__(self, periods=252):
+        """
+        Initializes the accumulator.
+        
+        Parameters
+        ----------
+        @periods: Daily (252), Hourly (252*6.5), Minutely (252*6.5*60), etc.
+        """
+        self.periods = periods
+        
+        self.last_total = None
+        self.n_returns = 0
+        self.mean_return = 0.0
+        self.m2 = 0.0  # Sum of the squared deviations from the mean return
+        
+        self.equity = 1.0
+        self.hwm = 0.0
+        self.drawdown = 0.0
+        self.max_drawdown = 0.0
+        self.duration = 0
+        self.max_duration = 0
+    
+    def update(self, total):
+        """
+        Updates the statistics with the total value of the portfolio at a new bar. The first call only
+        records the starting value, which carries no return.
+        
+        Parameters
+        ----------
+        @total: The total value of the portfolio.
+        """
+        last_total = self.last_total
+        self.last_total = total
+        if last_total is None:
+            return
+        
+        ret = total / last_total - 1.0
+        if ret != ret:
+            # Missing (NaN) returns are skipped, though the period still counts towards the drawdown duration
+            self.duration += 1
+        else:
+            # Welford's online update of the mean and variance
+            self.n_returns += 1
+            delta = ret - self.mean_return
+            self.mean_return += delta / self.n_returns
+            self.m2 += delta * (ret - self.mean_return)
+            
+            self.equity *= 1.0 + ret
+            if self.equity > self.hwm:
+                self.hwm = self.equity
+            self.drawdown = self.hwm - self.equity
+            self.duration = 0 if self.drawdown == 0 else self.duration + 1
+            if self.drawdown > self.max_drawdown:
+                self.max_drawdown = self.drawdown
+        
+        if self.duration > self.max_duration:
+            self.max_duration = self.duration
+    
+    def get_sharpe_ratio(self):
+        """
+        Returns the Sharpe ratio of the returns so far, based on a benchmark of zero.
+        """
+        if self.n_returns == 0 or self.m2 == 0:
+            return np.nan
+        return np.sqrt(self.periods) * self.mean_return / np.sqrt(self.m2 / self.n_returns)
+    
+    def get_stats(self):
+        """
+        Returns the summary statistics so far, in the same form as Portfolio.output_summary_stats().
+        """
+        return [("Total Return", "%0.2f%%" % ((self.equity - 1.0) * 100.0)), 
+                ("Sharpe Ratio", "%0.2f" % self.get_sharpe_ratio()), 
+                ("Max Drawdown", "%0.2f%%" % (self.max_drawdown * 100.0)), 
+                ("Drawdown Duration", "%d" % self.max_duration)]
+
+
 # In[ ]:
 
 
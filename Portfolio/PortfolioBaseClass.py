@@ -11,6 +11,7 @@
 from __future__ import print_function
 
 import datetime
+import logging
 from math import floor
 try:
     import Queue as queue
@@ -20,8 +21,15 @@ except ImportError:
 import numpy as np
 import pandas as pd
 
-from EventDrivenBacktester.EventClasses import FillEvent, OrderEvent
-from Portfolio.PerformanceTools import create_sharpe_ratio, create_drawdowns
+from EventDrivenBacktester.BacktestLogging import get_logger
+from EventDrivenBacktester.EventClasses import (
+    FillEvent, OrderEvent, FILL, SIGNAL, IB_MIN_COMMISSION, IB_RATE_LARGE_ORDER, IB_RATE_SMALL_ORDER, IB_TIER_QUANTITY
+)
+from EventDrivenBacktester.StrategyABC import SIGNAL_EXIT, SIGNAL_LONG, SIGNAL_SHORT
+from Portfolio.PerformanceTools import create_sharpe_ratio, create_drawdowns, RunningPerformance
+from Portfolio.PortfolioHistory import ArrayHistory
+
+logger = get_logger('portfolio')
 
 
 # In[7]:
@@ -40,7 +48,9 @@ class Portfolio(object):
     interpret FillEvent objects to update positions.
     """
     
-    def __init__(self, bars, events, start_date, initial_capital=100000.0):
+    price_field = "adj_close"
+    
+    def __init__(self, bars, events, start_date, initial_capital=100000.0, keep_history=True):
         """
         Initializes the Portfolio with bars and an event queue.
         Also includes a starting datetime index and initial capital ($USD unless otherwise stated).
@@ -51,40 +61,45 @@ class Portfolio(object):
         @events: The Event Queue object.
         @start_date: The start date (bar) of the portfolio.
         @initial_capital: The starting capital in USD.
+        @keep_history: Whether to keep the full positions and holdings history. Without it, only the running
+            performance statistics (live_stats) are available at the end of the run, and no equity curve.
         """
         self.bars = bars
         self.events = events
         self.symbol_list = self.bars.symbol_list
         self.start_date = start_date
         self.initial_capital = initial_capital
+        self.keep_history = keep_history
         
         self.all_positions = self.construct_all_positions()
         self.current_positions = dict((k,v) for k,v in [(s,0) for s in self.symbol_list]) # Dictionary comprehension...
         self.all_holdings = self.construct_all_holdings()
         self.current_holdings = self.construct_current_holdings()
         
+        # Performance statistics updated on every bar, available during the run
+        self.live_stats = RunningPerformance(periods=252)
+        self.live_stats.update(self.initial_capital)
+        
     def construct_all_positions(self):
         """
-        Construct the positions list using the start_date to determine when the time index will begin.
+        Construct the positions history using the start_date to determine when the time index will begin.
+        The history holds one column of quantities per symbol.
         """
-        # Creates a dictionary for each symbol, sets a value of 0 for each, adds a datetime key, adds it to a list.
-        d = dict((k,v) for k,v in [(s,0) for s in self.symbol_list]) # self.current_positions
-        d['datetime'] = self.start_date
+        h = ArrayHistory(self.symbol_list)
+        h.append(self.start_date, [0.0 for s in self.symbol_list])
         
-        return [d]
+        return h
     
     def construct_all_holdings(self):
         """
-        Constructs the historical list of all symbol holdings, using the start_date to determine
-        when the time index will begin.
+        Constructs the history of all symbol holdings, using the start_date to determine
+        when the time index will begin. The history holds one column of market value per symbol,
+        followed by the cash, commission and total columns.
         """
-        d = dict((k,v) for k,v in [(s,0.0) for s in self.symbol_list])
-        d['datetime'] = self.start_date
-        d['cash'] = self.initial_capital
-        d['commission'] = 0.0
-        d['total'] = self.initial_capital
+        h = ArrayHistory(list(self.symbol_list) + ['cash', 'commission', 'total'])
+        h.append(self.start_date, [0.0 for s in self.symbol_list] + [self.initial_capital, 0.0, self.initial_capital])
         
-        return [d]
+        return h
     
     def construct_current_holdings(self):
         """
@@ -113,32 +128,58 @@ class Portfolio(object):
         
         # Update positions
         # ================
-        dp = dict((k,v) for k,v in [(s,0) for s in self.symbol_list])
-        dp['datetime'] = latest_datetime
-        
-        for s in self.symbol_list:
-            dp[s] = self.current_positions[s]
+        if self.keep_history:
+            dp = [self.current_positions[s] for s in self.symbol_list]
             
-        # Append the current positions
-        self.all_positions.append(dp)
+            # Append the current positions
+            self.all_positions.append(latest_datetime, dp)
         
         # Update holdings
         # ===============
-        dh = dict((k,v) for k,v in [(s,0) for s in self.symbol_list])
-        dh['datetime'] = latest_datetime
-        dh['cash'] = self.current_holdings['cash']
-        dh['commission'] = self.current_holdings['commission']
-        dh['total'] = self.current_holdings['cash']
-        
-        for s in self.symbol_list:
-            # Approximation to the real value
-            market_value = self.current_positions[s] * self.bars.get_latest_bar_value(s, "adj_close")
-            dh[s] = market_value
-            dh['total'] += market_value
+        # Approximation to the real value
+        dh = [self.current_positions[s] * self.bars.get_latest_bar_value(s, self.price_field) for s in self.symbol_list]
+        cash = self.current_holdings['cash']
+        dh += [cash, self.current_holdings['commission'], sum(dh, cash)]
             
+        # Update the running performance statistics
+        self.live_stats.update(dh[-1])
+        
         # Append the current holdings
-        self.all_holdings.append(dh)
-        print('timeindex: ', dh)
+        if self.keep_history:
+            self.all_holdings.append(latest_datetime, dh)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('timeindex: %s', dict(zip(self.all_holdings.columns, dh)))
+        
+    def backfill(self, datetimes):
+        """
+        Records the positions and holdings of the bars fast-forwarded by the data handler over the warm-up period
+        of the strategy, all at once. No signals are generated over the warm-up bars, so the positions, cash and
+        commission stay the same throughout, and only the market value of the holdings follows the prices.
+        
+        Parameters
+        ----------
+        @datetimes: The timestamps of the latest len(datetimes) bars, which were not drip-fed one by one.
+        """
+        n = len(datetimes)
+        if n == 0:
+            return
+        
+        # The same values, summed in the same order, as update_timeindex() records bar by bar
+        dh = [self.current_positions[s] * self.bars.get_latest_bars_values(s, self.price_field, N=n) for s in self.symbol_list]
+        cash = self.current_holdings['cash']
+        total = np.full(n, cash)
+        for values in dh:
+            total = total + values
+        
+        # Update the running performance statistics
+        for t in total.tolist():
+            self.live_stats.update(t)
+        
+        if self.keep_history:
+            dp = [self.current_positions[s] for s in self.symbol_list]
+            self.all_positions.extend(datetimes, np.tile(dp, (n, 1)))
+            commission = np.full(n, self.current_holdings['commission'])
+            self.all_holdings.extend(datetimes, np.column_stack(dh + [np.full(n, cash), commission, total]))
         
     def update_positions_from_fill(self, fill):
         """
@@ -159,7 +200,7 @@ class Portfolio(object):
         
         # Update positions list with new quantities
         self.current_positions[fill.symbol] += fill_dir*fill.quantity
-        print('positions: ', self.current_positions)
+        logger.debug('positions: %s', self.current_positions)
     
     def update_holdings_from_fill(self, fill):
         """
@@ -186,7 +227,7 @@ class Portfolio(object):
             fill_dir = -1
         
         # Update holdings list with new quantities
-        fill_cost = self.bars.get_latest_bar_value(fill.symbol, "adj_close")
+        fill_cost = self.bars.get_latest_bar_value(fill.symbol, self.price_field)
         cost = fill_dir * fill_cost * fill.quantity
         self.current_holdings[fill.symbol] += cost
         self.current_holdings['commission'] += fill.commission
@@ -206,7 +247,7 @@ class Portfolio(object):
         ----------
         @event: The Event object being passed into subsequent methods as a FillEvent.
         """
-        if event.type == 'FILL':
+        if event.kind == FILL:
             self.update_positions_from_fill(event)
             self.update_holdings_from_fill(event)
     
@@ -261,32 +302,41 @@ class Portfolio(object):
         ----------
         @event: The SignalEvent being passed to the Portfolio
         """
-        if event.type == 'SIGNAL':
+        if event.kind == SIGNAL:
             order_event = self.generate_naive_order(event)
             self.events.put(order_event)
 
     def create_equity_curve_dataframe(self):
         """
-        Creates a pandas DataFrame from the all_holdings list of dictionaries.
+        Creates a pandas DataFrame from the all_holdings history arrays.
         Creates a returns stream and normalizes the equity curve to be percentage-based.
         Thus, initial account size is 1.0, as opposed to the absolute dollar amount.
+        
+        Without a kept history, there is no equity curve and equity_curve is set to None.
         """
+        if not self.keep_history:
+            self.equity_curve = None
+            return
+        
         # returns the cumulative product for percent change over every timestamp in the index
-        curve = pd.DataFrame(self.all_holdings)
-        curve.set_index('datetime', inplace=True)
+        curve = self.all_holdings.to_dataframe()
         curve['returns'] = curve['total'].pct_change()
         #curve['equity_curve'] = (1.0+curve['returns']).cumprod()
         curve['equity_curve'] = curve['returns']
         curve['equity_curve'] += 1
         curve['equity_curve'] = curve['equity_curve'].cumprod()
         self.equity_curve = curve
-        print(curve)
+        logger.debug('equity curve:\n%s', curve)
     
     def output_summary_stats(self):
         """
         Creates a list of summary statistics for the portfolio based on the strategy's performance.
+        Without a kept history, the running statistics are returned instead.
         """
-        total_return = self.equity_curve['equity_curve'][-1]
+        if not self.keep_history:
+            return self.live_stats.get_stats()
+        
+        total_return = self.equity_curve['equity_curve'].iloc[-1]
         returns = self.equity_curve['returns']
         pnl = self.equity_curve['equity_curve']
         
@@ -320,7 +370,9 @@ class PortfolioHFT(object):
     interpret FillEvent objects to update positions.
     """
     
-    def __init__(self, bars, events, start_date, initial_capital=100000.0):
+    price_field = "close"
+    
+    def __init__(self, bars, events, start_date, initial_capital=100000.0, keep_history=True):
         """
         Initializes the Portfolio with bars and an event queue.
         Also includes a starting datetime index and initial capital ($USD unless otherwise stated).
@@ -331,40 +383,45 @@ class PortfolioHFT(object):
         @events: The Event Queue object.
         @start_date: The start date (bar) of the portfolio.
         @initial_capital: The starting capital in USD.
+        @keep_history: Whether to keep the full positions and holdings history. Without it, only the running
+            performance statistics (live_stats) are available at the end of the run, and no equity curve.
         """
         self.bars = bars
         self.events = events
         self.symbol_list = self.bars.symbol_list
         self.start_date = start_date
         self.initial_capital = initial_capital
+        self.keep_history = keep_history
         
         self.all_positions = self.construct_all_positions()
         self.current_positions = dict((k,v) for k,v in [(s,0) for s in self.symbol_list]) # Dictionary comprehension...
         self.all_holdings = self.construct_all_holdings()
         self.current_holdings = self.construct_current_holdings()
         
+        # Performance statistics updated on every bar, available during the run
+        self.live_stats = RunningPerformance(periods=252*6.5*60)
+        self.live_stats.update(self.initial_capital)
+        
     def construct_all_positions(self):
         """
-        Construct the positions list using the start_date to determine when the time index will begin.
+        Construct the positions history using the start_date to determine when the time index will begin.
+        The history holds one column of quantities per symbol.
         """
-        # Creates a dictionary for each symbol, sets a value of 0 for each, adds a datetime key, adds it to a list.
-        d = dict((k,v) for k,v in [(s,0) for s in self.symbol_list]) # self.current_positions
-        d['datetime'] = self.start_date
+        h = ArrayHistory(self.symbol_list)
+        h.append(self.start_date, [0.0 for s in self.symbol_list])
         
-        return [d]
+        return h
     
     def construct_all_holdings(self):
         """
-        Constructs the historical list of all symbol holdings, using the start_date to determine
-        when the time index will begin.
+        Constructs the history of all symbol holdings, using the start_date to determine
+        when the time index will begin. The history holds one column of market value per symbol,
+        followed by the cash, commission and total columns.
         """
-        d = dict((k,v) for k,v in [(s,0.0) for s in self.symbol_list])
-        d['datetime'] = self.start_date
-        d['cash'] = self.initial_capital
-        d['commission'] = 0.0
-        d['total'] = self.initial_capital
+        h = ArrayHistory(list(self.symbol_list) + ['cash', 'commission', 'total'])
+        h.append(self.start_date, [0.0 for s in self.symbol_list] + [self.initial_capital, 0.0, self.initial_capital])
         
-        return [d]
+        return h
     
     def construct_current_holdings(self):
         """
@@ -393,31 +450,56 @@ class PortfolioHFT(object):
         
         # Update positions
         # ================
-        dp = dict((k,v) for k,v in [(s,0) for s in self.symbol_list])
-        dp['datetime'] = latest_datetime
-        
-        for s in self.symbol_list:
-            dp[s] = self.current_positions[s]
+        if self.keep_history:
+            dp = [self.current_positions[s] for s in self.symbol_list]
             
-        # Append the current positions
-        self.all_positions.append(dp)
+            # Append the current positions
+            self.all_positions.append(latest_datetime, dp)
         
         # Update holdings
         # ===============
-        dh = dict((k,v) for k,v in [(s,0) for s in self.symbol_list])
-        dh['datetime'] = latest_datetime
-        dh['cash'] = self.current_holdings['cash']
-        dh['commission'] = self.current_holdings['commission']
-        dh['total'] = self.current_holdings['cash']
-        
-        for s in self.symbol_list:
-            # Approximation to the real value
-            market_value = self.current_positions[s] * self.bars.get_latest_bar_value(s, "close")
-            dh[s] = market_value
-            dh['total'] += market_value
+        # Approximation to the real value
+        dh = [self.current_positions[s] * self.bars.get_latest_bar_value(s, self.price_field) for s in self.symbol_list]
+        cash = self.current_holdings['cash']
+        dh += [cash, self.current_holdings['commission'], sum(dh, cash)]
             
+        # Update the running performance statistics
+        self.live_stats.update(dh[-1])
+        
         # Append the current holdings
-        self.all_holdings.append(dh)
+        if self.keep_history:
+            self.all_holdings.append(latest_datetime, dh)
+        
+    def backfill(self, datetimes):
+        """
+        Records the positions and holdings of the bars fast-forwarded by the data handler over the warm-up period
+        of the strategy, all at once. No signals are generated over the warm-up bars, so the positions, cash and
+        commission stay the same throughout, and only the market value of the holdings follows the prices.
+        
+        Parameters
+        ----------
+        @datetimes: The timestamps of the latest len(datetimes) bars, which were not drip-fed one by one.
+        """
+        n = len(datetimes)
+        if n == 0:
+            return
+        
+        # The same values, summed in the same order, as update_timeindex() records bar by bar
+        dh = [self.current_positions[s] * self.bars.get_latest_bars_values(s, self.price_field, N=n) for s in self.symbol_list]
+        cash = self.current_holdings['cash']
+        total = np.full(n, cash)
+        for values in dh:
+            total = total + values
+        
+        # Update the running performance statistics
+        for t in total.tolist():
+            self.live_stats.update(t)
+        
+        if self.keep_history:
+            dp = [self.current_positions[s] for s in self.symbol_list]
+            self.all_positions.extend(datetimes, np.tile(dp, (n, 1)))
+            commission = np.full(n, self.current_holdings['commission'])
+            self.all_holdings.extend(datetimes, np.column_stack(dh + [np.full(n, cash), commission, total]))
         
     def update_positions_from_fill(self, fill):
         """
@@ -433,7 +515,7 @@ class PortfolioHFT(object):
         fill_dir = 0
         if fill.direction == 'BUY':
             fill_dir = 1
-        if fill.directoin == 'SELL':
+        if fill.direction == 'SELL':
             fill_dir = -1
         
         # Update positions list with new quantities
@@ -464,7 +546,7 @@ class PortfolioHFT(object):
             fill_dir = -1
         
         # Update holdings list with new quantities
-        fill_cost = self.bars.get_latest_bar_value(fill.symbol, "close")
+        fill_cost = self.bars.get_latest_bar_value(fill.symbol, self.price_field)
         cost = fill_dir * fill_cost * fill.quantity
         self.current_holdings[fill.symbol] += cost
         self.current_holdings['commission'] += fill.commission
@@ -481,7 +563,7 @@ class PortfolioHFT(object):
         ----------
         @event: The Event object being passed into subsequent methods as a FillEvent.
         """
-        if event.type == 'FILL':
+        if event.kind == FILL:
             self.update_positions_from_fill(event)
             self.update_holdings_from_fill(event)
     
@@ -534,19 +616,24 @@ class PortfolioHFT(object):
         ----------
         @event: The SignalEvent being passed to the Portfolio
         """
-        if event.type == 'SIGNAL':
+        if event.kind == SIGNAL:
             order_event = self.generate_naive_order(event)
             self.events.put(order_event)
 
     def create_equity_curve_dataframe(self):
         """
-        Creates a pandas DataFrame from the all_holdings list of dictionaries.
+        Creates a pandas DataFrame from the all_holdings history arrays.
         Creates a returns stream and normalizes the equity curve to be percentage-based.
         Thus, initial account size is 1.0, as opposed to the absolute dollar amount.
+        
+        Without a kept history, there is no equity curve and equity_curve is set to None.
         """
+        if not self.keep_history:
+            self.equity_curve = None
+            return
+        
         # returns the cumulative product for percent change over every timestamp in the index
-        curve = pd.DataFrame(self.all_holdings)
-        curve.set_index('datetime', inplace=True)
+        curve = self.all_holdings.to_dataframe()
         curve['returns'] = curve['total'].pct_change()
         #curve['equity_curve'] = (1.0+curve['returns']).cumprod()
         curve['equity_curve'] = curve['returns']
@@ -557,8 +644,12 @@ class PortfolioHFT(object):
     def output_summary_stats(self):
         """
         Creates a list of summary statistics for the portfolio based on the strategy's performance.
+        Without a kept history, the running statistics are returned instead.
         """
-        total_return = self.equity_curve['equity_curve'][-1]
+        if not self.keep_history:
+            return self.live_stats.get_stats()
+        
+        total_return = self.equity_curve['equity_curve'].iloc[-1]
         returns = self.equity_curve['returns']
         pnl = self.equity_curve['equity_curve']
         
@@ -576,6 +667,138 @@ class PortfolioHFT(object):
         return stats
 
 
+
+# In[8]:
+
+class PortfolioLockstep(object):
+    """
+    PortfolioLockstep tracks the portfolios of many parameter combinations of a strategy at once, for use with
+    a LockstepStrategy. The positions are held in a matrix with one row per combination and one column per symbol,
+    alongside vectors of cash and cumulative commission.
+    
+    Orders are sized exactly as Portfolio.generate_naive_order() sizes them (including the zero-share order
+    of a SHORT signal), and are filled immediately at the latest price with the commission of a FillEvent, as
+    with the SimulatedExecutionHandler. Each row therefore follows the same path as a Portfolio running that
+    combination on its own. Only the history of the totals is kept, from which the summary statistics of every
+    combination are calculated at the end of the run.
+    
+    self.portfolio_class is the equivalent Portfolio class, whose results the lockstep evaluation reproduces.
+    """
+    
+    portfolio_class = Portfolio
+    price_field = "adj_close"
+    periods = 252
+    
+    def __init__(self, bars, start_date, n_variants, initial_capital=100000.0):
+        """
+        Initializes the portfolios of every combination with the same starting capital.
+        
+        Parameters
+        ----------
+        @bars: The DataHandler object with current market data.
+        @start_date: The start date (bar) of the portfolio.
+        @n_variants: The number of parameter combinations.
+        @initial_capital: The starting capital in USD.
+        """
+        self.bars = bars
+        self.symbol_list = self.bars.symbol_list
+        self.start_date = start_date
+        self.n_variants = n_variants
+        self.initial_capital = initial_capital
+        
+        self.positions = np.zeros((n_variants, len(self.symbol_list)))
+        self.cash = np.full(n_variants, float(initial_capital))
+        self.commission = np.zeros(n_variants)
+        
+        self.all_totals = ArrayHistory(range(n_variants))
+        self.all_totals.append(self.start_date, self.cash)
+    
+    def update_timeindex(self, event):
+        """
+        Appends the total market value of every combination's portfolio at the latest bar to the history,
+        as Portfolio.update_timeindex() does before the bar's fills are processed.
+        """
+        latest_datetime = self.bars.get_latest_bar_datetime(self.symbol_list[0])
+        
+        # Summed in the same order as the holdings of a Portfolio
+        total = self.cash.copy()
+        for j, s in enumerate(self.symbol_list):
+            total += self.positions[:, j] * self.bars.get_latest_bar_value(s, self.price_field)
+        self.all_totals.append(latest_datetime, total)
+    
+    def update_signals(self, signal_symbols, directions):
+        """
+        Generates and fills the naive orders of a matrix of signal directions, returning the number of
+        orders of each combination. At most one signal per symbol is expected for each bar.
+        
+        Parameters
+        ----------
+        @signal_symbols: The symbols of the columns of the matrix, in the order the signals were generated.
+        @directions: The matrix of signal directions, one row per combination.
+        """
+        n_orders = np.zeros(self.n_variants, dtype=np.int64)
+        for j, s in enumerate(signal_symbols):
+            d = directions[:, j]
+            k = self.symbol_list.index(s)
+            cur_quantity = self.positions[:, k]
+            
+            buy_long = (d == SIGNAL_LONG) & (cur_quantity == 0)
+            sell_short = (d == SIGNAL_SHORT) & (cur_quantity == 0)
+            sell_exit = (d == SIGNAL_EXIT) & (cur_quantity > 0)
+            buy_exit = (d == SIGNAL_EXIT) & (cur_quantity < 0)
+            has_order = buy_long | sell_short | sell_exit | buy_exit
+            if not has_order.any():
+                continue
+            
+            # Order quantities, directions and commissions of generate_naive_order() and FillEvent
+            quantity = np.where(buy_long, 100.0, np.abs(cur_quantity))
+            fill_dir = np.where(buy_long | buy_exit, 1.0, -1.0)
+            commission = np.maximum(IB_MIN_COMMISSION, np.where(
+                quantity <= IB_TIER_QUANTITY, IB_RATE_SMALL_ORDER * quantity, IB_RATE_LARGE_ORDER * quantity
+            ))
+            
+            fill_cost = self.bars.get_latest_bar_value(s, self.price_field)
+            cost = np.where(has_order, fill_dir * fill_cost * quantity, 0.0)
+            commission = np.where(has_order, commission, 0.0)
+            self.positions[:, k] += np.where(has_order, fill_dir * quantity, 0.0)
+            self.commission += commission
+            self.cash -= (cost + commission)
+            n_orders += has_order
+        return n_orders
+    
+    def output_summary_stats(self):
+        """
+        Creates the list of summary statistics of every combination, calculated as Portfolio.output_summary_stats()
+        calculates them from its equity curve.
+        """
+        totals = self.all_totals.to_dataframe()
+        
+        stats_list = []
+        for v in range(self.n_variants):
+            returns = totals[v].pct_change()
+            pnl = (returns + 1).cumprod()
+            total_return = pnl.iloc[-1]
+            
+            sharpe_ratio = create_sharpe_ratio(returns, periods=self.periods)
+            drawdown, max_dd, dd_duration = create_drawdowns(pnl)
+            
+            stats_list.append([("Total Return", "%0.2f%%" % ((total_return - 1.0) * 100.0)), 
+                               ("Sharpe Ratio", "%0.2f" % sharpe_ratio), 
+                               ("Max Drawdown", "%0.2f%%" % (max_dd * 100.0)), 
+                               ("Drawdown Duration", "%d" % dd_duration)])
+        return stats_list
+
+
+class PortfolioHFTLockstep(PortfolioLockstep):
+    """
+    The lockstep equivalent of PortfolioHFT, valuing and filling at the close of minutely bars.
+    """
+    
+    portfolio_class = PortfolioHFT
+    price_field = "close"
+    periods = 252*6.5*60
+
+
 # In[ ]:
 
 
@@ -0,0 +1,106 @@
+
+# coding: utf-8
+
+# In[1]:
+
+# PortfolioHistory
+
+
+# In[2]:
+
+from __future__ import print_function
+
+import numpy as np
+import pandas as pd
+
+
+# In[3]:
+
+class ArrayHistory(object):
+    """
+    ArrayHistory is a compact, time-indexed table of float64 values with a fixed set of named columns,
+    e.g. one column per symbol plus the cash, commission and total of the portfolio.
+
+    Rows are indexed by bar number and written into a preallocated NumPy array, which doubles in size
+    whenever it fills up. Appending a bar therefore costs a single row assignment instead of a new
+    dictionary, and the history can be turned into a pandas DataFrame without converting per-row objects.
+    """
+
+    def __init__(self, columns, capacity=1024):
+        """
+        Initializes an empty history.
+
+        Parameters
+        ----------
+        @columns: The list of column names.
+        @capacity: The initial number of rows to preallocate.
+        """
+        self.columns = list(columns)
+        self.datetimes = np.empty(capacity, dtype='datetime64[ns]')
+        self.values = np.empty((capacity, len(self.columns)), dtype=np.float64)
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def _reserve(self, n):
+        """
+        Makes sure there is room for n more rows, growing the arrays geometrically if required.
+        """
+        required = self.length + n
+        capacity = len(self.datetimes)
+        if required <= capacity:
+            return
+
+        while capacity < required:
+            capacity = max(2 * capacity, 1)
+
+        datetimes = np.empty(capacity, dtype='datetime64[ns]')
+        datetimes[:self.length] = self.datetimes[:self.length]
+        values = np.empty((capacity, len(self.columns)), dtype=np.float64)
+        values[:self.length] = self.values[:self.length]
+        self.datetimes, self.values = datetimes, values
+
+    def append(self, dt, row):
+        """
+        Appends a bar to the history.
+
+        Parameters
+        ----------
+        @dt: The timestamp of the bar.
+        @row: The sequence of values, in column order.
+        """
+        self._reserve(1)
+        self.datetimes[self.length] = dt
+        self.values[self.length] = row
+        self.length += 1
+
+    def extend(self, datetimes, rows):
+        """
+        Appends many bars to the history at once.
+
+        Parameters
+        ----------
+        @datetimes: The sequence of timestamps of the bars.
+        @rows: The (bars x columns) array-like of values, in column order.
+        """
+        n = len(datetimes)
+        self._reserve(n)
+        self.datetimes[self.length:self.length + n] = datetimes
+        self.values[self.length:self.length + n] = rows
+        self.length += n
+
+    def to_dataframe(self):
+        """
+        Returns the history as a pandas DataFrame indexed on datetime, with one column per named column.
+        """
+        return pd.DataFrame(
+            self.values[:self.length], columns=self.columns,
+            index=pd.DatetimeIndex(self.datetimes[:self.length], name='datetime')
+        )
+
+
+# In[ ]:
+
+
+
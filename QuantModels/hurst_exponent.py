@@ -11,8 +11,7 @@
 from __future__ import print_function
 
 from numpy import cumsum, log, polyfit, sqrt, std, subtract
-from numpy.random import randn
-import pandas_datareader.data as web
+import numpy as np
 from datetime import datetime
 
 def hurst(ts):
@@ -34,26 +33,61 @@ def hurst(ts):
 
 # In[9]:
 
-# Create a Geometric Brownian Motion, Mean-Reverting, and Trending series
-gbm = log(cumsum(randn(100000)) + 1000)
-mr  = log(randn(100000) + 1000)
-tr  = log(cumsum(randn(100000) + 1) + 1000)
+# Generators of Geometric Brownian Motion, Mean-Reverting, and Trending (log price) series.
+# Passing n_series generates that many independent series at once, as the columns of an (n, n_series) array,
+# and passing a numpy.random.RandomState makes the series reproducible.
 
-amzn = web.DataReader("AMZN", "yahoo", datetime(2000,1,1), datetime(2015,1,1))
+def _randn(n, n_series, rng):
+    rng = np.random if rng is None else rng
+    return rng.randn(n) if n_series is None else rng.randn(n, n_series)
+
+
+def gbm_series(n, n_series=None, sigma=1.0, level=1000.0, rng=None):
+    """
+    Returns a random walk (log) series, with a Hurst Exponent of 0.5.
+    """
+    return log(cumsum(sigma * _randn(n, n_series, rng), axis=0) + level)
+
+
+def mean_reverting_series(n, n_series=None, sigma=1.0, level=1000.0, rng=None):
+    """
+    Returns a series of independent noise around a level, with a Hurst Exponent close to 0.
+    """
+    return log(sigma * _randn(n, n_series, rng) + level)
+
+
+def trending_series(n, n_series=None, sigma=1.0, level=1000.0, drift=1.0, rng=None):
+    """
+    Returns a random walk (log) series with a drift, with a Hurst Exponent close to 1.
+    """
+    return log(cumsum(sigma * (_randn(n, n_series, rng) + drift), axis=0) + level)
+
+
+if __name__ == "__main__":
+    import pandas_datareader.data as web
+    
+    # Create a Geometric Brownian Motion, Mean-Reverting, and Trending series
+    gbm = gbm_series(100000)
+    mr  = mean_reverting_series(100000)
+    tr  = trending_series(100000)
+    
+    amzn = web.DataReader("AMZN", "yahoo", datetime(2000,1,1), datetime(2015,1,1))
 
 
 # In[10]:
 
 # Output the Hurst Exponent for each of above series and the price of Amazon (Adj Close) for the previous ADF test
-print("Hurst(GBM):    %s" % hurst(gbm))
-print("Hurst(MR) :    %s" % hurst(mr))
-print("Hurst(TR) :    %s" % hurst(tr))
+if __name__ == "__main__":
+    print("Hurst(GBM):    %s" % hurst(gbm))
+    print("Hurst(MR) :    %s" % hurst(mr))
+    print("Hurst(TR) :    %s" % hurst(tr))
 
 
 # In[11]:
 
 # Run the above code to obtain AMZN
-print("Hurst(AMZN):   %s" % hurst(amzn['Adj Close']))
+if __name__ == "__main__":
+    print("Hurst(AMZN):   %s" % hurst(amzn['Adj Close']))
 
 
 # In[32]:
@@ -72,10 +106,11 @@ def hurst_behavior(ts):
 
 # In[33]:
 
-hurst_behavior(gbm)
-hurst_behavior(mr)
-hurst_behavior(tr)
-hurst_behavior(amzn['Adj Close'])
+if __name__ == "__main__":
+    hurst_behavior(gbm)
+    hurst_behavior(mr)
+    hurst_behavior(tr)
+    hurst_behavior(amzn['Adj Close'])
 
 
 # In[ ]:
@@ -12,12 +12,13 @@ from __future__ import print_function
 
 import datetime
 
-import statsmodels.api as sm
+import numpy as np
 
 from EventDrivenBacktester.Backtester import Backtest
 from EventDrivenBacktester.DataHandlerABC import HistoricCSVDataHandlerHFT
-from EventDrivenBacktester.EventClasses import SignalEvent
+from EventDrivenBacktester.EventClasses import SignalEvent, MARKET
 from EventDrivenBacktester.ExecutionHandler import SimulatedExecutionHandler
+from EventDrivenBacktester.RollingRegression import RollingOLS
 from EventDrivenBacktester.StrategyABC import Strategy
 from Portfolio.PortfolioBaseClass import PortfolioHFT
 
@@ -27,14 +28,18 @@ from Portfolio.PortfolioBaseClass import PortfolioHFT
 class IntradayOLSMRStrategy(Strategy):
     """
     Uses Ordinary Least Squares (OLS) to perform a rolling linear regression to determine
-    the optimal hedge ratio between a pair of equities.
+    the optimal hedge ratio between a pair of equities. The regression is updated incrementally
+    as each bar arrives (see RollingOLS), so the cost per bar does not depend on the window length.
     
     The Z-score of the residuals timeseries is then calculated in a rolling fashion. If it
     exceeds an interval of thresholds (defaulting to [0.5, 3.0]), then a long/short signal pair
     are generated (for the high threshold), or an exit signal pair are generated (for the low threshold).
     """
     
-    def __init__(self, bars, events, ols_window=100, zscore_low=0.5, zscore_high=3.0):
+    required_fields = ("close",)
+    uses_indicator_cache = True
+    
+    def __init__(self, bars, events, ols_window=100, zscore_low=0.5, zscore_high=3.0, indicator_cache=None):
         """
         Initializes the statistical arbitrage strategy.
         
@@ -42,6 +47,8 @@ class IntradayOLSMRStrategy(Strategy):
         ----------
         @bars: The DataHandler object that provides bar information.
         @events: The Event Queue object.
+        @indicator_cache: The IndicatorCache sharing the regression results between strategy instances, e.g. the
+            one of a BacktestOptim sweep, or None to always calculate them.
         """
         self.bars = bars
         self.symbol_list = self.bars.symbol_list
@@ -57,6 +64,21 @@ class IntradayOLSMRStrategy(Strategy):
         
         self.long_market = False
         self.short_market = False
+        
+        self.ols = RollingOLS(self.ols_window)
+        self.ols_in_sync = True
+        self.latest_datetime = None
+        self.n_bars = 0
+        self.zscore_last = np.nan
+        
+        # The regression window is incomplete, and the Z-score missing, until the ols_window-th bar
+        self.warmup_bars = self.ols_window - 1
+        
+        # The hedge ratio and Z-score series are shared with any other instance regressing the pair over
+        # the same window of the same data, e.g. the combinations of a parameter sweep with this ols_window
+        self.ols_series = None
+        if indicator_cache is not None:
+            self.ols_series = indicator_cache.get_series(self.bars, self.pair, 'rolling_ols', (self.ols_window,), 2)
     
     def calculate_xy_signals(self, zscore_last):
         """
@@ -104,39 +126,81 @@ class IntradayOLSMRStrategy(Strategy):
             
         return y_signal, x_signal
             
+    def _update_ols(self):
+        """
+        Adds the latest pair of closing prices to the rolling regression, then calculates the current
+        hedge ratio and the Z-score of the residuals. If the regression has fallen behind the data
+        (after reading cached values), it is rebuilt from the latest window instead.
+        """
+        if self.ols_in_sync:
+            self.ols.update(
+                self.bars.get_latest_bar_value(self.pair[1], "close"),
+                self.bars.get_latest_bar_value(self.pair[0], "close")
+            )
+        else:
+            self.ols.reset(
+                self.bars.get_latest_bars_values(self.pair[1], "close", N=self.ols_window),
+                self.bars.get_latest_bars_values(self.pair[0], "close", N=self.ols_window)
+            )
+            self.ols_in_sync = True
+        
+        self.hedge_ratio = self.ols.get_hedge_ratio()
+        self.zscore_last = self.ols.get_spread_zscore(self.hedge_ratio)
+    
+    def warm_up(self, n_bars):
+        """
+        Adds the closing prices of the warm-up bars to the regression window, recording their hedge ratios
+        and Z-scores in the shared series. These are missing until the window is full, which only happens
+        within a warm-up margin loaded before the start date.
+        """
+        xs = self.bars.get_latest_bars_values(self.pair[1], "close", N=n_bars)
+        ys = self.bars.get_latest_bars_values(self.pair[0], "close", N=n_bars)
+        for x, y in zip(xs.tolist(), ys.tolist()):
+            self.ols.update(x, y)
+            self.hedge_ratio = self.ols.get_hedge_ratio()
+            self.zscore_last = self.ols.get_spread_zscore(self.hedge_ratio)
+            if self.ols_series is not None:
+                self.ols_series.append(self.n_bars, (self.hedge_ratio, self.zscore_last))
+            self.n_bars += 1
+        
+        self.latest_datetime = self.bars.get_latest_bar_datetime(self.pair[0])
+    
     def calculate_signals_for_pairs(self):
         """
         Generates a new set of signals based on the mean reversion strategy.
         Calculates the hedge ratio between the pair of tickers. We use OLS for this, 
         although we should ideally use the Cointegrated Augmented Dickey-Fuller test.
         """
-        # Obtain the latest window of values for each component of the pair of tickers
-        y = self.bars.get_latest_bars_values(self.pair[0], "close", N=self.ols_window)
-        x = self.bars.get_latest_bars_values(self.pair[1], "close", N=self.ols_window)
+        # The data handler repeats the final bar once the data is exhausted, which must not be
+        # added to the regression window a second time.
+        latest_datetime = self.bars.get_latest_bar_datetime(self.pair[0])
+        if latest_datetime != self.latest_datetime:
+            self.latest_datetime = latest_datetime
+            i = self.n_bars
+            self.n_bars += 1
+            
+            if self.ols_series is not None and i < self.ols_series.length:
+                # Reuse the hedge ratio and z-score already calculated by another instance
+                self.hedge_ratio, self.zscore_last = self.ols_series.values[i]
+                self.ols_in_sync = False
+            else:
+                self._update_ols()
+                if self.ols_series is not None:
+                    self.ols_series.append(i, (self.hedge_ratio, self.zscore_last))
         
-        # Check that x and y contain values
-        if y is not None and x is not None:
-            # Check that all window periods are available
-            if len(y) >= self.ols_window and len(x) >= self.ols_window:
-                # Calculate the current hedge ratio using OLS. 
-                # Don't worry about not having defined self.hedge_ratio, this is valid Python.
-                self.hedge_ratio = sm.OLS(y,x).fit().params[0]
-                
-                # Calculate the current z-score of the residuals, get the last z-score
-                spread = y - self.hedge_ratio * x
-                zscore_last = ((spread - spread.mean())/spread.std())[-1]
-                
-                # Calculate signals and add to events queue
-                y_signal, x_signal = self.calculate_xy_signals(zscore_last)
-                if y_signal is not None and x_signal is not None:
-                    self.events.put(y_signal)
-                    self.events.put(x_signal)
+        # Check that all window periods are available
+        if self.zscore_last == self.zscore_last:
+            # Calculate signals and add to events queue
+            y_signal, x_signal = self.calculate_xy_signals(self.zscore_last)
+            if y_signal is not None and x_signal is not None:
+                self.events.put(y_signal)
+                self.events.put(x_signal)
                     
     def calculate_signals(self, event):
         """
         Calculate the SignalEvents based on market data.
         """
-        if event.type == 'MARKET':
+        if event.kind == MARKET:
             self.calculate_signals_for_pairs()
 
 
@@ -148,8 +212,9 @@ if __name__ == "__main__":
     initial_capital = 100000.0
     heartbeat = 0.0
     start_date = datetime.datetime(2007, 11, 8, 10, 41, 0)
+    end_date = None
     
-    backtest = Backtest(csv_dir, symbol_list, initial_capital, heartbeat, start_date,
+    backtest = Backtest(csv_dir, symbol_list, initial_capital, heartbeat, start_date, end_date,
                         HistoricCSVDataHandlerHFT, SimulatedExecutionHandler, PortfolioHFT, IntradayOLSMRStrategy)
     backtest.simulate_trading()
 
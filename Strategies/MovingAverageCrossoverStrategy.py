@@ -15,12 +15,16 @@ import datetime
 import numpy as np
 
 from EventDrivenBacktester.Backtester import Backtest
+from EventDrivenBacktester.BacktestLogging import get_logger
 from EventDrivenBacktester.DataHandlerABC import HistoricCSVDataHandler
-from EventDrivenBacktester.EventClasses import SignalEvent
+from EventDrivenBacktester.EventClasses import SignalEvent, MARKET
 from EventDrivenBacktester.ExecutionHandler import SimulatedExecutionHandler
-from EventDrivenBacktester.StrategyABC import Strategy
+from EventDrivenBacktester.Indicators import SMA
+from EventDrivenBacktester.StrategyABC import LockstepStrategy, Strategy, SIGNAL_EXIT, SIGNAL_LONG
 from Portfolio.PortfolioBaseClass import Portfolio
 
+logger = get_logger('strategy')
+
 
 # In[3]:
 
@@ -30,6 +34,8 @@ class MovingAverageCrossoverStrategy(Strategy):
     Default long/short windows are 400/100 periods respectively.
     """
     
+    required_fields = ("adj_close",)
+    
     def __init__(self, bars, events, short_window=100, long_window=400):
         """
         Initializes the Moving Average Crossover Strategy.
@@ -50,6 +56,18 @@ class MovingAverageCrossoverStrategy(Strategy):
         # Set to true if a symbol is in the market
         self.bought = self._calculate_initial_bought()
         
+        # Streaming moving averages for each symbol, fed by the data handler as new bars arrive.
+        # Until the windows fill up, the averages are taken over the bars available so far.
+        self.short_sma = {}
+        self.long_sma = {}
+        for s in self.symbol_list:
+            self.short_sma[s] = self.bars.register_indicator(s, SMA(self.short_window, "adj_close", min_periods=1))
+            self.long_sma[s] = self.bars.register_indicator(s, SMA(self.long_window, "adj_close", min_periods=1))
+        
+        # Until the shorter window fills up, both averages are taken over the very same bars and are equal,
+        # so no crossover can occur
+        self.warmup_bars = min(self.short_window, self.long_window)
+        
     def _calculate_initial_bought(self):
         """
         Adds keys to the bought dictionary for all symbols and sets them to 'OUT'.
@@ -68,27 +86,30 @@ class MovingAverageCrossoverStrategy(Strategy):
         ----------
         @event: A MarketEvent Object.
         """
-        if event.type == 'MARKET':
+        if event.kind == MARKET:
             for s in self.symbol_list:
-                bars = self.bars.get_latest_bars_values(s, "adj_close", N=self.long_window)
+                # Symbols which did not trade at this bar only carry their previous bar forward
+                if not self.bars.get_latest_bar_updated(s):
+                    continue
+                
                 bar_date = self.bars.get_latest_bar_datetime(s)
                 
-                if bars is not None and bars != []:
-                    short_sma = np.mean(bars[-self.short_window:])
-                    long_sma  = np.mean(bars[-self.long_window:])
+                if self.short_sma[s].is_ready() and self.long_sma[s].is_ready():
+                    short_sma = self.short_sma[s].value
+                    long_sma  = self.long_sma[s].value
                     
                     symbol = s
                     dt = datetime.datetime.utcnow()
                     sig_dir = ""
                     
                     if short_sma > long_sma and self.bought[s] == 'OUT':
-                        print("LONG: %s" % bar_date)
+                        logger.debug("LONG: %s %s", symbol, bar_date)
                         sig_dir = 'LONG'
                         signal = SignalEvent(1, symbol, dt, sig_dir, 1.0)
                         self.events.put(signal)
                         self.bought[s] = 'LONG'
                     elif short_sma < long_sma and self.bought[s] == 'LONG':
-                        print("SHORT: %s" % bar_date)
+                        logger.debug("SHORT: %s %s", symbol, bar_date)
                         sig_dir = 'EXIT'
                         signal = SignalEvent(1, symbol, dt, sig_dir, 1.0)
                         self.events.put(signal)
@@ -97,6 +118,73 @@ class MovingAverageCrossoverStrategy(Strategy):
 
 # In[4]:
 
+class MovingAverageCrossoverStrategyLockstep(LockstepStrategy):
+    """
+    Evaluates many (short_window, long_window) combinations of the MovingAverageCrossoverStrategy in a single
+    pass over the market data. A streaming SMA is registered once per symbol and distinct window, and the 'bought'
+    state of every combination is kept in a matrix with one row per combination and one column per symbol.
+    """
+    
+    strategy_class = MovingAverageCrossoverStrategy
+    
+    def __init__(self, bars, events, strat_params_list):
+        """
+        Initializes the lockstep Moving Average Crossover Strategy.
+        
+        Parameters
+        ----------
+        @bars: The DataHandler object that provides bar information.
+        @events: The Event Queue object.
+        @strat_params_list: The list of MovingAverageCrossoverStrategy keyword argument dictionaries.
+        """
+        self.bars = bars
+        self.symbol_list = self.bars.symbol_list
+        self.signal_symbols = self.symbol_list
+        self.events = events
+        
+        short_windows = [sp.get('short_window', 100) for sp in strat_params_list]
+        long_windows = [sp.get('long_window', 400) for sp in strat_params_list]
+        windows = sorted(set(short_windows) | set(long_windows))
+        self.short_index = np.searchsorted(windows, short_windows)
+        self.long_index = np.searchsorted(windows, long_windows)
+        
+        # One streaming moving average per symbol and distinct window, shared by every combination using it
+        self.smas = {}
+        for s in self.symbol_list:
+            self.smas[s] = [self.bars.register_indicator(s, SMA(w, "adj_close", min_periods=1)) for w in windows]
+        
+        # Set to true if a symbol is in the market, for each combination
+        self.bought = np.zeros((len(strat_params_list), len(self.symbol_list)), dtype=bool)
+    
+    def calculate_signals(self, event):
+        """
+        Generates the signal directions of every combination, following MovingAverageCrossoverStrategy.
+        
+        Parameters
+        ----------
+        @event: A MarketEvent Object.
+        """
+        directions = np.zeros(self.bought.shape, dtype=np.int8)
+        if event.kind == MARKET:
+            for j, s in enumerate(self.symbol_list):
+                if not self.bars.get_latest_bar_updated(s):
+                    continue
+                
+                values = np.array([sma.value for sma in self.smas[s]])
+                short_sma = values[self.short_index]
+                long_sma = values[self.long_index]
+                
+                bought = self.bought[:, j]
+                go_long = (short_sma > long_sma) & ~bought
+                go_exit = (short_sma < long_sma) & bought
+                directions[go_long, j] = SIGNAL_LONG
+                directions[go_exit, j] = SIGNAL_EXIT
+                self.bought[:, j] = (bought | go_long) & ~go_exit
+        return directions
+
+
+# In[5]:
+
 def main(csv_dir, symbol_list, initial_capital, heartbeat, start_date, end_date):
     csv_dir = '~/AlgorithmicTradingProject/Symbols/'  # Absolute path to the CSV data
     symbol_list = ['AAPL']
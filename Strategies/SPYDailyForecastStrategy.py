@@ -17,7 +17,7 @@ from sklearn.qda import QDA
 
 from EventDrivenBacktester.Backtester import Backtest
 from EventDrivenBacktester.DataHandlerABC import HistoricCSVDataHandler
-from EventDrivenBacktester.EventClasses import SignalEvent
+from EventDrivenBacktester.EventClasses import SignalEvent, MARKET
 from EventDrivenBacktester.ExecutionHandler import SimulatedExecutionHandler
 from EventDrivenBacktester.StrategyABC import Strategy
 from Portfolio.PortfolioBaseClass import Portfolio
@@ -74,7 +74,7 @@ class SPYDailyForecastStrategy(Strategy):
         sym = self.symbol_list[0]
         dt = self.datetime_now
         
-        if event.type == 'MARKET':
+        if event.kind == MARKET:
             self.bar_index += 1
             if self.bar_index > 5:
                 lags = self.bars.get_latest_bars_values(self.symbol_list[0], "returns", N=3)